@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+"""Local stand-ins used by benchmarks: stub executables (systemctl, journalctl, openvpn, sudo),
+UDP STUN responder with simulated packet loss, OpenVPN server answering hard reset packets,
+stub DNS resolver, generator of synthetic journal and private
+D-Bus system bus with fake systemd service (run `python fakes.py systemd STATE_DIR` to start
+only the service).
+"""
+
+import sys, os, json, time, random, socket, struct, stat, threading, subprocess
+
+SYSTEMCTL_STUB = """#!/bin/sh
+# Unit states are stored in files in $QOPENVPN_FAKE_STATE_DIR
+cmd=$1; shift
+case "$cmd" in
+    is-active)
+        retcode=0
+        for unit in "$@"; do
+            state=$(cat "$QOPENVPN_FAKE_STATE_DIR/$unit" 2>/dev/null || echo inactive)
+            echo "$state"
+            [ "$state" = active ] || retcode=3
+        done
+        exit $retcode;;
+    start|restart)
+        echo active > "$QOPENVPN_FAKE_STATE_DIR/$1";;
+    stop)
+        echo inactive > "$QOPENVPN_FAKE_STATE_DIR/$1";;
+esac
+"""
+
+JOURNALCTL_STUB = """#!/bin/sh
+# Prints last --lines=N entries of $QOPENVPN_FAKE_JOURNAL (and waits for more if --follow is used,
+# waiting process exits with benchmark even if benchmark doesn't stop it, so it doesn't keep stderr open)
+lines=10
+follow=
+for arg in "$@"; do
+    case "$arg" in
+        --lines=*) lines=${arg#--lines=};;
+        --follow) follow=1;;
+    esac
+done
+[ -f "$QOPENVPN_FAKE_JOURNAL" ] && tail -n "$lines" "$QOPENVPN_FAKE_JOURNAL"
+[ -n "$follow" ] && exec tail -f --pid="$PPID" /dev/null
+exit 0
+"""
+
+OPENVPN_STUB = """#!/bin/sh
+echo "OpenVPN 2.4.0 x86_64-pc-linux-gnu [SSL (OpenSSL)] [LZO] [LZ4] [EPOLL] [MH/PKTINFO] [AEAD]"
+"""
+
+SUDO_STUB = """#!/bin/sh
+# Counts privilege escalations and simulates time spent by authentication
+echo >> "$QOPENVPN_FAKE_STATE_DIR/.escalations"
+sleep "${QOPENVPN_FAKE_SUDO_DELAY:-0}"
+exec "$@"
+"""
+
+STUBS = {
+    "systemctl": SYSTEMCTL_STUB,
+    "journalctl": JOURNALCTL_STUB,
+    "openvpn": OPENVPN_STUB,
+    "sudo": SUDO_STUB,
+}
+
+
+def write_stubs(directory):
+    """Write stub executables to directory (prepend it to PATH to use them)"""
+    os.makedirs(directory, exist_ok=True)
+    for name, script in STUBS.items():
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def set_unit_state(state_dir, unit, state):
+    """Set state of unit reported by systemctl stub"""
+    with open(os.path.join(state_dir, unit), "w") as f:
+        f.write(state + "\n")
+
+
+def get_unit_state(state_dir, unit):
+    """Get state of unit reported by systemctl stub"""
+    try:
+        with open(os.path.join(state_dir, unit)) as f:
+            return f.read().strip()
+    except OSError:
+        return "inactive"
+
+
+def escalations(state_dir):
+    """Return number of privilege escalations done by sudo stub"""
+    try:
+        with open(os.path.join(state_dir, ".escalations")) as f:
+            return len(f.readlines())
+    except OSError:
+        return 0
+
+
+MESSAGES = [
+    "TLS: Initial packet from [AF_INET]198.51.100.1:{port}, sid=5b3c2f1e 9a8d7c6b",
+    "VERIFY OK: depth=0, CN=server",
+    "Data Channel: using negotiated cipher 'AES-256-GCM'",
+    "[server] Peer Connection Initiated with [AF_INET]198.51.100.1:{port}",
+    "TUN/TAP device tun0 opened",
+    "/sbin/ip addr add dev tun0 10.8.0.{host}/24 broadcast 10.8.0.255",
+    "Initialization Sequence Completed",
+    "WARNING: this configuration may cache passwords in memory -- use the auth-nocache option",
+    "[server] Inactivity timeout (--ping-restart), restarting",
+    "SIGUSR1[soft,ping-restart] received, process restarting",
+    "TLS Error: TLS key negotiation failed to occur within 60 seconds (check your network connectivity)",
+    "TLS Error: TLS handshake failed",
+]
+
+
+def message(i):
+    """Return i-th synthetic OpenVPN log message"""
+    return MESSAGES[i % len(MESSAGES)].format(port=1024 + i % 50000, host=2 + i % 250)
+
+
+def generate_journal(path, lines, unit="openvpn-client@bench.service"):
+    """Write synthetic journal in `journalctl -o json` format"""
+    timestamp = int((time.time() - lines) * 1000000)
+    with open(path, "w") as f:
+        for i in range(lines):
+            entry = {
+                "__CURSOR": "s=bench;i={:x}".format(i),
+                "__REALTIME_TIMESTAMP": str(timestamp + i * 1000000),
+                "_HOSTNAME": "bench",
+                "SYSLOG_IDENTIFIER": "openvpn",
+                "_PID": "1234",
+                "_SYSTEMD_UNIT": unit,
+                "PRIORITY": "6",
+                "MESSAGE": message(i),
+            }
+            f.write(json.dumps(entry) + "\n")
+
+
+def generate_entries(lines):
+    """Return synthetic parsed journal entries (timestamp, priority, line) one second apart"""
+    from qopenvpn import journal
+
+    start = time.time() - lines
+    return [(start + i, journal.entry_priority({"MESSAGE": message(i)}),
+             "{} bench openvpn[1234]: {}".format(time.strftime("%b %d %H:%M:%S", time.localtime(start + i)),
+                                                 message(i)))
+            for i in range(lines)]
+
+
+class StunResponder(object):
+    """Local UDP STUN server which drops given fraction of requests (RFC 5389 requests are answered
+    with XOR-MAPPED-ADDRESS and MAPPED-ADDRESS, old RFC 3489 requests only with MAPPED-ADDRESS)"""
+    def __init__(self, loss=0.0, delay=0.0, mapped_address=("192.0.2.1", 54320), host="127.0.0.1", port=0):
+        self.loss = loss
+        self.delay = delay
+        self.mapped_address = mapped_address
+        self.requests = 0
+        self.dropped = 0
+
+        self._sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self._sock.settimeout(0.1)
+        self._running = False
+        self._thread = None
+
+    @property
+    def address(self):
+        """Return (host, port) of responder"""
+        return self._sock.getsockname()
+
+    def start(self):
+        """Start serving requests in background thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving requests"""
+        self._running = False
+        if self._thread:
+            self._thread.join()
+        self._sock.close()
+
+    def response(self, request):
+        """Build Binding Response with mapped address attributes for request"""
+        ip, port = self.mapped_address
+        family, address = (0x02, socket.inet_pton(socket.AF_INET6, ip)) if ":" in ip else (0x01, socket.inet_aton(ip))
+        attributes = [(0x0001, struct.pack(">xBH", family, port) + address)]
+        if struct.unpack(">I", request[4:8])[0] == 0x2112A442:
+            key = request[4:4 + len(address)]
+            xor_address = bytes(a ^ b for a, b in zip(address, key))
+            attributes.insert(0, (0x0020, struct.pack(">xBH", family, port ^ 0x2112) + xor_address))
+
+        body = b"".join(struct.pack(">2H", attr_type, len(value)) + value for attr_type, value in attributes)
+        return struct.pack(">2H", 0x0101, len(body)) + request[4:20] + body
+
+    def _serve(self):
+        """Answer Binding Requests until stopped"""
+        while self._running:
+            try:
+                data, addr = self._sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            if len(data) < 20 or struct.unpack(">H", data[:2])[0] != 0x0001:
+                continue
+
+            self.requests += 1
+            if random.random() < self.loss:
+                self.dropped += 1
+                continue
+
+            if self.delay:
+                time.sleep(self.delay)
+            self._sock.sendto(self.response(data), addr)
+
+
+class OpenVPNResponder(StunResponder):
+    """Local UDP OpenVPN server which answers P_CONTROL_HARD_RESET_CLIENT_V2 packets
+    after given delay (and drops given fraction of them)"""
+    def response(self, request):
+        """Build P_CONTROL_HARD_RESET_SERVER_V2 acknowledging client session"""
+        return bytes([8 << 3]) + os.urandom(8) + b"\x01" + request[10:14] + request[1:9] + b"\x00\x00\x00\x00"
+
+    def is_request(self, data):
+        """Check if packet is P_CONTROL_HARD_RESET_CLIENT_V2"""
+        return len(data) >= 14 and data[0] >> 3 == 7
+
+    def _serve(self):
+        """Answer requests until stopped (every response is delayed in separate thread)"""
+        while self._running:
+            try:
+                data, addr = self._sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            if not self.is_request(data):
+                continue
+
+            self.requests += 1
+            if random.random() < self.loss:
+                self.dropped += 1
+                continue
+
+            timer = threading.Timer(self.delay, self._send, (self.response(data), addr))
+            timer.daemon = True
+            timer.start()
+
+    def _send(self, data, addr):
+        """Send delayed response (socket could have been closed meanwhile)"""
+        try:
+            self._sock.sendto(data, addr)
+        except OSError:
+            pass
+
+
+class DnsResponder(OpenVPNResponder):
+    """Local stub DNS resolver which answers every query with NOERROR and no records
+    (after given delay, given fraction of queries is dropped)"""
+    def response(self, request):
+        """Build response header for query (question is copied)"""
+        return request[:2] + b"\x81\x80" + request[4:]
+
+    def is_request(self, data):
+        """Check if packet is DNS query"""
+        return len(data) >= 12 and not data[2] & 0x80
+
+
+BUS_CONFIG = """<!DOCTYPE busconfig PUBLIC "-//freedesktop//DTD D-Bus Bus Configuration 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/busconfig.dtd">
+<busconfig>
+  <type>session</type>
+  <listen>unix:path={socket_path}</listen>
+  <auth>EXTERNAL</auth>
+  <policy context="default">
+    <allow send_destination="*" eavesdrop="true"/>
+    <allow eavesdrop="true"/>
+    <allow own="*"/>
+  </policy>
+</busconfig>
+"""
+
+
+class SystemBus(object):
+    """Private D-Bus bus (started by dbus-daemon) with fake systemd service on it"""
+    def __init__(self, tmp_dir, state_dir, job_delay=0.05):
+        self.socket_path = os.path.join(tmp_dir, "system_bus_socket")
+        self.address = "unix:path={}".format(self.socket_path)
+        self._config_path = os.path.join(tmp_dir, "system_bus.conf")
+        self._state_dir = state_dir
+        self._job_delay = job_delay
+        self._daemon = None
+        self._service = None
+
+    def start(self, timeout=10):
+        """Start bus and fake systemd (wait until service is registered)"""
+        with open(self._config_path, "w") as f:
+            f.write(BUS_CONFIG.format(socket_path=self.socket_path))
+        self._daemon = subprocess.Popen(["dbus-daemon", "--nofork", "--config-file", self._config_path],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(self.socket_path):
+            if time.monotonic() > deadline or self._daemon.poll() is not None:
+                self.stop()
+                raise RuntimeError("dbus-daemon couldn't be started")
+            time.sleep(0.01)
+
+        env = dict(os.environ, DBUS_SYSTEM_BUS_ADDRESS=self.address)
+        self._service = subprocess.Popen([sys.executable, os.path.abspath(__file__), "systemd",
+                                          self._state_dir, str(self._job_delay)],
+                                         env=env, stdout=subprocess.PIPE)
+        ready = self._service.stdout.readline()
+        if ready.strip() != b"READY":
+            self.stop()
+            raise RuntimeError("Fake systemd couldn't be started")
+
+    def stop(self):
+        """Stop fake systemd and bus"""
+        for process in (self._service, self._daemon):
+            if process and process.poll() is None:
+                process.terminate()
+                process.wait()
+
+
+def unit_path(unit):
+    """Return D-Bus object path of unit (escaped in the same way as systemd does it)"""
+    escaped = "".join(c if c.isalnum() else "_{:02x}".format(ord(c)) for c in unit)
+    return "/org/freedesktop/systemd1/unit/" + escaped
+
+
+def serve_systemd(state_dir, job_delay):
+    """Serve fake systemd1 Manager and Unit objects on system bus (states are shared with systemctl stub)"""
+    from PyQt5 import QtCore, QtDBus
+
+    app = QtCore.QCoreApplication([])
+    bus = QtDBus.QDBusConnection.systemBus()
+
+    class UnitAdaptor(QtDBus.QDBusAbstractAdaptor):
+        QtCore.Q_CLASSINFO("D-Bus Interface", "org.freedesktop.systemd1.Unit")
+
+        def __init__(self, unit, parent):
+            super().__init__(parent)
+            self.unit = unit
+
+        @QtCore.pyqtProperty(str)
+        def ActiveState(self):
+            return get_unit_state(state_dir, self.unit)
+
+    class ManagerAdaptor(QtDBus.QDBusAbstractAdaptor):
+        QtCore.Q_CLASSINFO("D-Bus Interface", "org.freedesktop.systemd1.Manager")
+        JobRemoved = QtCore.pyqtSignal("uint", QtDBus.QDBusObjectPath, str, str)
+
+        def __init__(self, parent):
+            super().__init__(parent)
+            self.units = {}
+            self.job_id = 0
+
+        @QtCore.pyqtSlot()
+        def Subscribe(self):
+            pass
+
+        @QtCore.pyqtSlot(str, result=QtDBus.QDBusObjectPath)
+        def LoadUnit(self, unit):
+            if unit not in self.units:
+                obj = QtCore.QObject(self)
+                obj.adaptor = UnitAdaptor(unit, obj)
+                bus.registerObject(unit_path(unit), obj, QtDBus.QDBusConnection.ExportAdaptors)
+                self.units[unit] = obj
+            return QtDBus.QDBusObjectPath(unit_path(unit))
+
+        @QtCore.pyqtSlot(str, str, result=QtDBus.QDBusObjectPath)
+        def StartUnit(self, unit, mode):
+            return self.enqueue(unit, ["activating", "active"])
+
+        @QtCore.pyqtSlot(str, str, result=QtDBus.QDBusObjectPath)
+        def StopUnit(self, unit, mode):
+            return self.enqueue(unit, ["deactivating", "inactive"])
+
+        @QtCore.pyqtSlot(str, str, result=QtDBus.QDBusObjectPath)
+        def RestartUnit(self, unit, mode):
+            return self.enqueue(unit, ["deactivating", "activating", "active"])
+
+        def enqueue(self, unit, states):
+            """Go through states of unit (job_delay seconds each) and emit JobRemoved at the end"""
+            self.LoadUnit(unit)
+            self.job_id += 1
+            job_id, job_path = self.job_id, "/org/freedesktop/systemd1/job/{}".format(self.job_id)
+            for i, state in enumerate(states):
+                QtCore.QTimer.singleShot(int(job_delay * 1000 * i), lambda state=state: self.set_state(unit, state))
+            QtCore.QTimer.singleShot(int(job_delay * 1000 * len(states)), lambda: self.JobRemoved.emit(
+                job_id, QtDBus.QDBusObjectPath(job_path), unit, "done"))
+            return QtDBus.QDBusObjectPath(job_path)
+
+        def set_state(self, unit, state):
+            """Change unit state and emit PropertiesChanged signal"""
+            set_unit_state(state_dir, unit, state)
+            message = QtDBus.QDBusMessage.createSignal(unit_path(unit), "org.freedesktop.DBus.Properties",
+                                                       "PropertiesChanged")
+            message.setArguments(["org.freedesktop.systemd1.Unit", {"ActiveState": QtDBus.QDBusVariant(state)},
+                                  QtDBus.QDBusArgument([], QtCore.QMetaType.QStringList)])
+            bus.send(message)
+
+    manager = QtCore.QObject()
+    manager.adaptor = ManagerAdaptor(manager)
+    manager.adaptor.setAutoRelaySignals(True)
+    if not (bus.registerObject("/org/freedesktop/systemd1", manager) and
+            bus.registerService("org.freedesktop.systemd1")):
+        sys.exit(1)
+
+    print("READY", flush=True)
+    app.exec_()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "systemd":
+        serve_systemd(sys.argv[2], float(sys.argv[3]) if len(sys.argv) > 3 else 0.05)
+    else:
+        print("Usage: fakes.py systemd STATE_DIR [JOB_DELAY]", file=sys.stderr)
+        sys.exit(1)
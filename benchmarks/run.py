@@ -0,0 +1,790 @@
+#!/usr/bin/env python
+"""Benchmark suite of QOpenVPN.
+Everything runs against local stand-ins (stub systemctl / journalctl / openvpn executables,
+local UDP STUN, OpenVPN and DNS responders and synthetic journal), so results don't depend on network
+or on state of the machine (network change benchmark adds addresses to loopback
+and runs only as root). Results are printed (or saved) in JSON format.
+"""
+
+import sys, os, json, time, socket, shutil, argparse, platform, statistics, subprocess, tempfile
+
+import fakes, startup
+
+# Benchmark QOpenVPN from this source tree
+sys.path.insert(0, startup.ROOT_DIR)
+
+BENCHMARKS = ("startup", "poll", "logs", "filter", "metrics", "privileged", "stun", "probe", "dns", "history", "archive", "network")
+
+# Switches between two VPNs (stop + start) done by tray icon, it runs in separate process
+# because connection to system bus can't be changed after it is established
+SWITCH_SCRIPT = """
+import sys, json, time
+from PyQt5 import QtCore, QtWidgets
+from qopenvpn import core, __main__ as qopenvpn_main
+
+backend, switches = sys.argv[1], int(sys.argv[2])
+app = QtWidgets.QApplication(sys.argv)
+core.init_application_info()
+settings = QtCore.QSettings()
+settings.setValue("vpn_name", "bench0")
+settings.setValue("vpn_names", ["bench1"])
+settings.setValue("use_sudo", True)
+settings.setValue("sudo_command", "sudo")
+settings.setValue("privileged_backend", backend)
+settings.sync()
+
+widget = qopenvpn_main.QOpenVPNWidget()
+units = ["openvpn-client@bench0", "openvpn-client@bench1"]
+latencies = []
+
+def idle():
+    return widget.command is None and not widget.pending_commands
+
+def switch(i):
+    start = time.perf_counter()
+    widget.vpn_stop(units[i % 2])
+    widget.vpn_start(units[(i + 1) % 2])
+    while not idle():
+        app.processEvents(QtCore.QEventLoop.AllEvents | QtCore.QEventLoop.WaitForMoreEvents)
+    latencies.append(time.perf_counter() - start)
+
+def run():
+    for i in range(switches):
+        switch(i)
+    print(json.dumps({"event_driven": widget.monitor.is_event_driven(), "latencies": latencies}))
+    app.quit()
+
+QtCore.QTimer.singleShot(100, run)
+app.exec_()
+QtCore.QThreadPool.globalInstance().waitForDone()
+"""
+
+
+def percentile(values, fraction):
+    """Return percentile of values (nearest rank)"""
+    values = sorted(values)
+    return values[int(round(fraction * (len(values) - 1)))]
+
+
+def summarize(values):
+    """Return summary statistics of durations (in milliseconds)"""
+    if not values:
+        return {"min_ms": None, "median_ms": None, "p95_ms": None, "max_ms": None}
+    return {
+        "min_ms": min(values) * 1000,
+        "median_ms": statistics.median(values) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "max_ms": max(values) * 1000,
+    }
+
+
+def children_cpu_time():
+    """Return CPU time consumed by finished child processes"""
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def setup_environment(tmp_dir):
+    """Put stub executables on PATH and isolate settings, cache and system bus"""
+    stubs_dir = os.path.join(tmp_dir, "bin")
+    state_dir = os.path.join(tmp_dir, "state")
+    fakes.write_stubs(stubs_dir)
+    os.makedirs(state_dir)
+
+    env = startup.benchmark_env(tmp_dir)
+    env["PATH"] = os.pathsep.join([stubs_dir, env.get("PATH", "")])
+    env["QOPENVPN_FAKE_STATE_DIR"] = state_dir
+    env["QOPENVPN_FAKE_JOURNAL"] = os.path.join(tmp_dir, "journal.json")
+    # Systemd units can't be tracked via D-Bus, so polling of systemctl stub is used
+    env["DBUS_SYSTEM_BUS_ADDRESS"] = "unix:path={}".format(os.path.join(tmp_dir, "no-system-bus"))
+    os.environ.update(env)
+    return env
+
+
+def wait_until(predicate, timeout=30):
+    """Process Qt events until predicate is true"""
+    from PyQt5 import QtCore
+
+    # Timer makes sure that event loop wakes up regularly
+    timer = QtCore.QTimer()
+    timer.start(5)
+    deadline = time.perf_counter() + timeout
+    try:
+        while not predicate():
+            if time.perf_counter() > deadline:
+                raise RuntimeError("Benchmark timed out")
+            QtCore.QCoreApplication.processEvents(QtCore.QEventLoop.AllEvents | QtCore.QEventLoop.WaitForMoreEvents)
+    finally:
+        timer.stop()
+
+
+def close_widget(widget):
+    """Hide tray icon and delete widget after journalctl followed by log archive exits"""
+    from PyQt5 import QtCore
+
+    if widget.archive_journal:
+        journal = widget.archive_journal
+        journal.stop()
+        wait_until(lambda: not journal.is_running())
+    widget.close_log_archive()
+    widget.trayIcon.hide()
+    widget.deleteLater()
+    QtCore.QCoreApplication.processEvents()
+
+
+def close_viewer(viewer):
+    """Close log viewer and delete it after its journalctl exits"""
+    from PyQt5 import QtCore
+
+    viewer.done(0)
+    wait_until(lambda: not viewer.journal.is_running())
+    viewer.deleteLater()
+    QtCore.QCoreApplication.processEvents()
+
+
+def bench_startup(env, repeat):
+    """Measure time until tray icon is shown and event loop is running"""
+    cold = startup.measure_startup(env)
+    runs = [startup.measure_startup(env) for i in range(repeat)]
+    return {
+        "cold_event_loop_ms": cold[2] * 1000,
+        "import": summarize([r[0] for r in runs]),
+        "widget": summarize([r[1] for r in runs]),
+        "event_loop": summarize([r[2] for r in runs]),
+    }
+
+
+def bench_poll(env, unit_counts, ticks):
+    """Measure cost of one status poll (all units change state) including GUI update"""
+    from PyQt5 import QtCore
+    from qopenvpn import __main__ as qopenvpn_main
+
+    results = []
+    for count in unit_counts:
+        names = ["bench{}".format(i) for i in range(count)]
+        settings = QtCore.QSettings()
+        settings.setValue("vpn_name", names[0])
+        settings.setValue("vpn_names", names[1:])
+        settings.setValue("show_warning", False)
+        settings.setValue("auto_reconnect", False)
+        settings.sync()
+
+        units = ["openvpn-client@{}".format(name) for name in names]
+        for unit in units:
+            fakes.set_unit_state(env["QOPENVPN_FAKE_STATE_DIR"], unit, "inactive")
+
+        widget = qopenvpn_main.QOpenVPNWidget()
+        wait_until(lambda: widget.monitor and all(widget.monitor.state(u) == "inactive" for u in units))
+
+        changed = []
+        widget.monitor.stateChanged.connect(lambda unit, state: changed.append(unit))
+        wall_times, cpu_times, child_cpu_times = [], [], []
+        for tick in range(ticks):
+            state = "active" if tick % 2 == 0 else "inactive"
+            for unit in units:
+                fakes.set_unit_state(env["QOPENVPN_FAKE_STATE_DIR"], unit, state)
+
+            del changed[:]
+            start, cpu_start, child_cpu_start = time.perf_counter(), time.process_time(), children_cpu_time()
+            widget.monitor.poll()
+            wait_until(lambda: len(changed) == len(units))
+            wall_times.append(time.perf_counter() - start)
+            cpu_times.append(time.process_time() - cpu_start)
+            child_cpu_times.append(children_cpu_time() - child_cpu_start)
+
+        results.append({
+            "units": count,
+            "ticks": ticks,
+            "event_driven": widget.monitor.is_event_driven(),
+            "wall": summarize(wall_times),
+            "cpu": summarize(cpu_times),
+            "child_cpu": summarize(child_cpu_times),
+        })
+        close_widget(widget)
+    return results
+
+
+def bench_metrics(env, unit_counts, scrapes):
+    """Measure latency of scraping metrics endpoint (metrics are rendered from cached state)"""
+    import threading, http.client
+    from PyQt5 import QtCore
+    from qopenvpn import __main__ as qopenvpn_main
+
+    results = []
+    for count in unit_counts:
+        names = ["bench{}".format(i) for i in range(count)]
+        settings = QtCore.QSettings()
+        settings.setValue("vpn_name", names[0])
+        settings.setValue("vpn_names", names[1:])
+        settings.setValue("metrics_enabled", True)
+        settings.setValue("metrics_address", "127.0.0.1:0")
+        settings.sync()
+
+        units = ["openvpn-client@{}".format(name) for name in names]
+        for i, unit in enumerate(units):
+            fakes.set_unit_state(env["QOPENVPN_FAKE_STATE_DIR"], unit, "active" if i % 2 else "inactive")
+
+        widget = qopenvpn_main.QOpenVPNWidget()
+        wait_until(lambda: widget.metrics and all(widget.monitor.state(u) != "unknown" for u in units))
+        port = widget.metrics.port()
+
+        # Scrapes run in background thread, endpoint is served by event loop of main thread
+        latencies, sizes, errors = [], [], []
+
+        def scrape():
+            for i in range(scrapes):
+                start = time.perf_counter()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+                try:
+                    conn.request("GET", "/metrics")
+                    response = conn.getresponse()
+                    body = response.read()
+                    if response.status != 200:
+                        raise http.client.HTTPException("HTTP status {}".format(response.status))
+                except (OSError, http.client.HTTPException) as e:
+                    errors.append("{}: {}".format(type(e).__name__, e))
+                    continue
+                finally:
+                    conn.close()
+                sizes.append(len(body))
+                latencies.append(time.perf_counter() - start)
+
+        cpu_start, child_cpu_start = time.process_time(), children_cpu_time()
+        thread = threading.Thread(target=scrape)
+        thread.start()
+        wait_until(lambda: not thread.is_alive())
+
+        render_times = []
+        for i in range(scrapes):
+            start = time.perf_counter()
+            widget.metrics.render()
+            render_times.append(time.perf_counter() - start)
+
+        results.append({
+            "units": count,
+            "scrapes": scrapes,
+            "response_bytes": max(sizes) if sizes else None,
+            "failed_scrapes": len(errors),
+            "errors": sorted(set(errors)),
+            "scrape": summarize(latencies),
+            "render": summarize(render_times),
+            "cpu_per_scrape_ms": (time.process_time() - cpu_start) / scrapes * 1000,
+            "child_cpu_ms": (children_cpu_time() - child_cpu_start) * 1000,
+        })
+        settings.setValue("metrics_enabled", False)
+        widget.setup_metrics()
+        close_widget(widget)
+    return results
+
+
+def bench_logs(env, sizes, repeat, stun_servers):
+    """Measure time until log viewer shows whole journal (for different journal sizes)"""
+    from PyQt5 import QtCore
+    from qopenvpn import dialogs, stun
+
+    # External IP address is looked up by log viewer too
+    stun.STUN_SERVERS[:] = stun_servers
+
+    results = []
+    for size in sizes:
+        fakes.generate_journal(env["QOPENVPN_FAKE_JOURNAL"], size)
+        settings = QtCore.QSettings()
+        settings.setValue("vpn_name", "bench")
+        settings.setValue("log_buffer_lines", size)
+        settings.sync()
+
+        latencies = []
+        blocks = 0
+        for i in range(repeat):
+            received = []
+            start = time.perf_counter()
+            viewer = dialogs.QOpenVPNLogViewer()
+            viewer.journal.entriesReceived.connect(lambda entries: received.extend(entries))
+            wait_until(lambda: len(received) >= size)
+            QtCore.QCoreApplication.processEvents()
+            latencies.append(time.perf_counter() - start)
+            blocks = viewer.logViewerEdit.blockCount()
+            close_viewer(viewer)
+
+        results.append({
+            "lines": size,
+            "journal_bytes": os.path.getsize(env["QOPENVPN_FAKE_JOURNAL"]),
+            "shown_lines": blocks,
+            "latency": summarize(latencies),
+        })
+    return results
+
+
+def bench_filter(env, lines, repeat):
+    """Measure latency of log viewer search and filters over large buffer (shown lines included)"""
+    from PyQt5 import QtCore
+    from qopenvpn import dialogs
+
+    # Entries are appended directly, journal of viewer is empty
+    fakes.generate_journal(env["QOPENVPN_FAKE_JOURNAL"], 0)
+    settings = QtCore.QSettings()
+    settings.setValue("vpn_name", "bench-empty")
+    settings.setValue("log_buffer_lines", lines)
+    settings.sync()
+
+    viewer = dialogs.QOpenVPNLogViewer()
+    entries = fakes.generate_entries(lines)
+    start = time.perf_counter()
+    viewer.append_entries(entries)
+    results = {"lines": lines, "load_ms": (time.perf_counter() - start) * 1000, "filters": []}
+
+    def run_filter(query="", priority_index=0, time_index=0):
+        for combo, index in ((viewer.priorityComboBox, priority_index), (viewer.timeComboBox, time_index)):
+            combo.blockSignals(True)
+            combo.setCurrentIndex(index)
+            combo.blockSignals(False)
+        viewer.searchEdit.blockSignals(True)
+        viewer.searchEdit.setText(query)
+        viewer.searchEdit.blockSignals(False)
+
+        start = time.perf_counter()
+        viewer.apply_filters()
+        return time.perf_counter() - start
+
+    scenarios = [
+        ("all lines", "", 0, 0),
+        ("search 'TLS Error'", "TLS Error", 0, 0),
+        ("search 'auth_failed' (no match)", "auth_failed", 0, 0),
+        ("search '198.51.100.1:4242'", "198.51.100.1:4242", 0, 0),
+        ("warnings and errors", "", 2, 0),
+        ("errors in last hour", "", 3, 2),
+    ]
+    for name, query, priority_index, time_index in scenarios:
+        durations = [run_filter(query, priority_index, time_index) for i in range(repeat)]
+        results["filters"].append({"filter": name, "matches": viewer.match_count, "latency": summarize(durations)})
+
+    # Search as you type (every keystroke filters the buffer)
+    query = "inactivity timeout"
+    durations = [run_filter(query[:i]) for i in range(1, len(query) + 1)]
+    results["search_as_you_type"] = {"query": query, "keystroke": summarize(durations)}
+
+    close_viewer(viewer)
+    return results
+
+
+def bench_stun_parse(number=100000):
+    """Measure time of parsing one Binding Response (in microseconds)"""
+    import timeit
+    from qopenvpn import stun
+
+    client = stun.StunClient()
+    results = {}
+    for name, mapped_address in (("ipv4", ("192.0.2.1", 54320)), ("ipv6", ("2001:db8::1", 54320))):
+        transaction_id = client._generate_id()
+        responder = fakes.StunResponder(mapped_address=mapped_address)
+        response = responder.response(client._generate_request(transaction_id))
+        responder.stop()
+        duration = timeit.timeit(lambda: client._parse_response(response, transaction_id), number=number)
+        results[name + "_parse_us"] = duration / number * 1000000
+    return results
+
+
+def bench_stun(loss_rates, servers, repeat, timeout):
+    """Measure latency and success rate of STUN lookup under packet loss"""
+    from qopenvpn import stun
+
+    results = []
+    for loss in loss_rates:
+        responders = [fakes.StunResponder(loss=loss) for i in range(servers)]
+        for responder in responders:
+            responder.start()
+
+        latencies = []
+        failures = 0
+        try:
+            for i in range(repeat):
+                start = time.perf_counter()
+                try:
+                    stun.StunClient(timeout=timeout).race_ip([r.address for r in responders])
+                    latencies.append(time.perf_counter() - start)
+                except RuntimeError:
+                    failures += 1
+        finally:
+            for responder in responders:
+                responder.stop()
+
+        results.append({
+            "loss": loss,
+            "servers": servers,
+            "lookups": repeat,
+            "success_rate": (repeat - failures) / repeat,
+            "latency": summarize(latencies),
+        })
+    return results
+
+
+def bench_probe(remote_counts, repeat, timeout):
+    """Measure duration of latency probing of OpenVPN remotes (one of them never answers,
+    so concurrent probing takes one timeout) compared with sum of RTTs of sequential probing,
+    and duration of repeated connect which uses cached RTTs"""
+    from qopenvpn import latency
+
+    results = []
+    for count in remote_counts:
+        responders = [fakes.OpenVPNResponder(delay=0.01 * (i + 1)) for i in range(count)]
+        for responder in responders:
+            responder.start()
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        silent.bind(("127.0.0.1", 0))
+        remotes = [[host, port, "udp"] for host, port in (r.address for r in responders)]
+        remotes.insert(0, list(silent.getsockname()) + ["udp"])
+
+        probes, cached = [], []
+        try:
+            for i in range(repeat):
+                latency.invalidate_cache()
+                start = time.perf_counter()
+                fastest = latency.fastest_remote(remotes, timeout=timeout)
+                probes.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                latency.fastest_remote(remotes, timeout=timeout)
+                cached.append(time.perf_counter() - start)
+        finally:
+            silent.close()
+            for responder in responders:
+                responder.stop()
+
+        results.append({
+            "remotes": count + 1,
+            "timeout_s": timeout,
+            "fastest_found": fastest == tuple(remotes[1]),
+            "sequential_rtt_sum_s": round(sum(r.delay for r in responders) + timeout, 3),
+            "concurrent": summarize(probes),
+            "cached": summarize(cached),
+        })
+    return results
+
+
+def bench_dns(server_counts, repeat, timeout):
+    """Measure duration of DNS leak check which queries all configured DNS servers concurrently
+    (one of them never answers, so check takes one timeout)"""
+    from qopenvpn import dnscheck
+
+    results = []
+    for count in server_counts:
+        # Stub resolvers listen on the same port of different loopback addresses (127.0.0.x)
+        silent = fakes.DnsResponder(loss=1.0, host="127.0.0.2")
+        port = silent.address[1]
+        responders = [fakes.DnsResponder(delay=0.005 * (i + 1), host="127.0.0.{}".format(i + 3), port=port)
+                      for i in range(count)]
+        for responder in responders + [silent]:
+            responder.start()
+        servers = [(r.address[0], "", []) for r in [silent] + responders]
+
+        durations = []
+        try:
+            for i in range(repeat):
+                start = time.perf_counter()
+                result = dnscheck.check("tun*", servers=servers, routes=[], timeout=timeout, port=port)
+                durations.append(time.perf_counter() - start)
+        finally:
+            for responder in responders + [silent]:
+                responder.stop()
+
+        results.append({
+            "servers": count + 1,
+            "answered": sum(s["rtt"] is not None for s in result["servers"]),
+            "timeout_s": timeout,
+            "sequential_rtt_sum_s": round(sum(r.delay for r in responders) + timeout, 3),
+            "check": summarize(durations),
+        })
+    return results
+
+
+def bench_privileged(tmp_dir, env, switches, sudo_delay):
+    """Measure latency of VPN switch (stop + start) and number of privilege escalations
+    for every backend of privileged operations (authentication is simulated by sudo stub delay)"""
+    state_dir = env["QOPENVPN_FAKE_STATE_DIR"]
+    bus = fakes.SystemBus(tmp_dir, state_dir, job_delay=0)
+    bus.start()
+    results = []
+    try:
+        for backend in ("systemctl", "helper", "dbus"):
+            for unit in ("openvpn-client@bench0", "openvpn-client@bench1"):
+                fakes.set_unit_state(state_dir, unit, "inactive")
+            fakes.set_unit_state(state_dir, "openvpn-client@bench0", "active")
+            escalations = fakes.escalations(state_dir)
+
+            child_env = dict(env, DBUS_SYSTEM_BUS_ADDRESS=bus.address, QOPENVPN_FAKE_SUDO_DELAY=str(sudo_delay))
+            output = subprocess.check_output([sys.executable, "-c", SWITCH_SCRIPT, backend, str(switches)],
+                                             env=child_env, stderr=subprocess.DEVNULL)
+            result = json.loads(output.decode("utf8").strip().splitlines()[-1])
+            results.append({
+                "backend": backend,
+                "switches": switches,
+                "event_driven": result["event_driven"],
+                "escalations": fakes.escalations(state_dir) - escalations,
+                "sudo_delay_ms": sudo_delay * 1000,
+                "switch": summarize(result["latencies"]),
+            })
+    finally:
+        bus.stop()
+    return results
+
+
+def bench_history(tmp_dir, days, drops_per_day, units, repeat):
+    """Measure time of uptime / MTTR / drop frequency queries over long connection history"""
+    import random, sqlite3
+    from qopenvpn import history
+
+    # Generate history directly by SQL (one transaction), every drop is followed by reconnect and up
+    path = os.path.join(tmp_dir, "history.sqlite")
+    now = time.time()
+    rows = []
+    for unit in ("openvpn-client@bench{}".format(i) for i in range(units)):
+        timestamp = now - days * 86400
+        rows.append((timestamp, unit, "up", ""))
+        while timestamp < now:
+            timestamp += random.expovariate(drops_per_day / 86400)
+            rows.append((timestamp, unit, "drop", "failed"))
+            rows.append((timestamp + 1, unit, "reconnect", "attempt 1"))
+            timestamp += random.uniform(2, 60)
+            rows.append((timestamp, unit, "up", ""))
+    db = sqlite3.connect(path)
+    db.executescript(history.SCHEMA)
+    with db:
+        db.executemany("INSERT INTO events (time, unit, event, reason) VALUES (?, ?, ?, ?)", rows)
+    db.close()
+
+    store = history.HistoryStore(path)
+    results = {"events": len(rows), "database_bytes": os.path.getsize(path), "queries": []}
+    for period in (1, 30, days):
+        durations = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            for unit in store.units():
+                store.summary(unit, now - period * 86400, now)
+            durations.append(time.perf_counter() - start)
+        results["queries"].append({"days": period, "units": units, "summary": summarize(durations)})
+
+    durations = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        store.events(since=now - 30 * 86400, limit=1000)
+        durations.append(time.perf_counter() - start)
+    results["events_query"] = summarize(durations)
+    store.close()
+    return results
+
+
+def bench_archive(tmp_dir, lines, repeat, flush_every=100):
+    """Measure archiving of log session (flushed every flush_every lines, as tray does periodically),
+    compression ratio, reading of whole session compared with reading of short time range
+    (only overlapping chunks are decompressed) and retention of archive"""
+    from qopenvpn import logarchive
+
+    path = os.path.join(tmp_dir, "logs")
+    archive = logarchive.LogArchive(path, max_bytes=2 ** 40, max_age=0)
+    entries = fakes.generate_entries(lines)
+    unit = "openvpn-client@bench.service"
+    start = time.perf_counter()
+    for i in range(0, lines, flush_every):
+        archive.append(unit, entries[i:i + flush_every], "bench")
+        archive.flush()
+    archive.close()
+    write_duration = time.perf_counter() - start
+
+    session = archive.sessions(unit)[0]
+    raw_bytes = sum(len(logarchive.encode_entry(*e)) for e in entries)
+    results = {"lines": lines, "flush_every": flush_every, "write_s": round(write_duration, 4),
+               "lines_per_s": round(lines / write_duration), "raw_bytes": raw_bytes,
+               "archive_bytes": session["bytes"], "compression_ratio": round(raw_bytes / session["bytes"], 2)}
+
+    whole, window = [], []
+    since = entries[lines // 2][0]
+    for i in range(repeat):
+        start = time.perf_counter()
+        count = len(archive.read(session["id"]))
+        whole.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        window_count = len(archive.read(session["id"], since, since + 600))
+        window.append(time.perf_counter() - start)
+    results["read_whole"] = dict(summarize(whole), lines=count)
+    results["read_10_minutes"] = dict(summarize(window), lines=window_count)
+
+    # Retention deletes oldest sessions until archive fits in half of its size
+    archive = logarchive.LogArchive(os.path.join(tmp_dir, "logs-retention"), max_bytes=2 ** 40, max_age=0)
+    for i in range(20):
+        archive.append(unit, entries[i * 1000:(i + 1) * 1000], "bench{}".format(i))
+    archive.close()
+    archive.max_bytes = sum(s["bytes"] for s in archive.sessions()) // 2
+    start = time.perf_counter()
+    archive.apply_retention()
+    results["retention_s"] = round(time.perf_counter() - start, 4)
+    results["sessions_kept"] = "{} of 20".format(len(archive.sessions()))
+    return results
+
+
+def bench_network(changes, repeat, delay=100):
+    """Measure delay from network change (address added to loopback by `ip`, needs root)
+    to networkChanged signal and how burst of changes is coalesced, compared with polling interval"""
+    from qopenvpn import netmonitor
+
+    if os.geteuid() != 0 or not shutil.which("ip"):
+        return {"skipped": "needs root and ip command"}
+
+    monitor = netmonitor.NetworkMonitor(delay=delay)
+    received = []
+    monitor.networkChanged.connect(lambda events: received.append((time.perf_counter(), events)))
+    if not monitor.start():
+        return {"skipped": "rtnetlink isn't available"}
+
+    addresses = ["198.51.100.{}/32".format(i + 1) for i in range(changes)]
+    latencies, signals = [], []
+    try:
+        for i in range(repeat):
+            del received[:]
+            start = time.perf_counter()
+            for address in addresses:
+                subprocess.check_call(["ip", "addr", "add", address, "dev", "lo"])
+            wait_until(lambda: received)
+            latencies.append(received[0][0] - start)
+            for address in addresses:
+                subprocess.check_call(["ip", "addr", "del", address, "dev", "lo"])
+            wait_until(lambda: len(received) > 1)
+            signals.append(len(received))
+    finally:
+        monitor.stop()
+        for address in addresses:
+            subprocess.call(["ip", "addr", "del", address, "dev", "lo"], stderr=subprocess.DEVNULL)
+
+    return {"changes": changes * 2, "coalescing_delay_ms": delay, "signals_per_round": signals,
+            "change_to_signal": summarize(latencies), "poll_interval_ms": 5000}
+
+
+def parse_list(value, convert=int):
+    """Parse comma separated list of numbers"""
+    return [convert(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of QOpenVPN (uses only local stand-ins)")
+    parser.add_argument("-o", "--output", help="save results to file instead of printing them")
+    parser.add_argument("--only", type=lambda v: parse_list(v, str), default=list(BENCHMARKS),
+                        help="comma separated list of benchmarks to run ({})".format(", ".join(BENCHMARKS)))
+    parser.add_argument("-n", "--repeat", type=int, default=5,
+                        help="number of runs of startup and log viewer benchmarks (default: %(default)s)")
+    parser.add_argument("--units", type=parse_list, default=[1, 5, 20],
+                        help="numbers of monitored units for status poll and metrics benchmarks (default: 1,5,20)")
+    parser.add_argument("--ticks", type=int, default=20, help="number of status polls (default: %(default)s)")
+    parser.add_argument("--log-sizes", type=parse_list, default=[1000, 10000, 50000],
+                        help="journal sizes for log viewer benchmark (default: 1000,10000,50000)")
+    parser.add_argument("--scrapes", type=int, default=200,
+                        help="number of scrapes of metrics endpoint (default: %(default)s)")
+    parser.add_argument("--filter-lines", type=int, default=500000,
+                        help="number of log lines for log viewer filter benchmark (default: %(default)s)")
+    parser.add_argument("--switches", type=int, default=10,
+                        help="number of VPN switches for privileged operations benchmark (default: %(default)s)")
+    parser.add_argument("--sudo-delay", type=float, default=0.2,
+                        help="simulated duration of privilege escalation in seconds (default: %(default)s)")
+    parser.add_argument("--loss", type=lambda v: parse_list(v, float), default=[0.0, 0.1, 0.3, 0.5],
+                        help="packet loss rates for STUN benchmark (default: 0,0.1,0.3,0.5)")
+    parser.add_argument("--stun-servers", type=int, default=3,
+                        help="number of STUN responders raced by one lookup (default: %(default)s)")
+    parser.add_argument("--stun-lookups", type=int, default=20,
+                        help="number of STUN lookups for each loss rate (default: %(default)s)")
+    parser.add_argument("--stun-timeout", type=float, default=1,
+                        help="timeout of STUN lookup in seconds (default: %(default)s)")
+    parser.add_argument("--remotes", type=parse_list, default=[2, 8, 32],
+                        help="numbers of answering remotes for latency probing benchmark (default: 2,8,32)")
+    parser.add_argument("--probe-timeout", type=float, default=0.5,
+                        help="deadline of latency probing and DNS leak check in seconds (default: %(default)s)")
+    parser.add_argument("--dns-servers", type=parse_list, default=[2, 8, 32],
+                        help="numbers of answering stub resolvers for DNS leak check benchmark (default: 2,8,32)")
+    parser.add_argument("--history-days", type=int, default=180,
+                        help="length of generated connection history in days (default: %(default)s)")
+    parser.add_argument("--history-drops", type=float, default=20,
+                        help="drops per day in generated connection history (default: %(default)s)")
+    parser.add_argument("--history-units", type=int, default=3,
+                        help="number of units in generated connection history (default: %(default)s)")
+    parser.add_argument("--network-changes", type=int, default=20,
+                        help="number of addresses added and removed by network change benchmark (default: %(default)s)")
+    parser.add_argument("--archive-lines", type=int, default=200000,
+                        help="number of lines of archived log session (default: %(default)s)")
+    args = parser.parse_args()
+
+    unknown = set(args.only) - set(BENCHMARKS)
+    if unknown:
+        parser.error("unknown benchmarks: {}".format(", ".join(sorted(unknown))))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = setup_environment(tmp_dir)
+
+        # Startup is measured in separate processes, before settings are created by other benchmarks
+        if "startup" in args.only:
+            results["startup"] = bench_startup(env, args.repeat)
+
+        if "stun" in args.only:
+            results["stun_parse"] = bench_stun_parse()
+            results["stun"] = bench_stun(args.loss, args.stun_servers, args.stun_lookups, args.stun_timeout)
+
+        if "probe" in args.only:
+            results["probe"] = bench_probe(args.remotes, args.repeat, args.probe_timeout)
+
+        if "dns" in args.only:
+            results["dns"] = bench_dns(args.dns_servers, args.repeat, args.probe_timeout)
+
+        if "privileged" in args.only:
+            results["privileged"] = bench_privileged(tmp_dir, env, args.switches, args.sudo_delay)
+
+        if "history" in args.only:
+            results["history"] = bench_history(tmp_dir, args.history_days, args.history_drops,
+                                               args.history_units, args.repeat)
+
+        if "archive" in args.only:
+            results["archive"] = bench_archive(tmp_dir, args.archive_lines, args.repeat)
+
+        if any(name in args.only for name in ("poll", "logs", "filter", "metrics", "network")):
+            from PyQt5 import QtWidgets
+            from qopenvpn import core
+
+            app = QtWidgets.QApplication(sys.argv)
+            core.init_application_info()
+            app.setQuitOnLastWindowClosed(False)
+
+            if "poll" in args.only:
+                results["poll"] = bench_poll(env, args.units, args.ticks)
+
+            if "logs" in args.only:
+                responder = fakes.StunResponder()
+                responder.start()
+                try:
+                    results["logs"] = bench_logs(env, args.log_sizes, args.repeat, [responder.address])
+                finally:
+                    responder.stop()
+
+            if "network" in args.only:
+                results["network"] = bench_network(args.network_changes, args.repeat)
+
+            if "metrics" in args.only:
+                results["metrics"] = bench_metrics(env, args.units, args.scrapes)
+
+            if "filter" in args.only:
+                results["filter"] = bench_filter(env, args.filter_lines, args.repeat)
+
+            # Wait for background tasks (e.g. IP address lookups of log viewer)
+            from PyQt5 import QtCore
+            QtCore.QThreadPool.globalInstance().waitForDone()
+
+    report = {
+        "suite": "qopenvpn",
+        "time": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
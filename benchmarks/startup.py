@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""Startup benchmark of QOpenVPN tray icon.
+Measures import time of qopenvpn.__main__ (by `python -X importtime`) and time until
+tray icon is shown and event loop is running (on offscreen Qt platform).
+Results are printed in JSON format.
+"""
+
+import sys, os, json, argparse, statistics, subprocess, tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import sys
+from PyQt5 import QtCore, QtWidgets
+from qopenvpn import __main__ as qopenvpn_main
+imported = time.perf_counter()
+
+app = QtWidgets.QApplication(sys.argv)
+app.setApplicationName("QOpenVPNBenchmark")
+widget = qopenvpn_main.QOpenVPNWidget()
+constructed = time.perf_counter()
+
+def event_loop_started():
+    print(imported - start, constructed - start, time.perf_counter() - start)
+    app.quit()
+
+QtCore.QTimer.singleShot(0, event_loop_started)
+app.exec_()
+QtCore.QThreadPool.globalInstance().waitForDone()
+"""
+
+
+def benchmark_env(tmp_dir):
+    """Return environment for benchmarked process (isolated settings and cache, offscreen Qt platform)"""
+    env = dict(os.environ)
+    env["QT_QPA_PLATFORM"] = "offscreen"
+    env["XDG_CONFIG_HOME"] = os.path.join(tmp_dir, "config")
+    env["XDG_CACHE_HOME"] = os.path.join(tmp_dir, "cache")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (ROOT_DIR, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def parse_importtime(output):
+    """Parse output of `python -X importtime` to list of (module, self_us, cumulative_us)"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        fields = line[12:].split("|")
+        try:
+            modules.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+        except (IndexError, ValueError):
+            continue
+    return modules
+
+
+def measure_imports(env, top=15):
+    """Measure import time of qopenvpn.__main__"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import qopenvpn.__main__"],
+                          env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    modules = parse_importtime(proc.stderr.decode("utf8", errors="replace"))
+    total = next((cumulative for name, _, cumulative in modules if name == "qopenvpn.__main__"), 0)
+    slowest = sorted(modules, key=lambda m: m[1], reverse=True)[:top]
+    return {
+        "total_ms": total / 1000,
+        "modules": len(modules),
+        "qopenvpn_modules": sorted(name for name, _, _ in modules if name.startswith("qopenvpn")),
+        "slowest": [{"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative / 1000}
+                    for name, self_us, cumulative in slowest],
+    }
+
+
+def measure_startup(env):
+    """Measure time of imports, widget construction and start of event loop (in seconds)"""
+    output = subprocess.check_output([sys.executable, "-c", STARTUP_SCRIPT], env=env, stderr=subprocess.DEVNULL)
+    return [float(v) for v in output.decode("utf8").split()[-3:]]
+
+
+def summarize(values):
+    """Return summary statistics (in milliseconds)"""
+    return {
+        "min_ms": min(values) * 1000,
+        "median_ms": statistics.median(values) * 1000,
+        "max_ms": max(values) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup benchmark of QOpenVPN tray icon")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="number of runs (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports reported (default: %(default)s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = benchmark_env(tmp_dir)
+        imports = measure_imports(env, args.top)
+
+        # First run fills icon cache, it is reported separately
+        cold = measure_startup(env)
+        runs = [measure_startup(env) for i in range(args.repeat)]
+
+    result = {
+        "benchmark": "startup",
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "importtime": imports,
+        "cold": {"import_ms": cold[0] * 1000, "widget_ms": cold[1] * 1000, "event_loop_ms": cold[2] * 1000},
+        "import": summarize([r[0] for r in runs]),
+        "widget": summarize([r[1] for r in runs]),
+        "event_loop": summarize([r[2] for r in runs]),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
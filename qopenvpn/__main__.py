@@ -1,161 +1,121 @@
 #!/usr/bin/env python
 
-import sys, os, subprocess, socket, glob, signal
+import sys, os, signal, fnmatch
 from PyQt5 import QtCore, QtGui, QtWidgets
 
-from qopenvpn import stun
-from qopenvpn.ui_qopenvpnsettings import Ui_QOpenVPNSettings
-from qopenvpn.ui_qopenvpnlogviewer import Ui_QOpenVPNLogViewer
+# Dialogs, STUN client, management interface client and metrics exporter are imported on first use
+# (to speed up startup of tray icon)
+from qopenvpn import core, systemd, discovery, supervisor, task
+from qopenvpn.command import Command
 
 
+# Following of journal by log archive is given up after this many exits of journalctl without any entry
+ARCHIVE_MAX_FAILURES = 5
+
 # Allow CTRL+C and/or SIGTERM to kill us (PyQt blocks it otherwise)
 signal.signal(signal.SIGINT, signal.SIG_DFL)
 signal.signal(signal.SIGTERM, signal.SIG_DFL)
 
 
-class QOpenVPNSettings(QtWidgets.QDialog, Ui_QOpenVPNSettings):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setupUi(self)
-
-        settings = QtCore.QSettings()
-        self.sudoCommandEdit.setText(settings.value("sudo_command") or "kdesu")
-        self.sudoCheckBox.setChecked(settings.value("use_sudo", False, type=bool))
-        self.warningCheckBox.setChecked(settings.value("show_warning", False, type=bool))
-
-        # Checks for the new location of OpenVPN configuration files introduced in OpenVPN 2.4
-        # See https://github.com/OpenVPN/openvpn/blob/master/Changes.rst#user-visible-changes
-        # "The configuration files are picked up from the /etc/openvpn/server/ and
-        # /etc/openvpn/client/ directories (depending on unit file)."
-        # Remove this unaesthetic version check when openvpn 2.4 is widely accepcted
-        try:
-            output = subprocess.check_output(["/usr/bin/env", "openvpn", "--version"])
-        except subprocess.CalledProcessError as e:
-            output = e.output
-        except OSError:
-            print("OpenVPN executable not found!", file=sys.stderr)
-            output = ""
-
-        # Take second tuple of version output (i.e. `2.4.0`)
-        # and extract its major and minor components (i.e. 2 and 4)
-        version_string = output.decode("utf8").split()[1] if output else ""
-        version_components = version_string.split(".")
-        if len(version_components) >= 2:
-            major, minor = version_components[0:2]
-            major = int(major)
-            minor = int(minor)
-        else:
-            print("Couldn't determine the installed OpenVPN version, assuming v0.0", file=sys.stderr)
-            major = minor = 0
-
-        # Matches version 2.4.x or greater
-        if major >= 2 and minor >= 4:
-            settings.setValue("config_location", "/etc/openvpn/client/*.conf")
-            settings.setValue("service_name", "openvpn-client")
-        else:
-            settings.setValue("config_location", "/etc/openvpn/*.conf")
-            settings.setValue("service_name", "openvpn")
-
-        # Fill VPN combo box with .conf files from /etc/openvpn{,/client}
-        for f in sorted(glob.glob(settings.value("config_location"))):
-            vpn_name = os.path.splitext(os.path.basename(f))[0]
-            self.vpnNameComboBox.addItem(vpn_name)
-
-        i = self.vpnNameComboBox.findText(settings.value("vpn_name"))
-        if i > -1:
-            self.vpnNameComboBox.setCurrentIndex(i)
-
-    def accept(self):
-        settings = QtCore.QSettings()
-        settings.setValue("sudo_command", self.sudoCommandEdit.text())
-        settings.setValue("use_sudo", self.sudoCheckBox.isChecked())
-        settings.setValue("show_warning", self.warningCheckBox.isChecked())
-        settings.setValue("vpn_name", self.vpnNameComboBox.currentText())
-        QtWidgets.QDialog.accept(self)
-
-
-class QOpenVPNLogViewer(QtWidgets.QDialog, Ui_QOpenVPNLogViewer):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setupUi(self)
-        self.refreshButton.clicked.connect(self.refresh)
-        self.refresh()
-
-    def journalctl(self, disable_sudo=False):
-        """Run journalctl command and get OpenVPN logs"""
-        settings = QtCore.QSettings()
-        cmdline = []
-        if not disable_sudo and settings.value("use_sudo", type=bool):
-            cmdline.append(settings.value("sudo_command") or "sudo")
-        cmdline.extend([
-            "journalctl", "-b", "-u",
-            "{}@{}".format(settings.value("service_name"), settings.value("vpn_name"))
-        ])
-        try:
-            output = subprocess.check_output(cmdline)
-        except subprocess.CalledProcessError as e:
-            output = e.output
-        return output
-
-    def getip(self):
-        """Get external IP address and hostname"""
-        try:
-            stunclient = stun.StunClient()
-            ip, port = stunclient.get_ip()
-        except:
-            ip = ""
-
-        try:
-            hostname = socket.gethostbyaddr(ip)[0]
-        except:
-            hostname = ""
-
-        return (ip, hostname)
-
-    def refresh(self):
-        """Refresh logs"""
-        self.logViewerEdit.setPlainText(self.journalctl(disable_sudo=True).decode("utf8"))
-        QtCore.QTimer.singleShot(0, self.refresh_timeout)
-
-    def refresh_timeout(self):
-        """Move scrollbar to bottom and refresh IP address
-        (must be called by single shot timer or else scrollbar sometimes doesn't move)"""
-        self.logViewerEdit.verticalScrollBar().setValue(self.logViewerEdit.verticalScrollBar().maximum())
-
-        ip = self.getip()
-        self.ipAddressEdit.setText("{} ({})".format(ip[0], ip[1]) if ip[1] else ip[0])
-
-
 class QOpenVPNWidget(QtWidgets.QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.vpn_enabled = False
+        self.vpn_unit = ""
+        self.vpn_units = []
+        self.active_units = set()
+        self.stopping_units = set()
+        self.tunnel_menus = {}
+        self.switch_actions = {}
+        self.preparing = {}
+        self.next_prepare_id = 1
+        self.applied_remotes = {}
+        self.applied_kill_switch = None
+        self.killswitch_endpoints = {}
+        self.dns_checks = {}
+        self.running_dns_checks = {}
+        self.next_dns_check_id = 1
+        self.status_text = "QOpenVPN"
+        self.command = None
+        self.pending_commands = []
+        self.management = None
+        self.monitor = None
+        self.history = None
+        self.metrics = None
+        self.helper = None
+        self.log_archive = None
+        self.archive_journal = None
+        self.archive_failures = 0
+        self.archive_skipped_flushes = 0
+        self.network_monitor = None
 
         self.create_actions()
         self.create_menu()
         self.create_icon()
-        self.update_status()
 
-        # Update status every 10 seconds
-        self.timer = QtCore.QTimer(self)
-        self.timer.timeout.connect(self.update_status)
-        self.timer.start(5000)
+        # Discover OpenVPN version and configuration files in background
+        self.discovery = discovery.ConfigDiscovery(self)
+        self.discovery.updated.connect(self.discovery_updated)
+
+        # Restart OpenVPN automatically when it is disconnected (if it is enabled in settings)
+        self.supervisor = supervisor.ReconnectSupervisor(parent=self)
+        self.supervisor.restartRequested.connect(self.restart_requested)
+        self.supervisor.healthProbeFailed.connect(lambda unit: self.record_event(unit, "drop", "health probe failed"))
+        self.supervisor.message.connect(self.notify)
 
         # Setup system tray icon doubleclick timer
         self.icon_doubleclick_timer = QtCore.QTimer(self)
         self.icon_doubleclick_timer.setSingleShot(True)
         self.icon_doubleclick_timer.timeout.connect(self.icon_doubleclick_timeout)
 
+        # Archived log lines are written to disk periodically and when application quits
+        self.archive_timer = QtCore.QTimer(self)
+        self.archive_timer.timeout.connect(self.flush_log_archive)
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self.close_log_archive)
+
+        # Query OpenVPN status after event loop starts (tray icon is shown as soon as possible)
+        QtCore.QTimer.singleShot(0, self.start_monitoring)
+
+    def start_monitoring(self):
+        """Start tracking of OpenVPN service state"""
+        # Persistent history of connections (SQLite is imported only after tray icon is shown)
+        from qopenvpn import history
+        try:
+            self.history = history.HistoryStore()
+        except (OSError, history.sqlite3.Error) as e:
+            print("Couldn't open connection history: {}".format(e), file=sys.stderr)
+
+        # Track OpenVPN service state (via D-Bus signals, or by polling systemctl every 5 seconds
+        # if system bus isn't available)
+        self.monitor = systemd.UnitMonitor(poll_interval=5000, parent=self)
+        self.monitor.stateChanged.connect(self.unit_state_changed)
+
+        self.watch_units()
+        self.setup_management()
+        self.setup_supervisor()
+        self.setup_metrics()
+        self.setup_log_archive()
+        self.setup_network_monitor()
+        self.update_status()
+        self.discovery.refresh()
+
     def create_actions(self):
         """Create actions and connect relevant signals"""
         self.startAction = QtWidgets.QAction(self.tr("&Start"), self)
         self.startAction.triggered.connect(self.vpn_start)
         self.stopAction = QtWidgets.QAction(self.tr("S&top"), self)
         self.stopAction.triggered.connect(self.vpn_stop)
+        self.cancelAction = QtWidgets.QAction(self.tr("&Cancel"), self)
+        self.cancelAction.triggered.connect(self.cancel_command)
+        self.cancelAction.setVisible(False)
         self.settingsAction = QtWidgets.QAction(self.tr("S&ettings ..."), self)
         self.settingsAction.triggered.connect(self.settings)
         self.logsAction = QtWidgets.QAction(self.tr("Show &logs ..."), self)
         self.logsAction.triggered.connect(self.logs)
+        self.statsAction = QtWidgets.QAction(self.tr("Show st&atistics ..."), self)
+        self.statsAction.triggered.connect(self.stats)
+        self.historyAction = QtWidgets.QAction(self.tr("Show &history ..."), self)
+        self.historyAction.triggered.connect(self.show_history)
         self.quitAction = QtWidgets.QAction(self.tr("&Quit"), self)
         self.quitAction.triggered.connect(self.quit)
 
@@ -164,20 +124,37 @@ class QOpenVPNWidget(QtWidgets.QWidget):
         self.trayIconMenu = QtWidgets.QMenu(self)
         self.trayIconMenu.addAction(self.startAction)
         self.trayIconMenu.addAction(self.stopAction)
-        self.trayIconMenu.addSeparator()
+        self.trayIconMenu.addAction(self.cancelAction)
+        self.tunnelsSeparator = self.trayIconMenu.addSeparator()
+        self.switchMenu = self.trayIconMenu.addMenu(self.tr("S&witch VPN"))
+        self.switchMenu.menuAction().setVisible(False)
+        self.switchGroup = QtWidgets.QActionGroup(self)
+        self.switchGroup.setExclusive(True)
         self.trayIconMenu.addAction(self.settingsAction)
         self.trayIconMenu.addAction(self.logsAction)
+        self.trayIconMenu.addAction(self.statsAction)
+        self.trayIconMenu.addAction(self.historyAction)
         self.trayIconMenu.addSeparator()
         self.trayIconMenu.addAction(self.quitAction)
 
+    def load_icon(self, name, size=128):
+        """Load SVG icon rasterized to pixmap
+        (workaround for Plasma 5 not showing SVG icons, rasterized icons are cached on disk)"""
+        svg_path = "{}/{}.svg".format(os.path.dirname(os.path.abspath(__file__)), name)
+        cache_dir = QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.CacheLocation)
+        cache_path = "{}/icons/{}-{}-{}.png".format(cache_dir, name, size, int(os.path.getmtime(svg_path)))
+
+        pixmap = QtGui.QPixmap(cache_path)
+        if pixmap.isNull():
+            pixmap = QtGui.QIcon(svg_path).pixmap(size, size)
+            if QtCore.QDir().mkpath(os.path.dirname(cache_path)):
+                pixmap.save(cache_path, "PNG")
+        return QtGui.QIcon(pixmap)
+
     def create_icon(self):
         """Create system tray icon"""
-        self.iconActive = QtGui.QIcon("{}/openvpn.svg".format(os.path.dirname(os.path.abspath(__file__))))
-        self.iconDisabled = QtGui.QIcon("{}/openvpn_disabled.svg".format(os.path.dirname(os.path.abspath(__file__))))
-
-        # Workaround for Plasma 5 not showing SVG icons
-        self.iconActive = QtGui.QIcon(self.iconActive.pixmap(128, 128))
-        self.iconDisabled = QtGui.QIcon(self.iconDisabled.pixmap(128, 128))
+        self.iconActive = self.load_icon("openvpn")
+        self.iconDisabled = self.load_icon("openvpn_disabled")
 
         self.trayIcon = QtWidgets.QSystemTrayIcon(self)
         self.trayIcon.activated.connect(self.icon_activated)
@@ -186,65 +163,741 @@ class QOpenVPNWidget(QtWidgets.QWidget):
         self.trayIcon.setToolTip("QOpenVPN")
         self.trayIcon.show()
 
+    def watch_units(self):
+        """Watch state of systemd units for all monitored VPNs"""
+        units = core.unit_names()
+        if units == self.vpn_units:
+            return
+
+        for unit in self.vpn_units:
+            if unit not in units:
+                self.monitor.unwatch(unit)
+                self.active_units.discard(unit)
+        self.vpn_unit = units[0] if units else ""
+        self.vpn_units = units
+        self.create_tunnel_menus()
+        self.update_switch_menu()
+        for unit in units:
+            self.monitor.watch(unit)
+        if self.metrics:
+            self.metrics.set_units(units)
+
+    def create_tunnel_menus(self):
+        """Create submenu with start / stop actions for every monitored VPN"""
+        for menu, startAction, stopAction in self.tunnel_menus.values():
+            self.trayIconMenu.removeAction(menu.menuAction())
+            menu.deleteLater()
+        self.tunnel_menus = {}
+
+        # Submenus are shown only if more VPNs are monitored
+        if len(self.vpn_units) < 2:
+            return
+
+        for unit in self.vpn_units:
+            menu = QtWidgets.QMenu(core.vpn_name(unit), self.trayIconMenu)
+            startAction = menu.addAction(self.tr("&Start"))
+            startAction.triggered.connect(lambda checked=False, unit=unit: self.vpn_start(unit))
+            stopAction = menu.addAction(self.tr("S&top"))
+            stopAction.triggered.connect(lambda checked=False, unit=unit: self.vpn_stop(unit))
+            self.trayIconMenu.insertMenu(self.tunnelsSeparator, menu)
+            self.tunnel_menus[unit] = (menu, startAction, stopAction)
+
+    def create_switch_menu(self):
+        """Create submenu for quick switching of main VPN (from cached profiles, no files are read)"""
+        self.switchMenu.clear()
+        for action in self.switchGroup.actions():
+            self.switchGroup.removeAction(action)
+        self.switch_actions = {}
+
+        for profile in self.discovery.profiles():
+            summary = discovery.profile_summary(profile)
+            action = self.switchMenu.addAction("{} ({})".format(profile["name"], summary)
+                                               if summary else profile["name"])
+            action.setCheckable(True)
+            action.triggered.connect(lambda checked=False, vpn_name=profile["name"]: self.switch_vpn(vpn_name))
+            self.switchGroup.addAction(action)
+            self.switch_actions[profile["name"]] = action
+        self.switchMenu.menuAction().setVisible(bool(self.switch_actions))
+        self.update_switch_menu()
+
+    def update_switch_menu(self):
+        """Check currently selected VPN in switch submenu"""
+        action = self.switch_actions.get(core.vpn_name(self.vpn_unit)) if self.vpn_unit else None
+        if action:
+            action.setChecked(True)
+        else:
+            for action in self.switchGroup.actions():
+                action.setChecked(False)
+        self.switchMenu.setEnabled(self.command is None)
+
+    def switch_vpn(self, vpn_name):
+        """Select another VPN as main one (running VPN is switched over to it)"""
+        if self.command or core.vpn_name(self.vpn_unit) == vpn_name:
+            self.update_switch_menu()
+            return
+
+        settings = QtCore.QSettings()
+        settings.setValue("vpn_name", vpn_name)
+        self.apply_settings()
+
+    def discovery_updated(self):
+        """Watch other units if OpenVPN service name has changed"""
+        self.create_switch_menu()
+        if not self.command:
+            self.watch_units()
+            self.update_status(disable_warning=True)
+
+    def unit_state_changed(self, unit, state):
+        """Update GUI when state of watched systemd unit changes"""
+        if unit in self.vpn_units:
+            # External IP address most probably changes with VPN state
+            # (STUN client is imported only when external IP address has been requested)
+            stun = sys.modules.get("qopenvpn.stun")
+            if stun:
+                stun.invalidate_cache()
+            if self.log_archive and state in ("inactive", "failed"):
+                # Session ends with unit run (late lines of the same run are appended to it)
+                self.log_archive.close(unit)
+            self.update_status()
+
+    def setup_supervisor(self):
+        """Configure automatic reconnection according to settings"""
+        settings = QtCore.QSettings()
+        self.supervisor.set_enabled(settings.value("auto_reconnect", False, type=bool))
+        self.supervisor.set_probe_unit(self.vpn_unit)
+        self.supervisor.set_management(self.management)
+
+    def setup_metrics(self):
+        """Start or stop export of tunnel metrics in Prometheus format according to settings"""
+        settings = QtCore.QSettings()
+        if not settings.value("metrics_enabled", False, type=bool):
+            if self.metrics:
+                self.metrics.close()
+                self.metrics.deleteLater()
+                self.metrics = None
+            return
+
+        if not self.metrics:
+            from qopenvpn import metrics
+            self.metrics = metrics.MetricsExporter(self.monitor, self.supervisor, parent=self)
+        self.metrics.set_units(self.vpn_units)
+        self.metrics.set_management(self.management, self.vpn_unit)
+
+        # HTTP endpoint on localhost by default, textfile for node_exporter is optional
+        address = settings.value("metrics_address", "127.0.0.1:9176")
+        try:
+            if address:
+                self.metrics.listen(address)
+            else:
+                self.metrics.stop_listening()
+        except ValueError as e:
+            print(e, file=sys.stderr)
+        self.metrics.set_textfile(settings.value("metrics_textfile") or "",
+                                  settings.value("metrics_textfile_interval", 15, type=int))
+
+    def setup_log_archive(self):
+        """Start or stop archiving of logs of selected VPN according to settings"""
+        settings = QtCore.QSettings()
+        if not settings.value("log_archive", False, type=bool):
+            self.close_log_archive()
+            self.log_archive = None
+            return
+
+        from qopenvpn import journal, logarchive
+        if not self.log_archive:
+            try:
+                self.log_archive = logarchive.LogArchive()
+            except OSError as e:
+                print("Couldn't open log archive: {}".format(e), file=sys.stderr)
+                return
+        self.log_archive.max_bytes = settings.value("log_archive_max_mb", 50, type=int) * 1024 * 1024
+        self.log_archive.max_age = settings.value("log_archive_days", 90, type=int) * 86400
+
+        # Settings change or switch of VPN retries following of journal which kept failing
+        self.archive_failures = 0
+        self.archive_skipped_flushes = 0
+        if self.archive_journal and self.archive_journal.unit() == self.vpn_unit:
+            self.archive_journal.start()
+            return
+
+        # Journal is followed from last archived entry (entries logged while QOpenVPN wasn't running
+        # are archived too), sudo command isn't used in background
+        self.close_log_archive()
+        if not self.vpn_unit:
+            return
+        self.archive_journal = journal.JournalReader(
+            self.vpn_unit, lines=settings.value("log_buffer_lines", 100000, type=int),
+            sudo_command=core.sudo_command(True, settings), parent=self,
+            cursor=self.log_archive.last_cursor(self.vpn_unit), invocation_ids=True
+        )
+        self.archive_journal.entriesReceived.connect(self.archive_entries)
+        self.archive_journal.start()
+        self.archive_timer.start(settings.value("log_archive_flush_interval", 30, type=int) * 1000)
+
+    def archive_entries(self, entries):
+        """Append journal entries to log archive (every run of unit is archived as separate session)"""
+        if not self.log_archive:
+            return
+
+        # journalctl works, it is restarted without delay if it exits
+        self.archive_failures = 0
+        self.archive_skipped_flushes = 0
+        unit = self.archive_journal.unit()
+        groups = []
+        for timestamp, priority, line, invocation in entries:
+            if not groups or groups[-1][0] != invocation:
+                groups.append((invocation, []))
+            groups[-1][1].append((timestamp, priority, line))
+        for i, (invocation, group) in enumerate(groups):
+            cursor = self.archive_journal.cursor() if i == len(groups) - 1 else ""
+            try:
+                self.log_archive.append(unit, group, invocation, cursor)
+            except (OSError, ValueError) as e:
+                print("Couldn't archive logs: {}".format(e), file=sys.stderr)
+
+    def flush_log_archive(self):
+        """Write archived log lines to disk (and follow journal again if journalctl has exited)"""
+        if not self.log_archive:
+            return
+        try:
+            self.log_archive.flush()
+        except OSError as e:
+            print("Couldn't archive logs: {}".format(e), file=sys.stderr)
+        if self.archive_journal and not self.archive_journal.is_running():
+            self.restart_archive_journal()
+
+    def restart_archive_journal(self):
+        """Follow journal again after journalctl has exited (retries without received entries are done
+        after 1, 2, 4 and 8 flush intervals, then archiving is paused until settings or VPN change)"""
+        if self.archive_failures >= ARCHIVE_MAX_FAILURES:
+            return
+        if self.archive_skipped_flushes > 0:
+            self.archive_skipped_flushes -= 1
+            return
+
+        self.archive_failures += 1
+        if self.archive_failures >= ARCHIVE_MAX_FAILURES:
+            print("journalctl exited {} times, archiving of logs of {} is paused".format(
+                self.archive_failures, self.archive_journal.unit()), file=sys.stderr)
+            return
+        self.archive_skipped_flushes = 2 ** (self.archive_failures - 1) - 1
+        self.archive_journal.start()
+
+    def close_log_archive(self):
+        """Stop following journal and write all archived log lines to disk"""
+        self.archive_timer.stop()
+        if self.archive_journal:
+            self.archive_journal.close()
+            self.archive_journal = None
+        if self.log_archive:
+            try:
+                self.log_archive.close()
+            except OSError as e:
+                print("Couldn't archive logs: {}".format(e), file=sys.stderr)
+
+    def setup_network_monitor(self):
+        """Start or stop watching of network changes according to settings (fallback polling
+        of unit states is stretched while network changes are watched)"""
+        settings = QtCore.QSettings()
+        if settings.value("network_monitor", True, type=bool):
+            if not self.network_monitor:
+                from qopenvpn import netmonitor
+                self.network_monitor = netmonitor.NetworkMonitor(parent=self)
+                self.network_monitor.networkChanged.connect(self.network_changed)
+            if self.network_monitor.start():
+                self.monitor.set_poll_interval(settings.value("network_poll_interval", 60, type=int) * 1000)
+                return
+        elif self.network_monitor:
+            self.network_monitor.stop()
+        self.monitor.set_poll_interval(settings.value("poll_interval", 5, type=int) * 1000)
+
+    def network_changed(self, events):
+        """Check VPN again after network has changed (and reconnect it if it is enabled in settings)"""
+        settings = QtCore.QSettings()
+
+        # Changes of VPN interfaces and virtual interfaces only tell that some VPN went up or down
+        profile = self.discovery.profile(core.vpn_name(self.vpn_unit)) or {}
+        ignored = [p.strip() for p in settings.value("network_ignored_interfaces",
+                                                     "tun*,tap*,wg*,lo,docker*,veth*,virbr*,br-*").split(",")]
+        if profile.get("dev"):
+            ignored.append(profile["dev"])
+        changes = [(kind, iface) for kind, iface in events
+                   if not iface or not any(fnmatch.fnmatchcase(iface, p) for p in ignored if p)]
+
+        self.monitor.refresh()
+        if not changes:
+            return
+
+        # External IP address and latencies of remotes could be different in new network
+        # (modules are imported only if they have been used)
+        for name in ("qopenvpn.stun", "qopenvpn.latency"):
+            module = sys.modules.get(name)
+            if module:
+                module.invalidate_cache()
+
+        if self.vpn_unit in self.active_units:
+            self.schedule_dns_check(self.vpn_unit)
+            if self.supervisor.is_enabled():
+                self.supervisor.probe()
+
+        # Routes are changed also by OpenVPN itself, only resume, link and address changes
+        # mean that tunnel was established over network which isn't there anymore
+        if settings.value("network_reconnect", False, type=bool) and not self.command and \
+                any(kind in ("resume", "link", "address") for kind, iface in changes):
+            for unit in sorted(self.active_units - self.stopping_units):
+                self.record_event(unit, "reconnect", "network changed")
+                self.systemctl("restart", unit)
+
+    def record_event(self, unit, event, reason=""):
+        """Append VPN state transition to connection history
+        (with traffic statistics if they are known and external IP address looked up in background)"""
+        if not self.history:
+            return
+
+        bytes_in = bytes_out = None
+        if unit == self.vpn_unit and self.management and self.management.is_connected():
+            bytes_in, bytes_out = self.management.bytes_in, self.management.bytes_out
+
+        try:
+            event_id = self.history.record(unit, event, reason, bytes_in=bytes_in, bytes_out=bytes_out)
+        except Exception as e:
+            print("Couldn't save connection history: {}".format(e), file=sys.stderr)
+            return
+
+        if event == "up" and event_id:
+            # STUN client is imported in main thread (module imported by background thread
+            # could be seen half-initialized by unit_state_changed)
+            from qopenvpn import stun
+            task.run_task(event_id, stun.get_external_ip, callback=self.getip_finished)
+
+    def schedule_dns_check(self, unit):
+        """Check DNS leaks after VPN is connected (with delay, so that OpenVPN scripts
+        can update resolver configuration)"""
+        settings = QtCore.QSettings()
+        if settings.value("dns_check", True, type=bool):
+            QtCore.QTimer.singleShot(int(settings.value("dns_check_delay", 2, type=float) * 1000),
+                                     lambda: self.run_dns_check(unit))
+
+    def run_dns_check(self, unit):
+        """Check in background if DNS queries go through VPN interface"""
+        if unit not in self.active_units or unit in self.running_dns_checks.values():
+            return
+
+        # Modules are imported in main thread
+        from qopenvpn import dnscheck, killswitch
+        profile = self.discovery.profile(core.vpn_name(unit)) or {}
+        check_id, self.next_dns_check_id = self.next_dns_check_id, self.next_dns_check_id + 1
+        self.running_dns_checks[check_id] = unit
+        task.run_task(check_id, dnscheck.check, killswitch.interface_pattern(profile.get("dev", "")),
+                      callback=self.dns_check_finished)
+
+    def dns_check_finished(self, check_id, result):
+        """Show result of DNS check (and warn about DNS leak)"""
+        unit = self.running_dns_checks.pop(check_id, None)
+        if not result or unit not in self.active_units:
+            return
+
+        from qopenvpn import dnscheck
+        self.dns_checks[unit] = result
+        if result["status"] == dnscheck.STATUS_LEAK:
+            self.notify(self.tr("DNS queries of VPN {} are sent outside of VPN!").format(core.vpn_name(unit)) +
+                        "\n" + dnscheck.summary(result), QtWidgets.QSystemTrayIcon.Warning)
+        self.update_tooltip()
+
+    def getip_finished(self, event_id, address):
+        """Store external IP address of history event"""
+        if address and self.history:
+            self.history.set_external_ip(event_id, address[0])
+
+    def restart_requested(self, unit):
+        """Restart unit (requested by automatic reconnection)"""
+        attempts = [attempt for t, u, attempt, delay, reason in self.supervisor.history() if u == unit]
+        self.record_event(unit, "reconnect", "attempt {}".format(attempts[-1]) if attempts else "")
+        self.systemctl("restart", unit)
+
+    def notify(self, message, icon=QtWidgets.QSystemTrayIcon.Information):
+        """Show non-modal notification message"""
+        self.trayIcon.showMessage("QOpenVPN", message, icon)
+
+    def setup_management(self):
+        """Create client for OpenVPN management interface (if it is configured)"""
+        settings = QtCore.QSettings()
+        address = core.management_address(settings)
+        password = settings.value("management_password") or ""
+
+        if self.management:
+            self.management.close()
+            self.management.deleteLater()
+            self.management = None
+
+        if address:
+            from qopenvpn import management
+            try:
+                self.management = management.ManagementClient(address, password=password, parent=self)
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return
+            self.management.connectedChanged.connect(self.update_tooltip)
+            self.management.stateChanged.connect(self.update_tooltip)
+            self.management.bytecountChanged.connect(self.update_tooltip)
+
+    def update_tooltip(self, *args):
+        """Show OpenVPN state and traffic statistics in tray icon tooltip"""
+        tooltip = self.status_text
+        if self.management and self.management.is_connected():
+            m = self.management
+            tooltip += " - {}\n{}: {} ({})\n{}: {} ({})".format(
+                m.state or self.tr("UNKNOWN"),
+                self.tr("Received"), core.format_bytes(m.bytes_in), core.format_bytes(m.rate_in, "/s"),
+                self.tr("Sent"), core.format_bytes(m.bytes_out), core.format_bytes(m.rate_out, "/s")
+            )
+
+        if self.vpn_unit in self.dns_checks:
+            from qopenvpn import dnscheck
+            tooltip += "\n{}: {}".format(self.tr("DNS"), dnscheck.summary(self.dns_checks[self.vpn_unit]))
+
+        # Show state of all VPNs if more of them are monitored
+        if len(self.vpn_units) > 1:
+            for unit in self.vpn_units:
+                tooltip += "\n{}: {}".format(core.vpn_name(unit), self.monitor.state(unit))
+        self.trayIcon.setToolTip(tooltip)
+
     def update_status(self, disable_warning=False):
         """Update GUI according to OpenVPN status"""
         settings = QtCore.QSettings()
-        vpn_status = self.vpn_status()
-        if vpn_status:
-            self.trayIcon.setIcon(self.iconActive)
+        states = {unit: self.monitor.state(unit) for unit in self.vpn_units}
+        busy_states = ("activating", "deactivating", "reloading")
+        self.cancelAction.setVisible(self.command is not None or bool(self.preparing))
+        self.switchMenu.setEnabled(self.command is None)
+
+        # Update submenus of all VPNs and warn about disconnected ones
+        disconnected = []
+        for unit, state in states.items():
+            if unit in self.tunnel_menus:
+                menu, startAction, stopAction = self.tunnel_menus[unit]
+                menu.setTitle("{} ({})".format(core.vpn_name(unit), state))
+                startAction.setEnabled(state not in ("active",) + busy_states)
+                stopAction.setEnabled(state in ("active", "activating"))
+
+            if state == "active":
+                if unit not in self.stopping_units:
+                    if unit not in self.active_units and unit == self.vpn_unit:
+                        self.schedule_dns_check(unit)
+                    self.active_units.add(unit)
+                    self.supervisor.unit_active(unit)
+                    self.record_event(unit, "up")
+            elif state not in busy_states and unit in self.stopping_units:
+                # Unit has been stopped by user, it isn't unexpected disconnection
+                self.stopping_units.discard(unit)
+                self.record_event(unit, "down", "stopped")
+            elif state not in busy_states and unit in self.active_units:
+                self.active_units.discard(unit)
+                self.supervisor.unit_inactive(unit)
+                if not disable_warning:
+                    disconnected.append(core.vpn_name(unit))
+                    self.supervisor.unit_dropped(unit)
+                    self.record_event(unit, "drop", state)
+                else:
+                    self.record_event(unit, "down", state)
+            elif state in ("inactive", "failed") and self.history and self.history.last_state(unit) == "up":
+                # Unit went down while QOpenVPN wasn't running (outage after drop lasts until next up or stop)
+                self.record_event(unit, "down", state)
+
+        if disconnected and settings.value("show_warning", type=bool):
+            message = self.tr("You have been disconnected from VPN!") + "\n" + ", ".join(disconnected)
+            if settings.value("kill_switch_unit", ""):
+                message += "\n" + self.tr("Traffic outside of VPN is blocked by kill switch.")
+            self.notify(message, QtWidgets.QSystemTrayIcon.Warning)
+
+        self.vpn_enabled = self.vpn_unit in self.active_units
+        # Result of DNS check is valid only for one connection
+        for unit in list(self.dns_checks):
+            if unit not in self.active_units:
+                del self.dns_checks[unit]
+        for check_id, unit in list(self.running_dns_checks.items()):
+            if unit not in self.active_units:
+                del self.running_dns_checks[check_id]
+        self.trayIcon.setIcon(self.iconActive if self.active_units else self.iconDisabled)
+
+        vpn_state = states.get(self.vpn_unit, "unknown")
+        if self.command or vpn_state in busy_states or self.vpn_unit in self.preparing.values():
+            # Intermediate state (systemctl is still running, remotes are probed or unit is being started / stopped)
+            if vpn_state == "deactivating" or self.command_name() == "stop":
+                self.status_text = self.tr("QOpenVPN - Disconnecting ...")
+            else:
+                self.status_text = self.tr("QOpenVPN - Connecting ...")
             self.startAction.setEnabled(False)
-            self.stopAction.setEnabled(True)
-            self.vpn_enabled = True
+            self.stopAction.setEnabled(self.command is None)
         else:
-            self.trayIcon.setIcon(self.iconDisabled)
-            self.startAction.setEnabled(True)
-            self.stopAction.setEnabled(False)
+            self.status_text = "QOpenVPN"
+            self.startAction.setEnabled(bool(self.vpn_unit) and not self.vpn_enabled)
+            self.stopAction.setEnabled(self.vpn_enabled)
 
-            if not disable_warning and settings.value("show_warning", type=bool) and self.vpn_enabled:
-                QtWidgets.QMessageBox.warning(self, self.tr("QOpenVPN - Warning"),
-                                              self.tr("You have been disconnected from VPN!"))
-            self.vpn_enabled = False
+        if self.management:
+            if self.vpn_enabled:
+                self.management.open()
+            else:
+                self.management.close()
+        self.update_tooltip()
+
+    def systemctl(self, command, unit=None, disable_sudo=False, quiet=False, args=()):
+        """Run systemctl command asynchronously
+        (commands are queued and executed one after another)"""
+        self.pending_commands.append((command, unit or self.vpn_unit, disable_sudo, quiet, args))
+        if not self.command:
+            self.run_next_command()
+
+    def run_next_command(self):
+        """Start next queued systemctl command"""
+        if not self.pending_commands:
+            self.update_status(disable_warning=True)
+            return
 
-    def systemctl(self, command, disable_sudo=False, quiet=False):
-        """Run systemctl command"""
         settings = QtCore.QSettings()
-        cmdline = []
-        if not disable_sudo and settings.value("use_sudo", type=bool):
-            cmdline.append(settings.value("sudo_command") or "sudo")
-        cmdline.extend([
-            "systemctl", command,
-            "{}@{}".format(settings.value("service_name"), settings.value("vpn_name"))
-        ])
-        stdout = stderr = subprocess.DEVNULL if quiet else None
-        return subprocess.call(cmdline, stdout=stdout, stderr=stderr)
-
-    def vpn_start(self):
-        """Start OpenVPN service"""
-        retcode = self.systemctl("start")
-        if retcode == 0:
-            self.update_status()
+        command, unit, disable_sudo, quiet, args = self.pending_commands.pop(0)
+        if command in ("stop", "restart"):
+            # Unit is deactivated by this command, it isn't unexpected disconnection
+            self.active_units.discard(unit)
+        if command == "stop":
+            self.stopping_units.add(unit)
+
+        # Give user enough time to enter password when sudo (or kdesu / polkit) asks for it
+        timeout = settings.value("command_timeout", 120, type=int) * 1000
+        self.command = self.create_command(command, unit, disable_sudo, timeout, quiet, settings, args)
+        self.command.finished.connect(lambda retcode: self.command_finished(command, unit, retcode, args))
+        self.command.start()
+        self.update_status(disable_warning=True)
+
+    def create_command(self, command, unit, disable_sudo, timeout, quiet, settings, args=()):
+        """Create systemctl command (or systemd D-Bus job / request for privileged helper,
+        so that privileges aren't escalated again for every command)"""
+        backend = settings.value("privileged_backend", "systemctl")
+        if command not in ("start", "stop", "restart"):
+            # Remote server override and kill switch are done by privileged helper (long-lived one
+            # if it is enabled or if it is run by pkexec, which would ask for password for every command)
+            from qopenvpn import privileged
+            if not disable_sudo and (backend == "helper" or not core.sudo_command(False, settings)):
+                return self.get_helper().command(command, unit, timeout=timeout, parent=self, args=args)
+            cmdline = privileged.helper_cmdline([command, unit] + list(args), disable_sudo, settings)
+            return Command(cmdline, timeout=timeout, quiet=quiet, parent=self, name=command)
+
+        if backend != "systemctl" and not disable_sudo:
+            from qopenvpn import privileged
+            if backend == "dbus" and privileged.is_dbus_available():
+                return privileged.UnitJob(command, unit, timeout=timeout, parent=self)
+            elif backend == "helper":
+                return self.get_helper().command(command, unit, timeout=timeout, parent=self)
+
+        cmdline = core.systemctl_cmdline(command, unit, disable_sudo, settings)
+        return Command(cmdline, timeout=timeout, quiet=quiet, parent=self, name=command)
+
+    def get_helper(self):
+        """Return client of privileged helper (helper itself is started by first request)"""
+        if not self.helper:
+            from qopenvpn import privileged
+            self.helper = privileged.HelperClient(parent=self)
+            QtWidgets.QApplication.instance().aboutToQuit.connect(self.helper.close)
+        return self.helper
+
+    def command_name(self):
+        """Return name of currently running command (start, stop, restart or helper command)"""
+        return self.command.name() if self.command else ""
+
+    def command_finished(self, command, unit, retcode, args=()):
+        """Handle finished systemctl command"""
+        self.command.deleteLater()
+        self.command = None
+
+        if command in ("killswitch-on", "killswitch-off"):
+            # VPN is started even if kill switch couldn't be enabled (user is warned)
+            settings = QtCore.QSettings()
+            if retcode == 0:
+                self.applied_kill_switch = (unit, tuple(args)) if command == "killswitch-on" else None
+                settings.setValue("kill_switch_unit", unit if command == "killswitch-on" else "")
+            else:
+                self.applied_kill_switch = None
+                self.notify(self.tr("Couldn't enable kill switch!") if command == "killswitch-on"
+                            else self.tr("Couldn't disable kill switch!"), QtWidgets.QSystemTrayIcon.Warning)
+        elif command in ("set-remote", "reset-remote"):
+            # VPN is started anyway (OpenVPN tries remotes in order of configuration file)
+            if retcode == 0:
+                self.applied_remotes[unit] = tuple(args) or None
+            else:
+                self.applied_remotes.pop(unit, None)
+                print("Couldn't {} of {}, starting it with default order of remotes".format(command, unit),
+                      file=sys.stderr)
+        elif retcode == 0:
+            self.monitor.refresh(unit)
+        elif command == "stop":
+            self.stopping_units.discard(unit)
+            self.pending_commands.clear()
+        elif command == "restart":
+            # Automatic reconnection failed, try it again later
+            self.supervisor.unit_dropped(unit, reason="restart failed")
+            self.pending_commands.clear()
+        else:
+            # Don't continue with queued commands if something went wrong
+            self.pending_commands.clear()
+
+        self.run_next_command()
 
-    def vpn_stop(self):
-        """Stop OpenVPN service"""
-        retcode = self.systemctl("stop")
-        if retcode == 0:
+    def cancel_command(self):
+        """Cancel running systemctl command (and all queued commands and remote probes)"""
+        self.preparing.clear()
+        self.pending_commands.clear()
+        if self.command:
+            self.command.cancel()
+        else:
             self.update_status(disable_warning=True)
 
-    def vpn_status(self):
+    def vpn_start(self, unit=None):
+        """Start OpenVPN service (with the fastest remote server first if remote probing is enabled
+        and with kill switch if it is enabled)"""
+        unit = unit or self.vpn_unit
+        if not unit:
+            return
+        self.supervisor.cancel(unit)
+        if unit in self.preparing.values():
+            return
+
+        settings = QtCore.QSettings()
+        profile = self.discovery.profile(core.vpn_name(unit)) or {}
+        remotes = profile.get("remotes", [])
+        probe = settings.value("remote_probing", False, type=bool) and len(remotes) > 1
+        kill_switch = settings.value("kill_switch", False, type=bool) and unit == self.vpn_unit
+        if not probe and not kill_switch:
+            self.systemctl("start", unit)
+            return
+
+        # Probe remotes and resolve their addresses in background (modules are imported in main thread)
+        # and start VPN when it finishes
+        from qopenvpn import latency, killswitch
+        prepare_id, self.next_prepare_id = self.next_prepare_id, self.next_prepare_id + 1
+        self.preparing[prepare_id] = unit
+        task.run_task(prepare_id, self.prepare_start, latency, killswitch, remotes, probe,
+                      killswitch.interface_pattern(profile.get("dev", "")) if kill_switch else None,
+                      settings.value("remote_probe_timeout", 2, type=float),
+                      settings.value("remote_probe_cache_ttl", 300, type=int),
+                      callback=self.prepare_finished)
+        self.update_status(disable_warning=True)
+
+    @staticmethod
+    def prepare_start(latency, killswitch, remotes, probe, interface, timeout, ttl):
+        """Find the fastest remote and resolve endpoints of all remotes and DNS servers outside
+        of VPN interface for kill switch (runs in background thread)"""
+        remote = latency.fastest_remote(remotes, timeout, ttl) if probe else None
+        endpoints = None
+        if interface:
+            # Kill switch isn't enabled by DNS servers alone
+            endpoints = killswitch.resolve_endpoints(remotes)
+            if endpoints:
+                endpoints += [e for e in killswitch.dns_endpoints(interface) if e not in endpoints]
+        return (remote, endpoints)
+
+    def prepare_finished(self, prepare_id, result):
+        """Enable kill switch, override remote server of unit by the fastest one and start it"""
+        unit = self.preparing.pop(prepare_id, None)
+        if not unit:
+            return
+
+        remote, endpoints = result or (None, None)
+        if endpoints is not None:
+            self.enable_kill_switch(unit, endpoints)
+
+        # Drop-in is rewritten only if the fastest remote has changed (or removed if no remote answered
+        # and this session has set one)
+        args = tuple(str(v) for v in remote) if remote else ()
+        if args and self.applied_remotes.get(unit) != args:
+            self.systemctl("set-remote", unit, args=args)
+        elif not args and self.applied_remotes.get(unit) is not None:
+            self.systemctl("reset-remote", unit)
+        self.systemctl("start", unit)
+
+    def enable_kill_switch(self, unit, endpoints):
+        """Queue loading of kill switch ruleset (unless the same one is already active)"""
+        from qopenvpn import killswitch
+        if endpoints:
+            self.killswitch_endpoints[unit] = endpoints
+        else:
+            # Names can't be resolved when kill switch blocks DNS after unexpected drop
+            endpoints = self.killswitch_endpoints.get(unit, [])
+
+        if not endpoints:
+            self.notify(self.tr("Kill switch can't be enabled, addresses of VPN servers are unknown "
+                                "(configuration file isn't readable or names can't be resolved)"),
+                        QtWidgets.QSystemTrayIcon.Warning)
+            return
+
+        profile = self.discovery.profile(core.vpn_name(unit)) or {}
+        args = (killswitch.interface_pattern(profile.get("dev", "")),) + tuple(endpoints)
+        if self.applied_kill_switch != (unit, args):
+            self.systemctl("killswitch-on", unit, args=args)
+
+    def vpn_stop(self, unit=None, lift_kill_switch=True):
+        """Stop OpenVPN service (kill switch is lifted only by explicit stop, it stays after unexpected drop)"""
+        unit = unit or self.vpn_unit
+        self.supervisor.cancel(unit)
+        self.systemctl("stop", unit)
+
+        settings = QtCore.QSettings()
+        if lift_kill_switch and settings.value("kill_switch_unit", "") == unit:
+            self.systemctl("killswitch-off", unit)
+
+    def vpn_status(self, unit=None):
         """Check if OpenVPN service is running"""
-        retcode = self.systemctl("is-active", disable_sudo=True, quiet=True)
-        return True if retcode == 0 else False
+        return self.monitor.state(unit or self.vpn_unit) == "active"
 
     def settings(self):
         """Show settings dialog"""
-        dialog = QOpenVPNSettings(self)
-        if dialog.exec_() and self.vpn_enabled:
-            self.vpn_stop()
-            self.vpn_start()
+        from qopenvpn.dialogs import QOpenVPNSettings
+        dialog = QOpenVPNSettings(self.discovery, self)
+        if dialog.exec_():
+            self.apply_settings()
+
+    def apply_settings(self):
+        """Apply changed settings (and switch running VPN over to newly selected one)"""
+        # Restart OpenVPN if it is running (old unit is stopped, newly selected one is started,
+        # same unit is restarted by one command)
+        settings = QtCore.QSettings()
+        kill_switch = settings.value("kill_switch", False, type=bool)
+        old_unit = self.vpn_unit
+        if self.vpn_enabled:
+            self.watch_units()
+            if self.vpn_unit == old_unit:
+                self.supervisor.cancel(old_unit)
+                self.systemctl("restart", old_unit)
+            else:
+                # Kill switch of old VPN is atomically replaced by kill switch of new one
+                self.vpn_stop(old_unit, lift_kill_switch=not kill_switch)
+                self.vpn_start()
+        else:
+            self.watch_units()
+
+        if not kill_switch and settings.value("kill_switch_unit", ""):
+            self.systemctl("killswitch-off", settings.value("kill_switch_unit"))
+        self.setup_management()
+        self.setup_supervisor()
+        self.setup_metrics()
+        self.setup_log_archive()
+        self.setup_network_monitor()
+        self.update_status(disable_warning=True)
 
     def logs(self):
         """Show log viewer dialog"""
-        dialog = QOpenVPNLogViewer(self)
+        from qopenvpn.dialogs import QOpenVPNLogViewer
+        dialog = QOpenVPNLogViewer(self.log_archive, self, network_monitor=self.network_monitor)
+        dialog.exec_()
+
+    def stats(self):
+        """Show statistics dialog"""
+        from qopenvpn.dialogs import QOpenVPNStats
+        dialog = QOpenVPNStats(self.management, self.supervisor, self)
+        dialog.exec_()
+
+    def show_history(self):
+        """Show connection history dialog"""
+        from qopenvpn.dialogs import QOpenVPNHistory
+        dialog = QOpenVPNHistory(self.history, self)
         dialog.exec_()
 
     def icon_activated(self, reason):
@@ -252,6 +905,8 @@ class QOpenVPNWidget(QtWidgets.QWidget):
         if reason == QtWidgets.QSystemTrayIcon.Trigger or reason == QtWidgets.QSystemTrayIcon.DoubleClick:
             if self.icon_doubleclick_timer.isActive():
                 self.icon_doubleclick_timer.stop()
+                if self.command:
+                    return
                 if self.vpn_enabled:
                     self.vpn_stop()
                 else:
@@ -265,7 +920,7 @@ class QOpenVPNWidget(QtWidgets.QWidget):
 
     def quit(self):
         """Quit QOpenVPN GUI (and ask before quitting if OpenVPN is still running)"""
-        if self.vpn_enabled:
+        if self.active_units:
             reply = QtWidgets.QMessageBox.question(
                 self, self.tr("QOpenVPN - Quit"),
                 self.tr("You are still connected to VPN! Do you really want to quit "
@@ -280,13 +935,20 @@ class QOpenVPNWidget(QtWidgets.QWidget):
 
 def main():
     app = QtWidgets.QApplication(sys.argv)
-    app.setOrganizationName("QOpenVPN")
-    app.setOrganizationDomain("qopenvpn.eutopia.cz")
-    app.setApplicationName("QOpenVPN")
+    core.init_application_info()
     app.setQuitOnLastWindowClosed(False)
     window = QOpenVPNWidget()
-    sys.exit(app.exec_())
+    retcode = app.exec_()
+
+    # Wait for background tasks, their results can't be delivered after application is destroyed
+    QtCore.QThreadPool.globalInstance().waitForDone()
+    sys.exit(retcode)
 
 
 if __name__ == "__main__":
-    main()
+    # Run command line interface if some command is specified (e.g. `python -m qopenvpn status`)
+    if len(sys.argv) > 1:
+        from qopenvpn import cli
+        cli.main()
+    else:
+        main()
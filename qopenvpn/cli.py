@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""Command line interface of QOpenVPN (for headless machines without system tray),
+installed as qopenvpnctl command.
+"""
+
+import sys, json, time, signal, argparse, subprocess
+
+from qopenvpn import core
+
+
+def get_units(vpn_names, default_all=True):
+    """Return systemd units for VPN names (or for all monitored / selected VPN if no name is specified)"""
+    if vpn_names:
+        return [core.unit_name(name) for name in vpn_names]
+    units = core.unit_names()
+    if not units:
+        print("No VPN is selected (select it in QOpenVPN settings or specify VPN name)", file=sys.stderr)
+        sys.exit(1)
+    return units if default_all else units[:1]
+
+
+def get_states(units):
+    """Get states of units by one `systemctl is-active` call"""
+    try:
+        output = subprocess.check_output(["systemctl", "is-active"] + units, stderr=subprocess.DEVNULL)
+    except subprocess.CalledProcessError as e:
+        output = e.output
+    except OSError:
+        output = b""
+
+    states = output.decode("utf8").split()
+    if len(states) != len(units):
+        states = ["unknown"] * len(units)
+    return states
+
+
+def print_json(data):
+    """Print data as one line of JSON"""
+    print(json.dumps(data), flush=True)
+
+
+def cmd_status(args):
+    """Show state of VPNs"""
+    units = get_units(args.vpn)
+    states = get_states(units)
+    if args.json:
+        print_json([{"vpn": core.vpn_name(u), "unit": u, "state": s} for u, s in zip(units, states)])
+    else:
+        for unit, state in zip(units, states):
+            print("{}: {}".format(core.vpn_name(unit), state))
+    return 0 if all(state == "active" for state in states) else 3
+
+
+def cmd_systemctl(args):
+    """Start or stop VPN"""
+    unit = get_units([args.vpn] if args.vpn else [], default_all=False)[0]
+    return subprocess.call(core.systemctl_cmdline(args.command, unit, args.no_sudo))
+
+
+def cmd_ip(args):
+    """Show external IPv4 and IPv6 addresses (and hostnames)"""
+    import socket
+    from qopenvpn import stun
+
+    try:
+        addresses = stun.get_external_addresses()
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    result = []
+    for family, (ip, port) in sorted(addresses.items()):
+        hostname = ""
+        if not args.no_hostname:
+            try:
+                hostname = socket.gethostbyaddr(ip)[0]
+            except OSError:
+                pass
+        result.append({"family": "ipv6" if family == socket.AF_INET6 else "ipv4",
+                       "ip": ip, "port": port, "hostname": hostname})
+
+    if args.json:
+        print_json(result)
+    else:
+        for address in result:
+            print("{} ({})".format(address["ip"], address["hostname"]) if address["hostname"] else address["ip"])
+    return 0
+
+
+def cmd_watch(args):
+    """Stream state changes of VPNs as JSON lines"""
+    from PyQt5 import QtCore
+    from qopenvpn import systemd
+
+    app = QtCore.QCoreApplication(sys.argv)
+    monitor = systemd.UnitMonitor(poll_interval=args.interval * 1000)
+    monitor.stateChanged.connect(lambda unit, state: print_json({
+        "time": time.time(), "vpn": core.vpn_name(unit), "unit": unit, "state": state
+    }))
+    for unit in get_units(args.vpn):
+        monitor.watch(unit)
+    return app.exec_()
+
+
+def create_parser():
+    """Create parser of command line arguments"""
+    parser = argparse.ArgumentParser(
+        prog="qopenvpnctl",
+        description="Command line interface of QOpenVPN (simple OpenVPN GUI written in PyQt "
+                    "for systemd based distributions)"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    status_parser = subparsers.add_parser("status", help="show state of VPNs")
+    status_parser.add_argument("vpn", nargs="*", help="VPN names (default: all monitored VPNs)")
+    status_parser.add_argument("--json", action="store_true", help="print output in JSON format")
+    status_parser.set_defaults(func=cmd_status)
+
+    for command, help_text in (("start", "start VPN"), ("stop", "stop VPN")):
+        systemctl_parser = subparsers.add_parser(command, help=help_text)
+        systemctl_parser.add_argument("vpn", nargs="?", help="VPN name (default: selected VPN)")
+        systemctl_parser.add_argument("--no-sudo", action="store_true", help="don't use sudo command from settings")
+        systemctl_parser.set_defaults(func=cmd_systemctl)
+
+    ip_parser = subparsers.add_parser("ip", help="show external IPv4 and IPv6 addresses")
+    ip_parser.add_argument("--json", action="store_true", help="print output in JSON format")
+    ip_parser.add_argument("--no-hostname", action="store_true", help="don't look up hostname")
+    ip_parser.set_defaults(func=cmd_ip)
+
+    watch_parser = subparsers.add_parser("watch", help="stream state changes of VPNs as JSON lines")
+    watch_parser.add_argument("vpn", nargs="*", help="VPN names (default: all monitored VPNs)")
+    watch_parser.add_argument("--interval", type=int, default=5,
+                              help="polling interval in seconds if system bus isn't available (default: %(default)s)")
+    watch_parser.set_defaults(func=cmd_watch)
+
+    return parser
+
+
+def main(argv=None):
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        sys.exit(2)
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    core.init_application_info()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
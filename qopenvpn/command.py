@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""Asynchronous execution of external commands (so that Qt event loop never blocks on child process)"""
+
+from PyQt5 import QtCore
+
+
+class Command(QtCore.QObject):
+    """Run external command by QProcess, with optional timeout and cancellation
+
+    finished signal is emitted exactly once with exit code of command
+    (or -1 if command couldn't be started, crashed, timed out or was cancelled).
+    """
+    finished = QtCore.pyqtSignal(int)
+
+    def __init__(self, cmdline, timeout=0, capture=False, quiet=False, parent=None, name=""):
+        super().__init__(parent)
+        self._cmdline = list(cmdline)
+        self._name = name or self._cmdline[0]
+        self._done = False
+        self._cancelled = False
+        self._output = b""
+
+        self._process = QtCore.QProcess(self)
+        if quiet:
+            self._process.setProcessChannelMode(QtCore.QProcess.SeparateChannels)
+            self._process.setStandardErrorFile(QtCore.QProcess.nullDevice())
+            if not capture:
+                self._process.setStandardOutputFile(QtCore.QProcess.nullDevice())
+        elif capture:
+            self._process.setProcessChannelMode(QtCore.QProcess.ForwardedErrorChannel)
+        else:
+            self._process.setProcessChannelMode(QtCore.QProcess.ForwardedChannels)
+        self._process.finished.connect(self._process_finished)
+        self._process.errorOccurred.connect(self._process_error)
+
+        # Timeout timer (command is cancelled when it runs for too long)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.cancel)
+        self._timeout = timeout
+
+    def cmdline(self):
+        """Return command line of command"""
+        return list(self._cmdline)
+
+    def name(self):
+        """Return name of command (e.g. systemctl subcommand, defaults to executable)"""
+        return self._name
+
+    def start(self):
+        """Start command"""
+        self._process.start(self._cmdline[0], self._cmdline[1:])
+        if self._timeout > 0:
+            self._timer.start(self._timeout)
+
+    def cancel(self):
+        """Cancel running command (it is killed if it doesn't terminate in 3 seconds)"""
+        if self._done or self._process.state() == QtCore.QProcess.NotRunning:
+            return
+
+        self._cancelled = True
+        self._process.terminate()
+        QtCore.QTimer.singleShot(3000, self._kill)
+
+    def is_running(self):
+        """Return True if command is still running"""
+        return not self._done
+
+    def output(self):
+        """Return captured standard output of finished command"""
+        return self._output
+
+    def _kill(self):
+        """Kill command if it is still running"""
+        if self._process.state() != QtCore.QProcess.NotRunning:
+            self._process.kill()
+
+    def _finish(self, exit_code):
+        """Emit finished signal (only once)"""
+        if self._done:
+            return
+
+        self._done = True
+        self._timer.stop()
+        self.finished.emit(exit_code)
+
+    def _process_finished(self, exit_code, exit_status):
+        """Handle finished process"""
+        self._output = bytes(self._process.readAllStandardOutput())
+        if self._cancelled or exit_status != QtCore.QProcess.NormalExit:
+            exit_code = -1
+        self._finish(exit_code)
+
+    def _process_error(self, error):
+        """Handle process which couldn't be started"""
+        if error == QtCore.QProcess.FailedToStart:
+            self._finish(-1)
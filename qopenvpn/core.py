@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""GUI-independent core of QOpenVPN shared by tray icon and command line interface
+(it doesn't import PyQt5 widgets, so it can be used on headless machines)"""
+
+from PyQt5 import QtCore
+
+ORGANIZATION_NAME = "QOpenVPN"
+ORGANIZATION_DOMAIN = "qopenvpn.eutopia.cz"
+APPLICATION_NAME = "QOpenVPN"
+
+
+def init_application_info():
+    """Set application info used by QSettings (settings are shared by GUI and CLI)"""
+    QtCore.QCoreApplication.setOrganizationName(ORGANIZATION_NAME)
+    QtCore.QCoreApplication.setOrganizationDomain(ORGANIZATION_DOMAIN)
+    QtCore.QCoreApplication.setApplicationName(APPLICATION_NAME)
+
+
+def unit_name(vpn_name, settings=None):
+    """Return name of systemd unit for VPN"""
+    settings = settings or QtCore.QSettings()
+    return "{}@{}".format(settings.value("service_name") or "openvpn-client", vpn_name)
+
+
+def vpn_name(unit):
+    """Return VPN name from name of systemd unit"""
+    return unit.partition("@")[2]
+
+
+def unit_names(settings=None):
+    """Return names of systemd units for all monitored VPNs (selected VPN is first)"""
+    settings = settings or QtCore.QSettings()
+    vpn_names = [settings.value("vpn_name")] + settings.value("vpn_names", [], type=list)
+    units = []
+    for name in vpn_names:
+        if not name:
+            continue
+        unit = unit_name(name, settings)
+        if unit not in units:
+            units.append(unit)
+    return units
+
+
+def sudo_command(disable_sudo=False, settings=None):
+    """Return command used for privilege escalation (or empty string if sudo is disabled)"""
+    settings = settings or QtCore.QSettings()
+    if not disable_sudo and settings.value("use_sudo", type=bool):
+        return settings.value("sudo_command") or "sudo"
+    return ""
+
+
+def systemctl_cmdline(command, unit, disable_sudo=False, settings=None):
+    """Return command line of systemctl command (prefixed by sudo command if it is enabled)"""
+    cmdline = []
+    sudo = sudo_command(disable_sudo, settings)
+    if sudo:
+        cmdline.append(sudo)
+    cmdline.extend(["systemctl", command, unit])
+    return cmdline
+
+
+def management_address(settings=None):
+    """Return address of OpenVPN management interface for selected VPN (%i is replaced by VPN name)"""
+    settings = settings or QtCore.QSettings()
+    address = settings.value("management_address") or ""
+    return address.replace("%i", settings.value("vpn_name") or "")
+
+
+def format_bytes(count, suffix=""):
+    """Format number of bytes in human readable form"""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(count) < 1024 or unit == "GiB":
+            break
+        count /= 1024
+    return "{:.1f} {}{}".format(count, unit, suffix) if unit != "B" else "{} {}{}".format(int(count), unit, suffix)
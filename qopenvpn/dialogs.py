@@ -0,0 +1,511 @@
+#!/usr/bin/env python
+"""Dialogs of QOpenVPN GUI (imported on first use to speed up startup of tray icon)"""
+
+import socket, time
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from qopenvpn import core, stun, journal, task, logbuffer, discovery
+from qopenvpn.ui_qopenvpnsettings import Ui_QOpenVPNSettings
+from qopenvpn.ui_qopenvpnlogviewer import Ui_QOpenVPNLogViewer
+from qopenvpn.ui_qopenvpnstats import Ui_QOpenVPNStats
+from qopenvpn.ui_qopenvpnhistory import Ui_QOpenVPNHistory
+
+
+class QOpenVPNSettings(QtWidgets.QDialog, Ui_QOpenVPNSettings):
+    PRIVILEGED_BACKENDS = (("systemctl", QtCore.QT_TRANSLATE_NOOP("QOpenVPNSettings",
+                                                                  "Run systemctl (sudo for every command)")),
+                           ("dbus", QtCore.QT_TRANSLATE_NOOP("QOpenVPNSettings", "systemd D-Bus API (polkit)")),
+                           ("helper", QtCore.QT_TRANSLATE_NOOP("QOpenVPNSettings",
+                                                               "Privileged helper (sudo once per session)")))
+
+    def __init__(self, config_discovery, parent=None):
+        super().__init__(parent)
+        self.setupUi(self)
+
+        settings = QtCore.QSettings()
+        self.sudoCommandEdit.setText(settings.value("sudo_command") or "kdesu")
+        self.sudoCheckBox.setChecked(settings.value("use_sudo", False, type=bool))
+        self.warningCheckBox.setChecked(settings.value("show_warning", False, type=bool))
+        self.autoReconnectCheckBox.setChecked(settings.value("auto_reconnect", False, type=bool))
+        self.remoteProbingCheckBox.setChecked(settings.value("remote_probing", False, type=bool))
+        self.killSwitchCheckBox.setChecked(settings.value("kill_switch", False, type=bool))
+        self.dnsCheckBox.setChecked(settings.value("dns_check", True, type=bool))
+        self.logArchiveCheckBox.setChecked(settings.value("log_archive", False, type=bool))
+        self.networkMonitorCheckBox.setChecked(settings.value("network_monitor", True, type=bool))
+        self.networkReconnectCheckBox.setChecked(settings.value("network_reconnect", False, type=bool))
+        self.managementAddressEdit.setText(settings.value("management_address") or "")
+        self.managementPasswordEdit.setText(settings.value("management_password") or "")
+        for value, name in self.PRIVILEGED_BACKENDS:
+            self.privilegedComboBox.addItem(QtCore.QCoreApplication.translate("QOpenVPNSettings", name), value)
+        self.privilegedComboBox.setCurrentIndex(
+            max(self.privilegedComboBox.findData(settings.value("privileged_backend", "systemctl")), 0))
+        self.metricsCheckBox.setChecked(settings.value("metrics_enabled", False, type=bool))
+        self.metricsAddressEdit.setText(settings.value("metrics_address", "127.0.0.1:9176"))
+        self.metricsTextfileEdit.setText(settings.value("metrics_textfile") or "")
+
+        # VPN names are filled from discovery cache (which is refreshed in background)
+        self.discovery = config_discovery
+        self.discovery.updated.connect(self.fill_vpn_names)
+        self.fill_vpn_names()
+        self.discovery.refresh()
+
+    def fill_vpn_names(self):
+        """Fill VPN combo box and list of other VPNs with .conf files from /etc/openvpn{,/client}"""
+        settings = QtCore.QSettings()
+        current = self.vpnNameComboBox.currentText() or settings.value("vpn_name") or ""
+        self.vpnNameComboBox.clear()
+        profiles = self.discovery.profiles()
+        for profile in profiles:
+            self.vpnNameComboBox.addItem(profile["name"])
+            self.vpnNameComboBox.setItemData(self.vpnNameComboBox.count() - 1,
+                                             discovery.profile_summary(profile), QtCore.Qt.ToolTipRole)
+
+        i = self.vpnNameComboBox.findText(current)
+        if i > -1:
+            self.vpnNameComboBox.setCurrentIndex(i)
+
+        if self.vpnListWidget.count():
+            checked = self.checked_vpn_names()
+        else:
+            checked = settings.value("vpn_names", [], type=list)
+        self.vpnListWidget.clear()
+        for profile in profiles:
+            item = QtWidgets.QListWidgetItem(profile["name"], self.vpnListWidget)
+            item.setToolTip(discovery.profile_summary(profile))
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(QtCore.Qt.Checked if profile["name"] in checked else QtCore.Qt.Unchecked)
+
+    def checked_vpn_names(self):
+        """Return list of checked VPNs in list of other monitored VPNs"""
+        return [self.vpnListWidget.item(i).text() for i in range(self.vpnListWidget.count())
+                if self.vpnListWidget.item(i).checkState() == QtCore.Qt.Checked]
+
+    def accept(self):
+        settings = QtCore.QSettings()
+        settings.setValue("sudo_command", self.sudoCommandEdit.text())
+        settings.setValue("use_sudo", self.sudoCheckBox.isChecked())
+        settings.setValue("show_warning", self.warningCheckBox.isChecked())
+        settings.setValue("auto_reconnect", self.autoReconnectCheckBox.isChecked())
+        settings.setValue("remote_probing", self.remoteProbingCheckBox.isChecked())
+        settings.setValue("kill_switch", self.killSwitchCheckBox.isChecked())
+        settings.setValue("dns_check", self.dnsCheckBox.isChecked())
+        settings.setValue("log_archive", self.logArchiveCheckBox.isChecked())
+        settings.setValue("network_monitor", self.networkMonitorCheckBox.isChecked())
+        settings.setValue("network_reconnect", self.networkReconnectCheckBox.isChecked())
+        settings.setValue("vpn_name", self.vpnNameComboBox.currentText())
+        settings.setValue("vpn_names", self.checked_vpn_names())
+        settings.setValue("management_address", self.managementAddressEdit.text())
+        settings.setValue("management_password", self.managementPasswordEdit.text())
+        settings.setValue("privileged_backend", self.privilegedComboBox.currentData())
+        settings.setValue("metrics_enabled", self.metricsCheckBox.isChecked())
+        settings.setValue("metrics_address", self.metricsAddressEdit.text())
+        settings.setValue("metrics_textfile", self.metricsTextfileEdit.text())
+        QtWidgets.QDialog.accept(self)
+
+    def done(self, result):
+        """Stop receiving discovery updates when dialog is closed"""
+        self.discovery.updated.disconnect(self.fill_vpn_names)
+        super().done(result)
+
+
+class LogHighlighter(QtGui.QSyntaxHighlighter):
+    """Highlight log lines according to their priority and occurrences of searched text"""
+    def __init__(self, document, priority_of_block):
+        super().__init__(document)
+        self.priority_of_block = priority_of_block
+        self.query = ""
+
+        self.formats = {}
+        for priority, color, bold in ((0, QtCore.Qt.darkRed, True), (1, QtCore.Qt.darkRed, True),
+                                      (2, QtCore.Qt.darkRed, True), (3, QtCore.Qt.red, False),
+                                      (4, QtGui.QColor(200, 100, 0), False), (5, QtCore.Qt.darkBlue, False)):
+            text_format = QtGui.QTextCharFormat()
+            text_format.setForeground(QtGui.QBrush(color))
+            if bold:
+                text_format.setFontWeight(QtGui.QFont.Bold)
+            self.formats[priority] = text_format
+
+        self.match_format = QtGui.QTextCharFormat()
+        self.match_format.setBackground(QtGui.QBrush(QtCore.Qt.yellow))
+        self.match_format.setForeground(QtGui.QBrush(QtCore.Qt.black))
+
+    def highlightBlock(self, text):
+        """Highlight one log line"""
+        priority_format = self.formats.get(self.priority_of_block(self.currentBlock().blockNumber()))
+        if priority_format:
+            self.setFormat(0, len(text), priority_format)
+
+        if self.query:
+            lower_text = text.lower()
+            start = lower_text.find(self.query)
+            while start >= 0:
+                self.setFormat(start, len(self.query), self.match_format)
+                start = lower_text.find(self.query, start + len(self.query))
+
+
+class QOpenVPNLogViewer(QtWidgets.QDialog, Ui_QOpenVPNLogViewer):
+    PRIORITIES = ((7, QtCore.QT_TRANSLATE_NOOP("QOpenVPNLogViewer", "All priorities")),
+                  (5, QtCore.QT_TRANSLATE_NOOP("QOpenVPNLogViewer", "Notice and above")),
+                  (4, QtCore.QT_TRANSLATE_NOOP("QOpenVPNLogViewer", "Warnings and errors")),
+                  (3, QtCore.QT_TRANSLATE_NOOP("QOpenVPNLogViewer", "Errors only")))
+    TIME_RANGES = ((0, QtCore.QT_TRANSLATE_NOOP("QOpenVPNLogViewer", "Whole boot")),
+                   (600, QtCore.QT_TRANSLATE_NOOP("QOpenVPNLogViewer", "Last 10 minutes")),
+                   (3600, QtCore.QT_TRANSLATE_NOOP("QOpenVPNLogViewer", "Last hour")),
+                   (86400, QtCore.QT_TRANSLATE_NOOP("QOpenVPNLogViewer", "Last 24 hours")))
+
+    def __init__(self, log_archive=None, parent=None, network_monitor=None):
+        super().__init__(parent)
+        self.setupUi(self)
+        self.refreshButton.clicked.connect(self.refresh)
+        self.lookup_id = 0
+        self.load_id = 0
+        self.log_archive = log_archive
+        self.session_id = ""
+
+        # Parsed entries are kept in bounded buffer (filtering doesn't need to run journalctl again),
+        # only last max_lines matching lines are shown
+        settings = QtCore.QSettings()
+        self.max_lines = settings.value("log_max_lines", 10000, type=int)
+        self.buffer = logbuffer.LogBuffer(settings.value("log_buffer_lines", 100000, type=int))
+        self.shown_priorities = []
+        self.filters = ("", logbuffer.MAX_PRIORITY, None)
+        self.match_count = 0
+
+        self.logViewerEdit.setMaximumBlockCount(self.max_lines)
+        self.highlighter = LogHighlighter(self.logViewerEdit.document(), self.priority_of_block)
+        for value, name in self.PRIORITIES:
+            self.priorityComboBox.addItem(QtCore.QCoreApplication.translate("QOpenVPNLogViewer", name), value)
+        for value, name in self.TIME_RANGES:
+            self.timeComboBox.addItem(QtCore.QCoreApplication.translate("QOpenVPNLogViewer", name), value)
+        self.priorityComboBox.currentIndexChanged.connect(self.apply_filters)
+        self.timeComboBox.currentIndexChanged.connect(self.apply_filters)
+
+        # Search as you type (filter is applied after short pause in typing)
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.apply_filters)
+        self.searchEdit.textChanged.connect(self.search_timer.start)
+
+        # Archived sessions of VPNs (time range of session is read from archive, only compressed
+        # chunks overlapping it are decompressed)
+        self.sessionComboBox.addItem(self.tr("Journal (current boot)"), "")
+        for session in log_archive.sessions() if log_archive else []:
+            self.sessionComboBox.addItem(self.session_title(session), session["id"])
+            self.sessionComboBox.setItemData(self.sessionComboBox.count() - 1, session, QtCore.Qt.UserRole + 1)
+        self.sessionComboBox.setVisible(log_archive is not None)
+        self.sessionComboBox.currentIndexChanged.connect(self.select_session)
+        self.sinceEdit.hide()
+        self.untilEdit.hide()
+        self.range_timer = QtCore.QTimer(self)
+        self.range_timer.setSingleShot(True)
+        self.range_timer.setInterval(300)
+        self.range_timer.timeout.connect(self.load_session)
+        self.sinceEdit.dateTimeChanged.connect(self.range_timer.start)
+        self.untilEdit.dateTimeChanged.connect(self.range_timer.start)
+
+        # External IP address is looked up again when network changes
+        self.network_monitor = network_monitor
+        if network_monitor:
+            network_monitor.networkChanged.connect(self.lookup_ip)
+
+        self.journal = self.journalctl(self.buffer.capacity, disable_sudo=True)
+        self.journal.entriesReceived.connect(self.append_entries)
+        self.refresh()
+
+    def journalctl(self, lines, disable_sudo=False):
+        """Create journal reader which follows OpenVPN logs"""
+        settings = QtCore.QSettings()
+        unit = core.unit_name(settings.value("vpn_name"), settings)
+        return journal.JournalReader(unit, lines=lines, sudo_command=core.sudo_command(disable_sudo, settings),
+                                     parent=self)
+
+    @staticmethod
+    def session_title(session):
+        """Return name of archived session shown in session selector"""
+        return "{}: {} - {} ({} lines)".format(
+            core.vpn_name(session["unit"]), time.strftime("%Y-%m-%d %H:%M", time.localtime(session["start"])),
+            time.strftime("%H:%M", time.localtime(session["end"])), session["lines"]
+        )
+
+    def select_session(self):
+        """Show journal of current boot or archived session selected by user"""
+        self.session_id = self.sessionComboBox.currentData()
+        archived = bool(self.session_id)
+        self.timeComboBox.setVisible(not archived)
+        self.sinceEdit.setVisible(archived)
+        self.untilEdit.setVisible(archived)
+
+        self.journal.stop()
+        self.buffer = logbuffer.LogBuffer(self.buffer.capacity)
+        self.shown_priorities = []
+        self.logViewerEdit.clear()
+        self.filters = self.current_filters()
+        if archived:
+            # Whole session is shown at first
+            session = self.sessionComboBox.currentData(QtCore.Qt.UserRole + 1)
+            for edit, timestamp in ((self.sinceEdit, session["start"]), (self.untilEdit, session["end"])):
+                edit.blockSignals(True)
+                edit.setDateTime(QtCore.QDateTime.fromMSecsSinceEpoch(int(timestamp * 1000)))
+                edit.blockSignals(False)
+            self.load_session()
+        else:
+            # Journal is read again from the beginning
+            self.journal.close()
+            self.journal = self.journalctl(self.buffer.capacity, disable_sudo=True)
+            self.journal.entriesReceived.connect(self.append_entries)
+            self.refresh()
+
+    def load_session(self):
+        """Read selected time range of archived session in background"""
+        self.range_timer.stop()
+        if not self.session_id:
+            return
+
+        since = self.sinceEdit.dateTime().toMSecsSinceEpoch() // 1000
+        until = self.untilEdit.dateTime().toMSecsSinceEpoch() // 1000 + 1
+        self.load_id += 1
+        self.matchesLabel.setText(self.tr("Loading ..."))
+        task.run_task(self.load_id, self.log_archive.read, self.session_id, since, until, self.buffer.capacity,
+                      callback=self.session_loaded)
+
+    def session_loaded(self, load_id, entries):
+        """Show entries read from archive (results of older reads are dropped)"""
+        if load_id != self.load_id or not self.session_id:
+            return
+
+        self.buffer = logbuffer.LogBuffer(self.buffer.capacity)
+        self.buffer.extend(entries or [])
+        self.shown_priorities = []
+        self.apply_filters()
+
+    def priority_of_block(self, block_number):
+        """Return priority of shown log line (counted from the end, blocks at the beginning
+        are highlighted again while document drops them above maximum block count)"""
+        index = len(self.shown_priorities) - self.logViewerEdit.document().blockCount() + block_number
+        if 0 <= index < len(self.shown_priorities):
+            return self.shown_priorities[index]
+        return logbuffer.MAX_PRIORITY
+
+    def current_filters(self):
+        """Return search query, max. priority and start of time range selected by user
+        (time range of archived session is applied when it is read)"""
+        seconds = self.timeComboBox.currentData() if not self.session_id else 0
+        return (self.searchEdit.text().lower(), self.priorityComboBox.currentData(),
+                time.time() - seconds if seconds else None)
+
+    def apply_filters(self):
+        """Show last lines which match search query and filters"""
+        self.search_timer.stop()
+        self.filters = self.current_filters()
+        query, max_priority, since = self.filters
+        matches = self.buffer.search(query, max_priority, since)
+        self.show_lines(matches[-self.max_lines:])
+        self.update_matches_label(len(matches))
+
+    def show_lines(self, seqs):
+        """Replace shown lines by buffer entries"""
+        self.shown_priorities = [self.buffer.priority(seq) for seq in seqs]
+        self.highlighter.query = self.filters[0]
+        self.logViewerEdit.setPlainText("\n".join(self.buffer.line(seq) for seq in seqs))
+        self.logViewerEdit.verticalScrollBar().setValue(self.logViewerEdit.verticalScrollBar().maximum())
+
+    def append_entries(self, entries):
+        """Store newly received entries and show those matching current filters"""
+        seqs = self.buffer.extend(entries)
+        matching = [seq for seq in seqs if self.buffer.matches(seq, *self.filters)]
+        if not self.shown_priorities:
+            self.apply_filters()
+            return
+
+        scrollbar = self.logViewerEdit.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        if matching:
+            self.shown_priorities.extend(self.buffer.priority(seq) for seq in matching)
+            self.logViewerEdit.appendPlainText("\n".join(self.buffer.line(seq) for seq in matching))
+            if self.max_lines > 0:
+                # Oldest lines above max_lines were dropped by document
+                del self.shown_priorities[:-self.max_lines]
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+        self.update_matches_label(min(self.match_count + len(matching), len(self.buffer)))
+
+    def update_matches_label(self, match_count):
+        """Show number of lines matching filters"""
+        self.match_count = match_count
+        if self.filters == ("", logbuffer.MAX_PRIORITY, None):
+            self.matchesLabel.setText(self.tr("{} lines").format(len(self.buffer)))
+        else:
+            self.matchesLabel.setText(self.tr("{} of {} lines").format(match_count, len(self.buffer)))
+
+    @staticmethod
+    def getip():
+        """Get external IPv4 and IPv6 addresses and hostnames (blocking, runs in background thread)"""
+        try:
+            addresses = stun.get_external_addresses()
+        except:
+            addresses = {}
+
+        result = []
+        for family, (ip, port) in sorted(addresses.items()):
+            try:
+                hostname = socket.gethostbyaddr(ip)[0]
+            except:
+                hostname = ""
+            result.append((ip, hostname))
+        return result
+
+    def refresh(self):
+        """Refresh logs (restart following of journal if journalctl has exited,
+        read archived session again)"""
+        if self.session_id:
+            self.load_session()
+        else:
+            self.journal.start()
+        QtCore.QTimer.singleShot(0, self.refresh_timeout)
+
+    def refresh_timeout(self):
+        """Move scrollbar to bottom and refresh IP address
+        (must be called by single shot timer or else scrollbar sometimes doesn't move)"""
+        self.logViewerEdit.verticalScrollBar().setValue(self.logViewerEdit.verticalScrollBar().maximum())
+        self.lookup_ip()
+
+    def lookup_ip(self, *args):
+        """Look up IP address and hostname in background (results of older lookups are dropped)"""
+        self.lookup_id += 1
+        self.ipAddressEdit.setText(self.tr("Looking up ..."))
+        task.run_task(self.lookup_id, self.getip, callback=self.getip_finished)
+
+    def getip_finished(self, lookup_id, addresses):
+        """Show IP addresses and hostnames when background lookup finishes"""
+        if lookup_id != self.lookup_id:
+            return
+
+        self.ipAddressEdit.setText(", ".join("{} ({})".format(ip, hostname) if hostname else ip
+                                             for ip, hostname in addresses or []))
+
+    def done(self, result):
+        """Stop following journal (and watching network changes) when dialog is closed"""
+        self.journal.stop()
+        if self.network_monitor:
+            self.network_monitor.networkChanged.disconnect(self.lookup_ip)
+        super().done(result)
+
+
+class QOpenVPNStats(QtWidgets.QDialog, Ui_QOpenVPNStats):
+    def __init__(self, management_client, reconnect_supervisor, parent=None):
+        super().__init__(parent)
+        self.setupUi(self)
+        self.management = management_client
+        if self.management:
+            self.management.connectedChanged.connect(self.update_stats)
+            self.management.stateChanged.connect(self.update_stats)
+            self.management.bytecountChanged.connect(self.update_stats)
+        self.supervisor = reconnect_supervisor
+        self.supervisor.historyChanged.connect(self.update_history)
+        self.update_stats()
+        self.update_history()
+
+    def update_history(self):
+        """Show history of reconnect attempts"""
+        self.historyEdit.setPlainText("\n".join(
+            "{} {} ({}) #{}: {:.0f} s".format(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)),
+                                           core.vpn_name(unit), reason, attempt, delay)
+            for t, unit, attempt, delay, reason in self.supervisor.history()
+        ))
+
+    def update_stats(self, *args):
+        """Show current statistics from OpenVPN management interface"""
+        if not self.management:
+            self.stateLabel.setText(self.tr("Management interface is not configured"))
+        elif not self.management.is_connected():
+            self.stateLabel.setText(self.tr("Not connected to management interface"))
+        else:
+            self.stateLabel.setText(self.management.state)
+
+        m = self.management if self.management and self.management.is_connected() else None
+        self.localIpLabel.setText(m.local_ip if m else "")
+        self.remoteIpLabel.setText(m.remote_ip if m else "")
+        self.bytesInLabel.setText(core.format_bytes(m.bytes_in) if m else "")
+        self.bytesOutLabel.setText(core.format_bytes(m.bytes_out) if m else "")
+        self.rateInLabel.setText(core.format_bytes(m.rate_in, "/s") if m else "")
+        self.rateOutLabel.setText(core.format_bytes(m.rate_out, "/s") if m else "")
+
+    def done(self, result):
+        """Stop receiving statistics when dialog is closed"""
+        if self.management:
+            self.management.connectedChanged.disconnect(self.update_stats)
+            self.management.stateChanged.disconnect(self.update_stats)
+            self.management.bytecountChanged.disconnect(self.update_stats)
+        self.supervisor.historyChanged.disconnect(self.update_history)
+        super().done(result)
+
+
+class QOpenVPNHistory(QtWidgets.QDialog, Ui_QOpenVPNHistory):
+    PERIODS = ((1, QtCore.QT_TRANSLATE_NOOP("QOpenVPNHistory", "Last 24 hours")),
+               (7, QtCore.QT_TRANSLATE_NOOP("QOpenVPNHistory", "Last 7 days")),
+               (30, QtCore.QT_TRANSLATE_NOOP("QOpenVPNHistory", "Last 30 days")),
+               (365, QtCore.QT_TRANSLATE_NOOP("QOpenVPNHistory", "Last year")))
+    EVENT_NAMES = {"up": QtCore.QT_TRANSLATE_NOOP("QOpenVPNHistory", "Connected"),
+                   "down": QtCore.QT_TRANSLATE_NOOP("QOpenVPNHistory", "Disconnected"),
+                   "drop": QtCore.QT_TRANSLATE_NOOP("QOpenVPNHistory", "Dropped"),
+                   "reconnect": QtCore.QT_TRANSLATE_NOOP("QOpenVPNHistory", "Reconnecting")}
+
+    def __init__(self, history_store, parent=None):
+        super().__init__(parent)
+        self.setupUi(self)
+        self.history = history_store
+
+        for days, name in self.PERIODS:
+            self.periodComboBox.addItem(QtCore.QCoreApplication.translate("QOpenVPNHistory", name), days)
+        self.periodComboBox.setCurrentIndex(1)
+        self.periodComboBox.currentIndexChanged.connect(self.update_history)
+        self.update_history()
+
+    @staticmethod
+    def format_duration(seconds):
+        """Format duration in human readable form"""
+        if seconds is None:
+            return "-"
+        if seconds < 60:
+            return "{:.0f} s".format(seconds)
+        if seconds < 3600:
+            return "{:.1f} min".format(seconds / 60)
+        return "{:.1f} h".format(seconds / 3600)
+
+    def update_history(self):
+        """Show uptime, drops and MTTR of all VPNs and events in selected period"""
+        if not self.history:
+            self.eventsEdit.setPlainText(self.tr("Connection history isn't available"))
+            return
+
+        since = time.time() - self.periodComboBox.currentData() * 86400
+        units = self.history.units()
+        self.summaryTable.setRowCount(len(units))
+        for row, unit in enumerate(units):
+            summary = self.history.summary(unit, since)
+            values = [core.vpn_name(unit),
+                      "{:.2f} %".format(summary["uptime"] * 100),
+                      str(summary["drops"]),
+                      "{:.2f}".format(summary["drops_per_day"]),
+                      self.format_duration(summary["mttr"])]
+            for column, value in enumerate(values):
+                self.summaryTable.setItem(row, column, QtWidgets.QTableWidgetItem(value))
+        self.summaryTable.resizeColumnsToContents()
+
+        lines = []
+        for event in self.history.events(since=since, limit=1000):
+            line = "{} {}: {}".format(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event["time"])),
+                                      core.vpn_name(event["unit"]),
+                                      QtCore.QCoreApplication.translate(
+                                          "QOpenVPNHistory", self.EVENT_NAMES.get(event["event"], event["event"])))
+            details = [event["reason"], event["external_ip"]]
+            if event["bytes_in"] is not None:
+                details.append("{} / {}".format(core.format_bytes(event["bytes_in"]),
+                                                core.format_bytes(event["bytes_out"] or 0)))
+            details = [d for d in details if d]
+            if details:
+                line += " ({})".format(", ".join(details))
+            lines.append(line)
+        self.eventsEdit.setPlainText("\n".join(lines))
+        self.eventsEdit.verticalScrollBar().setValue(self.eventsEdit.verticalScrollBar().maximum())
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+"""Cached discovery of OpenVPN version and configuration files (VPN profiles).
+Results are persisted in QSettings and are recomputed only when openvpn binary
+(its path or mtime) or configuration directory (its mtime) changes. Profiles are parsed
+for metadata (remote hosts, protocol) only when their .conf file changes.
+"""
+
+import sys, os, glob, json, shutil, subprocess
+from PyQt5 import QtCore
+
+from qopenvpn import task
+
+CACHE_GROUP = "discovery_cache"
+
+DEFAULT_PORT = 1194
+DEFAULT_PROTO = "udp"
+
+
+def detect_version(openvpn_path):
+    """Get (major, minor) version of OpenVPN by running `openvpn --version`"""
+    try:
+        output = subprocess.check_output([openvpn_path, "--version"], stderr=subprocess.DEVNULL)
+    except subprocess.CalledProcessError as e:
+        output = e.output
+    except OSError:
+        output = b""
+
+    # Take second tuple of version output (i.e. `2.4.0`)
+    # and extract its major and minor components (i.e. 2 and 4)
+    version_string = output.decode("utf8").split()[1] if len(output.split()) > 1 else ""
+    version_components = version_string.split(".")
+    try:
+        return (int(version_components[0]), int(version_components[1]))
+    except (IndexError, ValueError):
+        print("Couldn't determine the installed OpenVPN version, assuming v0.0", file=sys.stderr)
+        return (0, 0)
+
+
+def get_mtime(path):
+    """Return modification time of file (or 0 if it doesn't exist)"""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0
+
+
+def parse_profile(path):
+    """Parse metadata of OpenVPN configuration file (list of remotes [host, port, proto] and device)"""
+    profile = {"name": os.path.splitext(os.path.basename(path))[0], "path": path,
+               "mtime": get_mtime(path), "remotes": [], "proto": DEFAULT_PROTO, "dev": ""}
+    try:
+        with open(path, encoding="utf8", errors="replace") as f:
+            lines = f.readlines()
+    except OSError:
+        # Configuration files are often readable only by root
+        return profile
+
+    port = DEFAULT_PORT
+    remotes = []
+    inline_tag = ""
+    for line in lines:
+        line = line.strip()
+        if inline_tag:
+            # Skip inline files (certificates, keys), only <connection> blocks contain options
+            if line == "</{}>".format(inline_tag):
+                inline_tag = ""
+            continue
+        if line.startswith("<") and line.endswith(">"):
+            tag = line.strip("<>/")
+            if tag != "connection":
+                inline_tag = tag
+            continue
+
+        fields = line.split()
+        if not fields or fields[0].startswith(("#", ";")):
+            continue
+        option, args = fields[0].lstrip("-"), fields[1:]
+        if option == "remote" and args:
+            remotes.append((args[0], args[1] if len(args) > 1 else None, args[2] if len(args) > 2 else None))
+        elif option == "proto" and args:
+            profile["proto"] = args[0]
+        elif option in ("port", "rport") and args and args[0].isdigit():
+            port = int(args[0])
+        elif option == "dev" and args:
+            profile["dev"] = args[0]
+
+    # Port and protocol of remote default to values of port and proto options
+    profile["remotes"] = [[host, int(p) if p and p.isdigit() else port, proto or profile["proto"]]
+                          for host, p, proto in remotes]
+    return profile
+
+
+def profile_summary(profile):
+    """Return short description of profile remotes (e.g. `vpn.example.com:1194/udp, +1 more`)"""
+    remotes = profile.get("remotes", [])
+    if not remotes:
+        return ""
+    host, port, proto = remotes[0]
+    summary = "{}:{}/{}".format(host, port, proto)
+    if len(remotes) > 1:
+        summary += ", +{} more".format(len(remotes) - 1)
+    return summary
+
+
+def discover_profiles(paths, cache_profiles):
+    """Parse configuration files (cached profiles are reused if mtime of file hasn't changed)"""
+    cached = {p["path"]: p for p in cache_profiles}
+    profiles = []
+    for path in sorted(paths):
+        profile = cached.get(path)
+        if not profile or profile["mtime"] != get_mtime(path):
+            profile = parse_profile(path)
+        profiles.append(profile)
+    return profiles
+
+
+def discover(cache):
+    """Discover OpenVPN version, configuration location and VPN names
+    (values from cache dict are reused if openvpn binary and config directory haven't changed)"""
+    result = {}
+    result["openvpn_path"] = shutil.which("openvpn") or ""
+    result["openvpn_mtime"] = get_mtime(result["openvpn_path"]) if result["openvpn_path"] else 0
+
+    if (cache.get("openvpn_path") == result["openvpn_path"] and
+            cache.get("openvpn_mtime") == result["openvpn_mtime"] and "version" in cache):
+        result["version"] = cache["version"]
+    elif result["openvpn_path"]:
+        result["version"] = list(detect_version(result["openvpn_path"]))
+    else:
+        print("OpenVPN executable not found!", file=sys.stderr)
+        result["version"] = [0, 0]
+
+    # Checks for the new location of OpenVPN configuration files introduced in OpenVPN 2.4
+    # See https://github.com/OpenVPN/openvpn/blob/master/Changes.rst#user-visible-changes
+    # "The configuration files are picked up from the /etc/openvpn/server/ and
+    # /etc/openvpn/client/ directories (depending on unit file)."
+    if tuple(result["version"]) >= (2, 4):
+        result["config_location"] = "/etc/openvpn/client/*.conf"
+        result["service_name"] = "openvpn-client"
+    else:
+        result["config_location"] = "/etc/openvpn/*.conf"
+        result["service_name"] = "openvpn"
+
+    # Find .conf files in /etc/openvpn{,/client} (only if directory has been modified)
+    # and parse changed ones
+    result["config_dir"] = os.path.dirname(result["config_location"])
+    result["config_dir_mtime"] = get_mtime(result["config_dir"])
+    cache_profiles = cache.get("profiles", []) if cache.get("config_dir") == result["config_dir"] else []
+    if cache_profiles and cache.get("config_dir_mtime") == result["config_dir_mtime"]:
+        paths = [p["path"] for p in cache_profiles]
+    else:
+        paths = glob.glob(result["config_location"])
+    result["profiles"] = discover_profiles(paths, cache_profiles)
+    result["vpn_names"] = [p["name"] for p in result["profiles"]]
+
+    return result
+
+
+class ConfigDiscovery(QtCore.QObject):
+    """Persistent cache of discovered OpenVPN configuration, refreshed in background"""
+    updated = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cache = self.load()
+        self._refreshing = False
+        self._refresh_pending = False
+
+        # Refresh cache when configuration directory or some configuration file changes
+        # (by inotify, so profiles dropped by configuration management show up immediately)
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self.refresh)
+        self._watcher.fileChanged.connect(self.refresh)
+        self._watch_config_dir()
+
+    def vpn_names(self):
+        """Return cached list of VPN names"""
+        return list(self._cache.get("vpn_names", []))
+
+    def profiles(self):
+        """Return cached list of VPN profiles (dicts with name, path, remotes, proto and dev)"""
+        return [dict(p) for p in self._cache.get("profiles", [])]
+
+    def profile(self, vpn_name):
+        """Return cached profile of VPN (or None if there is no such configuration file)"""
+        for profile in self._cache.get("profiles", []):
+            if profile["name"] == vpn_name:
+                return dict(profile)
+        return None
+
+    def config_location(self):
+        """Return cached location of configuration files"""
+        return self._cache.get("config_location", "")
+
+    def service_name(self):
+        """Return cached name of OpenVPN systemd service"""
+        return self._cache.get("service_name", "")
+
+    def load(self):
+        """Load cache from QSettings"""
+        settings = QtCore.QSettings()
+        settings.beginGroup(CACHE_GROUP)
+        cache = {}
+        if settings.contains("config_location"):
+            cache["openvpn_path"] = settings.value("openvpn_path") or ""
+            cache["openvpn_mtime"] = settings.value("openvpn_mtime", 0, type=float)
+            cache["version"] = [int(v) for v in settings.value("version", [0, 0], type=list)]
+            cache["config_location"] = settings.value("config_location") or ""
+            cache["service_name"] = settings.value("service_name") or ""
+            cache["config_dir"] = settings.value("config_dir") or ""
+            cache["config_dir_mtime"] = settings.value("config_dir_mtime", 0, type=float)
+            cache["vpn_names"] = settings.value("vpn_names", [], type=list)
+            try:
+                cache["profiles"] = json.loads(settings.value("profiles") or "[]")
+            except ValueError:
+                cache["profiles"] = []
+        settings.endGroup()
+        return cache
+
+    def save(self):
+        """Save cache to QSettings (and also store location of config files and service name)"""
+        settings = QtCore.QSettings()
+        settings.beginGroup(CACHE_GROUP)
+        for key, value in self._cache.items():
+            settings.setValue(key, json.dumps(value) if key == "profiles" else value)
+        settings.endGroup()
+        settings.setValue("config_location", self._cache["config_location"])
+        settings.setValue("service_name", self._cache["service_name"])
+
+    def refresh(self):
+        """Refresh cache in background thread"""
+        if self._refreshing:
+            self._refresh_pending = True
+            return
+
+        self._refreshing = True
+        task.run_task(0, discover, dict(self._cache), callback=self._refresh_finished)
+
+    def _refresh_finished(self, task_id, result):
+        """Store refreshed cache and emit updated signal if anything has changed"""
+        self._refreshing = False
+        if result and result != self._cache:
+            self._cache = result
+            self.save()
+            self.updated.emit()
+
+        # Replaced files are dropped by watcher, so they are watched again after every refresh
+        self._watch_config_dir()
+
+        if self._refresh_pending:
+            self._refresh_pending = False
+            self.refresh()
+
+    def _watch_config_dir(self):
+        """Watch configuration directory (or its parent if it doesn't exist yet)
+        and configuration files for changes"""
+        config_dir = self._cache.get("config_dir", "")
+        if config_dir and not os.path.isdir(config_dir):
+            config_dir = os.path.dirname(config_dir)
+        paths = [config_dir] if config_dir and os.path.isdir(config_dir) else []
+        paths.extend(p["path"] for p in self._cache.get("profiles", []))
+
+        watched = self._watcher.directories() + self._watcher.files()
+        removed = [p for p in watched if p not in paths]
+        added = [p for p in paths if p not in watched]
+        if removed:
+            self._watcher.removePaths(removed)
+        if added:
+            self._watcher.addPaths(added)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+"""DNS leak and split-DNS verification of connected VPN.
+Configured DNS servers are read from systemd-resolved (per-link servers and routing domains
+by `resolvectl`) or from /etc/resolv.conf, interface which carries traffic to every server
+is looked up in kernel routing table (/proc/net/route and /proc/net/ipv6_route) and all servers
+are queried concurrently by asyncio over UDP to find out which of them answer.
+"""
+
+import os, socket, struct, subprocess, time, fnmatch, ipaddress, asyncio
+
+RESOLV_CONF = "/etc/resolv.conf"
+PROC_ROUTE = "/proc/net/route"
+PROC_IPV6_ROUTE = "/proc/net/ipv6_route"
+RTF_UP = 0x0001
+
+TEST_NAME = "example.com"
+TYPE_A = 1
+CLASS_IN = 1
+
+# Results of check (leak means that DNS queries are sent outside of VPN)
+STATUS_OK = "ok"
+STATUS_SPLIT = "split"
+STATUS_LEAK = "leak"
+STATUS_UNKNOWN = "unknown"
+
+
+def parse_server(value):
+    """Parse DNS server address as printed by resolvectl (`addr`, `addr%iface`, `addr#name`, `[addr]:port`)"""
+    value = value.split("#", 1)[0]
+    if value.startswith("["):
+        value = value[1:].split("]", 1)[0]
+    elif value.count(":") == 1:
+        value = value.split(":", 1)[0]
+    value = value.split("%", 1)[0]
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return ""
+
+
+def parse_resolvectl(output):
+    """Parse output of `resolvectl dns` or `resolvectl domain` to dict link name -> list of values
+    (global settings are stored under empty link name)"""
+    links = {}
+    for line in output.splitlines():
+        head, sep, values = line.partition(":")
+        if not sep:
+            continue
+        if head.startswith("Link ") and "(" in head:
+            link = head[head.index("(") + 1:head.rindex(")")]
+        elif head == "Global":
+            link = ""
+        else:
+            continue
+        links[link] = values.split()
+    return links
+
+
+def resolved_servers():
+    """Return list of DNS servers (address, link, domains) configured in systemd-resolved
+    (or None if resolved isn't running)"""
+    try:
+        dns = subprocess.check_output(["resolvectl", "--no-pager", "dns"], stderr=subprocess.DEVNULL)
+        domains = subprocess.check_output(["resolvectl", "--no-pager", "domain"], stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    domains = parse_resolvectl(domains.decode("utf8", errors="replace"))
+    servers = []
+    for link, values in parse_resolvectl(dns.decode("utf8", errors="replace")).items():
+        for value in values:
+            address = parse_server(value)
+            if address:
+                servers.append((address, link, domains.get(link, [])))
+    return servers
+
+
+def resolv_conf_servers(path=RESOLV_CONF):
+    """Return list of DNS servers (address, link, domains) from resolv.conf (link is unknown)"""
+    servers = []
+    try:
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 1 and fields[0] == "nameserver":
+                    address = parse_server(fields[1])
+                    if address:
+                        servers.append((address, "", []))
+    except OSError:
+        pass
+    return servers
+
+
+def parse_routes(route_path=PROC_ROUTE, ipv6_route_path=PROC_IPV6_ROUTE):
+    """Return list of routes (network, metric, interface) from kernel routing table"""
+    routes = []
+    try:
+        with open(route_path) as f:
+            for line in list(f)[1:]:
+                fields = line.split()
+                if len(fields) < 8 or not int(fields[3], 16) & RTF_UP:
+                    continue
+                destination = socket.inet_ntoa(struct.pack("<I", int(fields[1], 16)))
+                mask = socket.inet_ntoa(struct.pack("<I", int(fields[7], 16)))
+                network = ipaddress.ip_network("{}/{}".format(destination, mask), strict=False)
+                routes.append((network, int(fields[6]), fields[0]))
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open(ipv6_route_path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 10 or not int(fields[8], 16) & RTF_UP:
+                    continue
+                destination = ipaddress.ip_address(bytes.fromhex(fields[0]))
+                network = ipaddress.ip_network("{}/{}".format(destination, int(fields[1], 16)), strict=False)
+                routes.append((network, int(fields[5], 16), fields[9]))
+    except (OSError, ValueError):
+        pass
+    return routes
+
+
+def route_interface(address, routes):
+    """Return interface which carries traffic to address (longest prefix, then lowest metric)"""
+    address = ipaddress.ip_address(address)
+    if address.is_loopback:
+        return "lo"
+    matching = [(-network.prefixlen, metric, iface) for network, metric, iface in routes
+                if network.version == address.version and address in network]
+    return min(matching)[2] if matching else ""
+
+
+def build_query(query_id, name, qtype=TYPE_A):
+    """Build DNS query (recursion desired) for name"""
+    question = b"".join(bytes([len(label)]) + label.encode("idna") for label in name.strip(".").split("."))
+    return struct.pack(">HHHHHH", query_id, 0x0100, 1, 0, 0, 0) + question + b"\x00" + struct.pack(">HH", qtype, CLASS_IN)
+
+
+def is_response(data, query_id):
+    """Check if packet is DNS response to query (any response code means that server answered)"""
+    if len(data) < 12:
+        return False
+    response_id, flags = struct.unpack_from(">HH", data)
+    return response_id == query_id and flags & 0x8000
+
+
+class QueryProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol which waits for DNS response"""
+    def __init__(self, query_id, future):
+        self._query_id = query_id
+        self._future = future
+
+    def datagram_received(self, data, addr):
+        if not self._future.done() and is_response(data, self._query_id):
+            self._future.set_result(time.monotonic())
+
+    def error_received(self, exc):
+        if not self._future.done():
+            self._future.set_exception(exc)
+
+
+async def query_server(address, name, port=53):
+    """Send DNS query to server and return its RTT"""
+    loop = asyncio.get_running_loop()
+    query_id = struct.unpack(">H", os.urandom(2))[0]
+    future = loop.create_future()
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    transport, protocol = await loop.create_datagram_endpoint(lambda: QueryProtocol(query_id, future),
+                                                              family=family, remote_addr=(address, port))
+    try:
+        start = time.monotonic()
+        transport.sendto(build_query(query_id, name))
+        return await future - start
+    finally:
+        transport.close()
+
+
+async def query_all(queries, timeout, port=53):
+    """Query all servers concurrently (list of (address, name)) and return list of RTTs
+    (None for servers which didn't answer before deadline)"""
+    loop = asyncio.get_running_loop()
+    tasks = [loop.create_task(query_server(address, name, port)) for address, name in queries]
+    if not tasks:
+        return []
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for t in pending:
+        t.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return [t.result() if t in done and not t.exception() else None for t in tasks]
+
+
+def check(vpn_interface, servers=None, routes=None, timeout=2, test_name=TEST_NAME, port=53):
+    """Check if DNS queries go through VPN interface (name or wildcard, e.g. `tun*`)
+
+    Returns dict with status (ok, split, leak or unknown), source of configuration and list
+    of servers (address, link, routing domains, interface used by route, RTT, whether it is in VPN).
+    """
+    source = "custom"
+    if servers is None:
+        servers = resolved_servers()
+        source = "resolved"
+        if not servers:
+            servers = resolv_conf_servers()
+            source = "resolv.conf"
+    if routes is None:
+        routes = parse_routes()
+
+    # Servers of link with routing domains are asked for name from their domain
+    queries = []
+    for address, link, domains in servers:
+        routing = [d.lstrip("~") for d in domains if d.lstrip("~") not in ("", ".")]
+        queries.append((address, routing[0] if routing else test_name))
+
+    loop = asyncio.new_event_loop()
+    try:
+        rtts = loop.run_until_complete(query_all(queries, timeout, port))
+    finally:
+        loop.close()
+
+    result = {"time": time.time(), "source": source, "vpn_interface": vpn_interface, "servers": []}
+    for (address, link, domains), rtt in zip(servers, rtts):
+        iface = route_interface(address, routes)
+        result["servers"].append({"address": address, "link": link, "domains": list(domains),
+                                  "interface": iface, "rtt": rtt, "vpn": fnmatch.fnmatchcase(iface, vpn_interface)})
+    result["status"] = verdict(result["servers"])
+    return result
+
+
+def verdict(servers):
+    """Decide whether DNS leaks (servers outside of VPN answer and VPN doesn't route only some domains)"""
+    # Local resolver (e.g. dnsmasq) forwards queries somewhere else, it can't be judged
+    answered = [s for s in servers if s["rtt"] is not None and s["interface"] != "lo"]
+    if not answered:
+        return STATUS_UNKNOWN
+
+    outside = [s for s in answered if not s["vpn"]]
+    if not outside:
+        return STATUS_OK
+
+    # Split DNS: VPN servers resolve only their routing domains, other names are resolved outside of VPN
+    vpn_domains = [d for s in answered if s["vpn"] for d in s["domains"]]
+    if vpn_domains and "~." not in vpn_domains:
+        return STATUS_SPLIT
+    return STATUS_LEAK
+
+
+def summary(result):
+    """Return short description of check result (e.g. `leak via wlan0 (192.168.1.1)`)"""
+    status = result["status"]
+    if status == STATUS_UNKNOWN:
+        return "not verified (no DNS server outside of this machine answered)"
+
+    answered = [s for s in result["servers"] if s["rtt"] is not None and s["interface"] != "lo"]
+    if status == STATUS_OK:
+        servers = [s for s in answered if s["vpn"]]
+        return "through VPN ({})".format(", ".join(s["address"] for s in servers))
+    outside = [s for s in answered if not s["vpn"]]
+    text = "split DNS, other names via" if status == STATUS_SPLIT else "LEAK via"
+    return "{} {}".format(text, ", ".join("{} ({})".format(s["interface"] or "?", s["address"]) for s in outside))
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""Long-lived privileged helper of QOpenVPN.
+It is started once per session by configured sudo command (e.g. `sudo python helper.py`)
+and runs systemctl commands requested by GUI over stdin, so that privileges are escalated
+only once. Requests are lines `<id> <command> <unit> [<args>]`, responses are lines `<id> <exit code>`.
+
+Only start, stop and restart of OpenVPN units are allowed, plus setting of remote server
+which OpenVPN tries first (`set-remote <unit> <host> <port> <proto>`, by runtime drop-in
+which adds `--remote` option before `--config` to ExecStart of unit) and its removal
+(`reset-remote <unit>`), and kill switch which blocks all traffic outside of VPN
+(`killswitch-on <unit> <interface> <ip>,<port>,<proto> ...` loads nftables table which allows
+only VPN interface and remote servers, `killswitch-off <unit>` removes it). One command
+can also be run directly from command line,
+e.g. `sudo python helper.py set-remote openvpn-client@corp vpn.example.com 1194 udp`.
+
+Helper doesn't import anything except standard library (it runs as root) and exits
+when GUI closes its stdin.
+"""
+
+import sys, os, re, ipaddress, subprocess
+
+COMMANDS = ("start", "stop", "restart")
+# Commands implemented by helper itself (with number of their arguments, None means one or more)
+HELPER_COMMANDS = {"set-remote": 3, "reset-remote": 0, "killswitch-on": None, "killswitch-off": 0}
+UNIT_RE = re.compile(r"^openvpn[\w-]*@[\w.:-]+$", re.ASCII)
+HOST_RE = re.compile(r"^[\w.:][\w.:-]*$", re.ASCII)
+INTERFACE_RE = re.compile(r"^[\w.-]{1,15}\*?$", re.ASCII)
+PROTOCOLS = ("udp", "udp4", "udp6", "tcp", "tcp4", "tcp6", "tcp-client", "tcp4-client", "tcp6-client")
+
+DROPIN_DIR = "/run/systemd/system"
+DROPIN_NAME = "qopenvpn-remote.conf"
+KILLSWITCH_TABLE = "qopenvpn_killswitch"
+
+# Exit code of invalid request (same as systemctl uses for invalid arguments)
+INVALID_REQUEST = 2
+
+
+def parse_request(line):
+    """Parse request line to (id, command, unit, args), raise ValueError if it doesn't have id
+    (command, unit and args are None if they aren't allowed)"""
+    fields = line.split()
+    if not fields or not fields[0].isdigit():
+        raise ValueError("Invalid request: {!r}".format(line))
+
+    request_id = int(fields[0])
+    if not is_valid(fields[1:]):
+        return request_id, None, None, None
+    return request_id, fields[1], fields[2], fields[3:]
+
+
+def is_valid(fields):
+    """Check if command, unit and arguments are allowed"""
+    if len(fields) < 2 or not UNIT_RE.match(fields[1]):
+        return False
+    command, args = fields[0], fields[2:]
+    if command in COMMANDS:
+        return not args
+    if command not in HELPER_COMMANDS:
+        return False
+    if HELPER_COMMANDS[command] is None:
+        if len(args) < 2:
+            return False
+    elif len(args) != HELPER_COMMANDS[command]:
+        return False
+
+    if command == "set-remote":
+        host, port, proto = args
+        return bool(HOST_RE.match(host)) and is_port(port) and proto in PROTOCOLS
+    if command == "killswitch-on":
+        try:
+            parse_endpoints(args[1:])
+        except ValueError:
+            return False
+        return bool(INTERFACE_RE.match(args[0]))
+    return True
+
+
+def is_port(port):
+    """Check if string is valid port number"""
+    return port.isdigit() and 0 < int(port) < 65536
+
+
+def parse_endpoints(args):
+    """Parse endpoints `<ip>,<port>,<proto>` to list of (ip address, port, udp / tcp)"""
+    endpoints = []
+    for arg in args:
+        fields = arg.split(",")
+        if len(fields) != 3 or not is_port(fields[1]) or fields[2] not in PROTOCOLS:
+            raise ValueError("Invalid endpoint: {}".format(arg))
+        endpoints.append((ipaddress.ip_address(fields[0]), int(fields[1]), fields[2][:3]))
+    return endpoints
+
+
+def run_command(command, unit, args=()):
+    """Run command and return its exit code (output of systemctl goes to stderr, stdout is used by protocol)"""
+    try:
+        if command == "set-remote":
+            return set_remote(unit, *args)
+        if command == "reset-remote":
+            return reset_remote(unit)
+        if command == "killswitch-on":
+            return load_ruleset(killswitch_ruleset(unit, args[0], parse_endpoints(args[1:])))
+        if command == "killswitch-off":
+            return load_ruleset(killswitch_ruleset(unit))
+        return subprocess.call(["systemctl", command, unit], stdin=subprocess.DEVNULL, stdout=sys.stderr)
+    except (OSError, subprocess.CalledProcessError, ValueError) as e:
+        print("Couldn't {} {}: {}".format(command, unit, e), file=sys.stderr)
+        return 1
+
+
+def dropin_path(unit):
+    """Return path of runtime drop-in of unit"""
+    return os.path.join(DROPIN_DIR, "{}.service.d".format(unit), DROPIN_NAME)
+
+
+def exec_start(unit):
+    """Return argv of ExecStart of unit (without remote added by our drop-in)"""
+    output = subprocess.check_output(["systemctl", "show", "--property=ExecStart", "--value", unit],
+                                     stdin=subprocess.DEVNULL, universal_newlines=True)
+    match = re.search(r"argv\[\]=(.*?) ;", output)
+    if not match:
+        raise ValueError("unit has no ExecStart")
+    argv = match.group(1).split()
+    if "--config" not in argv:
+        raise ValueError("ExecStart of unit has no --config option")
+
+    i = argv.index("--config")
+    if os.path.exists(dropin_path(unit)) and i >= 4 and argv[i - 4] == "--remote":
+        del argv[i - 4:i]
+    return argv
+
+
+def set_remote(unit, host, port, proto):
+    """Make OpenVPN try given remote first (other remotes from configuration file are kept as fallback)"""
+    argv = exec_start(unit)
+    i = argv.index("--config")
+    argv[i:i] = ["--remote", host, port, proto]
+    content = ("# Generated by QOpenVPN (fastest remote server)\n"
+               "[Service]\nExecStart=\nExecStart={}\n").format(" ".join(argv).replace("%", "%%"))
+
+    path = dropin_path(unit)
+    try:
+        with open(path) as f:
+            if f.read() == content:
+                return 0
+    except OSError:
+        pass
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+    return subprocess.call(["systemctl", "daemon-reload"], stdin=subprocess.DEVNULL, stdout=sys.stderr)
+
+
+def reset_remote(unit):
+    """Remove drop-in with remote server (OpenVPN tries remotes in order of configuration file)"""
+    try:
+        os.remove(dropin_path(unit))
+    except FileNotFoundError:
+        return 0
+    return subprocess.call(["systemctl", "daemon-reload"], stdin=subprocess.DEVNULL, stdout=sys.stderr)
+
+
+def killswitch_ruleset(unit, interface=None, endpoints=()):
+    """Return nftables ruleset which replaces kill switch table (or only removes it if interface is None)
+
+    Table is added and deleted first, so that whole ruleset is one atomic transaction
+    which works whether the table already exists or not. Only outgoing traffic through loopback,
+    VPN interface, to endpoints (remote servers and DNS servers outside of VPN), DHCP and IPv6
+    neighbor discovery is allowed.
+    """
+    lines = ["add table inet {}".format(KILLSWITCH_TABLE), "delete table inet {}".format(KILLSWITCH_TABLE)]
+    if interface is None:
+        return "\n".join(lines) + "\n"
+
+    lines.extend([
+        "# Kill switch of {}".format(unit),
+        "table inet {} {{".format(KILLSWITCH_TABLE),
+        "    chain output {",
+        "        type filter hook output priority 0; policy drop;",
+        "        oifname \"lo\" accept",
+        "        oifname \"{}\" accept".format(interface),
+        "        udp sport 68 udp dport 67 accept",
+        "        udp sport 546 udp dport 547 accept",
+        "        icmpv6 type { nd-router-solicit, nd-neighbor-solicit, nd-neighbor-advert } accept",
+    ])
+    for address, port, proto in endpoints:
+        lines.append("        {} daddr {} {} dport {} accept".format(
+            "ip" if address.version == 4 else "ip6", address, proto, port))
+    lines.extend(["    }", "}"])
+    return "\n".join(lines) + "\n"
+
+
+def load_ruleset(ruleset):
+    """Load nftables ruleset by one `nft -f` transaction (it is applied completely or not at all)"""
+    process = subprocess.Popen(["nft", "-f", "-"], stdin=subprocess.PIPE, stdout=sys.stderr,
+                               universal_newlines=True)
+    process.communicate(ruleset)
+    return process.returncode
+
+
+def main():
+    # Run one command given on command line
+    if len(sys.argv) > 1:
+        if not is_valid(sys.argv[1:]):
+            print("Invalid command: {}".format(" ".join(sys.argv[1:])), file=sys.stderr)
+            sys.exit(INVALID_REQUEST)
+        sys.exit(run_command(sys.argv[1], sys.argv[2], sys.argv[3:]))
+
+    # GUI waits for this line (escalation of privileges succeeded)
+    print("READY", flush=True)
+    for line in sys.stdin:
+        try:
+            request_id, command, unit, args = parse_request(line)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            continue
+
+        retcode = run_command(command, unit, args) if command else INVALID_REQUEST
+        print("{} {}".format(request_id, retcode), flush=True)
+
+
+if __name__ == "__main__":
+    main()
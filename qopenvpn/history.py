@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""Persistent history of VPN connections.
+Every transition of VPN unit (up, down, unexpected drop, automatic reconnect) is appended
+to SQLite database indexed by time and unit, so that uptime, mean time to recovery (MTTR)
+and drop frequency can be computed over months of history without reading the journal.
+"""
+
+import os, time, sqlite3
+
+# Events which change state of unit (up / not up)
+STATE_EVENTS = ("up", "down", "drop")
+EVENTS = STATE_EVENTS + ("reconnect",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    unit TEXT NOT NULL,
+    event TEXT NOT NULL,
+    reason TEXT NOT NULL DEFAULT '',
+    external_ip TEXT NOT NULL DEFAULT '',
+    bytes_in INTEGER,
+    bytes_out INTEGER
+);
+CREATE INDEX IF NOT EXISTS events_unit_time ON events (unit, time, event);
+CREATE INDEX IF NOT EXISTS events_time ON events (time);
+"""
+
+
+def default_path():
+    """Return path of history database in application data directory"""
+    from PyQt5 import QtCore
+    data_dir = QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.AppDataLocation)
+    return os.path.join(data_dir, "history.sqlite")
+
+
+class HistoryStore(object):
+    """SQLite store of VPN connection events"""
+    def __init__(self, path=None):
+        self._path = path or default_path()
+        if self._path != ":memory:":
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        self._db = sqlite3.connect(self._path)
+        self._db.executescript(SCHEMA)
+        self._last_states = {}
+
+    def close(self):
+        """Close database"""
+        self._db.close()
+
+    def last_state(self, unit):
+        """Return last recorded state event of unit (up, down or drop; empty string if there is none)"""
+        if unit not in self._last_states:
+            row = self._db.execute(
+                "SELECT event FROM events WHERE unit = ? AND event IN (?, ?, ?) ORDER BY time DESC LIMIT 1",
+                (unit,) + STATE_EVENTS
+            ).fetchone()
+            self._last_states[unit] = row[0] if row else ""
+        return self._last_states[unit]
+
+    def record(self, unit, event, reason="", external_ip="", bytes_in=None, bytes_out=None, timestamp=None):
+        """Append event to history and return its id
+        (state events which don't change state of unit are ignored and None is returned)"""
+        if event not in EVENTS:
+            raise ValueError("Unknown history event: {}".format(event))
+
+        if event in STATE_EVENTS:
+            last_state = self.last_state(unit)
+            if event == last_state or (event == "drop" and last_state != "up"):
+                # Only unit which is up can drop, down after drop is recorded (it ends the outage)
+                return None
+            if event != "up" and not last_state:
+                # Unit which has never been up can't go down
+                return None
+            self._last_states[unit] = event
+
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT INTO events (time, unit, event, reason, external_ip, bytes_in, bytes_out) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (timestamp or time.time(), unit, event, reason, external_ip, bytes_in, bytes_out)
+            )
+        return cursor.lastrowid
+
+    def set_external_ip(self, event_id, external_ip):
+        """Store external IP address of event (it is usually known only after VPN is up for a while)"""
+        with self._db:
+            self._db.execute("UPDATE events SET external_ip = ? WHERE id = ?", (external_ip, event_id))
+
+    def units(self):
+        """Return list of units which have some history"""
+        return [row[0] for row in self._db.execute("SELECT DISTINCT unit FROM events ORDER BY unit")]
+
+    def events(self, unit=None, since=None, limit=100):
+        """Return newest events as list of dicts (oldest first)"""
+        query = "SELECT id, time, unit, event, reason, external_ip, bytes_in, bytes_out FROM events"
+        conditions, params = [], []
+        if unit:
+            conditions.append("unit = ?")
+            params.append(unit)
+        if since is not None:
+            conditions.append("time >= ?")
+            params.append(since)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY time DESC LIMIT ?"
+        params.append(limit)
+
+        columns = ("id", "time", "unit", "event", "reason", "external_ip", "bytes_in", "bytes_out")
+        return [dict(zip(columns, row)) for row in reversed(self._db.execute(query, params).fetchall())]
+
+    def summary(self, unit, since, until=None):
+        """Compute uptime (fraction of time), number of drops, drops per day and MTTR (mean time
+        in seconds from drop to next up, None if there was no recovery) in given time range"""
+        until = until or time.time()
+
+        # State at the beginning of range is given by last state event before it
+        row = self._db.execute(
+            "SELECT event FROM events WHERE unit = ? AND time < ? AND event IN (?, ?, ?) "
+            "ORDER BY time DESC LIMIT 1",
+            (unit, since) + STATE_EVENTS
+        ).fetchone()
+        state = row[0] if row else ""
+        state_since = since
+
+        uptime = 0.0
+        drops = 0
+        drop_time = None
+        repair_times = []
+        for timestamp, event in self._db.execute(
+                "SELECT time, event FROM events WHERE unit = ? AND time >= ? AND time < ? AND event IN (?, ?, ?) "
+                "ORDER BY time", (unit, since, until) + STATE_EVENTS):
+            if state == "up":
+                uptime += timestamp - state_since
+            if event == "drop":
+                drops += 1
+                drop_time = timestamp
+            elif event == "up" and drop_time is not None:
+                repair_times.append(timestamp - drop_time)
+                drop_time = None
+            elif event == "down":
+                drop_time = None
+            state, state_since = event, timestamp
+
+        if state == "up":
+            uptime += until - state_since
+
+        duration = until - since
+        return {
+            "unit": unit,
+            "uptime": uptime / duration if duration > 0 else 0.0,
+            "drops": drops,
+            "drops_per_day": drops / duration * 86400 if duration > 0 else 0.0,
+            "mttr": sum(repair_times) / len(repair_times) if repair_times else None,
+        }
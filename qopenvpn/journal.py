@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""Streaming reader of systemd journal.
+Follows `journalctl -o json` output of systemd unit by QProcess and remembers cursor
+of last received entry, so that only new entries are read after restart (cursor can be also
+restored from previous run, entries logged since then are read even if they are from previous boot).
+"""
+
+import json, time
+from PyQt5 import QtCore
+
+# OpenVPN logs everything with info priority, so severity of messages is guessed from their text
+ERROR_KEYWORDS = ("error", "fatal", "auth_failed", "failed")
+WARNING_KEYWORDS = ("warning", "inactivity timeout", "connection reset", "restarting", "refused")
+
+
+def decode_field(value):
+    """Decode journal field value (binary values are exported as list of bytes)"""
+    if isinstance(value, list):
+        return bytes(value).decode("utf8", errors="replace")
+    return value if value is not None else ""
+
+
+def entry_timestamp(entry):
+    """Return timestamp of journal entry (in seconds)"""
+    try:
+        return int(entry.get("__REALTIME_TIMESTAMP", 0)) / 1000000
+    except ValueError:
+        return 0
+
+
+def entry_priority(entry):
+    """Return syslog priority of journal entry (error and warning messages logged
+    with lower priority are recognized by keywords)"""
+    try:
+        priority = int(decode_field(entry.get("PRIORITY", 6)))
+    except ValueError:
+        priority = 6
+
+    if priority > 4:
+        message = decode_field(entry.get("MESSAGE", "")).lower()
+        if any(keyword in message for keyword in ERROR_KEYWORDS):
+            return 3
+        if any(keyword in message for keyword in WARNING_KEYWORDS):
+            return 4
+    return priority
+
+
+def format_entry(entry):
+    """Format journal entry the same way as `journalctl -o short` does"""
+    timestamp = entry_timestamp(entry)
+    identifier = decode_field(entry.get("SYSLOG_IDENTIFIER") or entry.get("_COMM", ""))
+    pid = decode_field(entry.get("_PID", ""))
+    return "{} {} {}{}: {}".format(
+        time.strftime("%b %d %H:%M:%S", time.localtime(timestamp)),
+        decode_field(entry.get("_HOSTNAME", "")),
+        identifier,
+        "[{}]".format(pid) if pid else "",
+        decode_field(entry.get("MESSAGE", ""))
+    )
+
+
+def entry_invocation(entry):
+    """Return invocation ID of unit run which logged journal entry (messages of systemd itself
+    about unit have it in INVOCATION_ID field)"""
+    return decode_field(entry.get("_SYSTEMD_INVOCATION_ID") or entry.get("INVOCATION_ID", ""))
+
+
+class JournalReader(QtCore.QObject):
+    """Follow journal of systemd unit and emit newly received entries (timestamp, priority, line),
+    with invocation ID of unit run as fourth item if invocation_ids is True"""
+    entriesReceived = QtCore.pyqtSignal(list)
+
+    def __init__(self, unit, lines=1000, sudo_command="", parent=None, cursor="", invocation_ids=False):
+        super().__init__(parent)
+        self._unit = unit
+        self._lines = lines
+        self._sudo_command = sudo_command
+        self._cursor = cursor
+        self._invocation_ids = invocation_ids
+        self._buffer = b""
+        self._stopping = False
+        self._restart = False
+        self._delete = False
+
+        self._process = QtCore.QProcess(self)
+        self._process.setProcessChannelMode(QtCore.QProcess.ForwardedErrorChannel)
+        self._process.readyReadStandardOutput.connect(self._read_output)
+        self._process.finished.connect(self._process_finished)
+
+        # journalctl is killed if it doesn't terminate in time after stop
+        self._kill_timer = QtCore.QTimer(self)
+        self._kill_timer.setSingleShot(True)
+        self._kill_timer.setInterval(3000)
+        self._kill_timer.timeout.connect(self._process.kill)
+
+        app = QtCore.QCoreApplication.instance()
+        if app:
+            app.aboutToQuit.connect(self._kill)
+
+    def unit(self):
+        """Return followed unit"""
+        return self._unit
+
+    def cursor(self):
+        """Return cursor of last received journal entry"""
+        return self._cursor
+
+    def is_running(self):
+        """Return True if journalctl is running"""
+        return self._process.state() != QtCore.QProcess.NotRunning
+
+    def cmdline(self):
+        """Return journalctl command line (continues after last received entry if cursor is known,
+        otherwise starts with last lines of current boot)"""
+        cmdline = [self._sudo_command] if self._sudo_command else []
+        cmdline.extend(["journalctl", "-u", self._unit, "--follow", "-o", "json"])
+        if self._cursor:
+            cmdline.append("--after-cursor={}".format(self._cursor))
+        else:
+            cmdline.extend(["-b", "--lines={}".format(self._lines)])
+        return cmdline
+
+    def start(self):
+        """Start following journal (does nothing if journalctl is already running,
+        if it is being stopped, it is started again after it exits)"""
+        if self.is_running():
+            self._restart = self._stopping
+            return
+
+        self._stopping = False
+        self._restart = False
+
+        self._buffer = b""
+        cmdline = self.cmdline()
+        self._process.start(cmdline[0], cmdline[1:])
+
+    def stop(self):
+        """Stop following journal without waiting for journalctl to exit
+        (it is killed if it doesn't terminate in 3 seconds, entries received meanwhile are dropped)"""
+        self._restart = False
+        if self.is_running() and not self._stopping:
+            self._stopping = True
+            self._process.terminate()
+            self._kill_timer.start()
+
+    def close(self):
+        """Stop following journal and delete reader after journalctl exits"""
+        self.stop()
+        if self.is_running():
+            self._delete = True
+        else:
+            self.deleteLater()
+
+    def _kill(self):
+        """Kill journalctl when application quits (QProcess mustn't be destroyed while it runs)"""
+        if self.is_running():
+            self._process.kill()
+            self._process.waitForFinished(1000)
+
+    def _process_finished(self):
+        """Start journalctl again or delete reader if it was requested while journalctl was stopping"""
+        self._kill_timer.stop()
+        self._stopping = False
+        if self._delete:
+            self.deleteLater()
+        elif self._restart:
+            self.start()
+
+    def _read_output(self):
+        """Parse newly received journal entries"""
+        if self._stopping:
+            self._process.readAllStandardOutput()
+            return
+
+        data = self._buffer + bytes(self._process.readAllStandardOutput())
+        data, sep, self._buffer = data.rpartition(b"\n")
+        if not sep:
+            return
+
+        entries = []
+        for line in data.split(b"\n"):
+            try:
+                entry = json.loads(line.decode("utf8"))
+            except ValueError:
+                continue
+
+            self._cursor = entry.get("__CURSOR", self._cursor)
+            if self._invocation_ids:
+                entries.append((entry_timestamp(entry), entry_priority(entry), format_entry(entry),
+                                entry_invocation(entry)))
+            else:
+                entries.append((entry_timestamp(entry), entry_priority(entry), format_entry(entry)))
+
+        if entries:
+            self.entriesReceived.emit(entries)
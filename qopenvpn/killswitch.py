@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Preparation of kill switch for VPN profile (nftables ruleset itself is built and loaded
+by privileged helper). Remote servers are resolved to IP addresses before kill switch is enabled
+and DNS servers outside of VPN are allowed too, because OpenVPN resolves names of remotes again
+whenever it reconnects (while tunnel is down).
+"""
+
+import socket, fnmatch
+from concurrent import futures
+
+from qopenvpn import dnscheck
+from qopenvpn.latency import proto_family
+
+
+def interface_pattern(dev):
+    """Return name (or nftables wildcard) of VPN interface for dev option of profile
+    (`tun` means any tun interface, OpenVPN picks first free one)"""
+    if not dev or dev in ("tun", "tap"):
+        return "{}*".format(dev or "tun")
+    return dev
+
+
+def resolve_endpoints(remotes, timeout=5):
+    """Resolve remotes [host, port, proto] to list of endpoints `<ip>,<port>,<proto>` (all addresses
+    of every host, hosts which couldn't be resolved in time are skipped)"""
+    executor = futures.ThreadPoolExecutor(max_workers=max(len(remotes), 1))
+    resolving = [(executor.submit(socket.getaddrinfo, host, port, proto_family(proto), socket.SOCK_STREAM),
+                  port, proto) for host, port, proto in remotes]
+    executor.shutdown(wait=False)
+
+    endpoints = []
+    done, not_done = futures.wait([f for f, port, proto in resolving], timeout=timeout)
+    for future, port, proto in resolving:
+        if future not in done or future.exception():
+            continue
+        for info in future.result():
+            endpoint = "{},{},{}".format(info[4][0], port, proto)
+            if endpoint not in endpoints:
+                endpoints.append(endpoint)
+    return endpoints
+
+
+def dns_endpoints(vpn_interface, servers=None, routes=None):
+    """Return endpoints `<ip>,53,udp` and `<ip>,53,tcp` of configured DNS servers which are reached
+    outside of VPN interface (local resolver is reached through loopback, which is always allowed)"""
+    if servers is None:
+        servers = dnscheck.resolved_servers() or dnscheck.resolv_conf_servers()
+    if routes is None:
+        routes = dnscheck.parse_routes()
+
+    endpoints = []
+    for address, link, domains in servers:
+        iface = dnscheck.route_interface(address, routes)
+        if not iface or iface == "lo" or fnmatch.fnmatchcase(iface, vpn_interface):
+            continue
+        for proto in ("udp", "tcp"):
+            endpoint = "{},53,{}".format(address, proto)
+            if endpoint not in endpoints:
+                endpoints.append(endpoint)
+    return endpoints
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""Latency probing of OpenVPN remote servers (used to connect to the fastest `remote` of profile).
+All remotes are probed concurrently by asyncio with one shared deadline: UDP remotes by OpenVPN
+P_CONTROL_HARD_RESET_CLIENT_V2 packet (server answers with P_CONTROL_HARD_RESET_SERVER_V2,
+servers with tls-auth / tls-crypt don't answer at all), TCP remotes by TCP connect.
+Measured RTTs are cached, so repeated connects don't probe again.
+"""
+
+import os, socket, time, threading, asyncio
+
+P_CONTROL_HARD_RESET_CLIENT_V2 = 7
+P_CONTROL_HARD_RESET_SERVER_V2 = 8
+
+# Interval of retransmission of UDP probe (probe packet or its response could be lost)
+RETRANSMIT_INTERVAL = 0.5
+
+# Cache of measured RTTs ((host, port, proto) -> (RTT or None, time of measurement))
+_cache_lock = threading.Lock()
+_cache = {}
+
+
+def reset_packet(session_id):
+    """Build P_CONTROL_HARD_RESET_CLIENT_V2 packet (opcode and key id, session id,
+    empty ACK array and message packet id)"""
+    return bytes([P_CONTROL_HARD_RESET_CLIENT_V2 << 3]) + session_id + b"\x00" + b"\x00\x00\x00\x00"
+
+
+def is_reset_response(data, session_id):
+    """Check if packet is P_CONTROL_HARD_RESET_SERVER_V2 acknowledging our session"""
+    if len(data) < 10 or data[0] >> 3 != P_CONTROL_HARD_RESET_SERVER_V2:
+        return False
+    acks = data[9]
+    if acks == 0:
+        return True
+    offset = 10 + acks * 4
+    return data[offset:offset + 8] == session_id
+
+
+def proto_family(proto):
+    """Return address family forced by protocol (udp4, tcp6-client, ...)"""
+    if "4" in proto:
+        return socket.AF_INET
+    if "6" in proto:
+        return socket.AF_INET6
+    return socket.AF_UNSPEC
+
+
+class ResetProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol which waits for response to hard reset packet"""
+    def __init__(self, session_id, future):
+        self._session_id = session_id
+        self._future = future
+
+    def datagram_received(self, data, addr):
+        if not self._future.done() and is_reset_response(data, self._session_id):
+            self._future.set_result(time.monotonic())
+
+    def error_received(self, exc):
+        # E.g. ICMP port unreachable
+        if not self._future.done():
+            self._future.set_exception(exc)
+
+
+async def probe_udp(host, port, proto):
+    """Return RTT of OpenVPN server over UDP (measured from first probe packet)"""
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, port, family=proto_family(proto), type=socket.SOCK_DGRAM)
+    family, addr = infos[0][0], infos[0][4]
+
+    session_id = os.urandom(8)
+    future = loop.create_future()
+    transport, protocol = await loop.create_datagram_endpoint(lambda: ResetProtocol(session_id, future),
+                                                              family=family, remote_addr=addr)
+    try:
+        start = time.monotonic()
+        while True:
+            transport.sendto(reset_packet(session_id))
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), RETRANSMIT_INTERVAL) - start
+            except asyncio.TimeoutError:
+                continue
+    finally:
+        transport.close()
+
+
+async def probe_tcp(host, port, proto):
+    """Return RTT of OpenVPN server over TCP (duration of TCP handshake)"""
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, port, family=proto_family(proto), type=socket.SOCK_STREAM)
+    family, addr = infos[0][0], infos[0][4]
+
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setblocking(False)
+        start = time.monotonic()
+        await loop.sock_connect(sock, addr)
+        return time.monotonic() - start
+    finally:
+        sock.close()
+
+
+async def probe_all(remotes, timeout):
+    """Probe all remotes concurrently and return list of RTTs (None for remotes which didn't answer
+    before deadline)"""
+    loop = asyncio.get_running_loop()
+    tasks = [loop.create_task(probe_udp(*remote) if remote[2].startswith("udp") else probe_tcp(*remote))
+             for remote in remotes]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for t in pending:
+        t.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return [t.result() if t in done and not t.exception() else None for t in tasks]
+
+
+def probe_remotes(remotes, timeout=2, ttl=300):
+    """Return dict (host, port, proto) -> RTT in seconds (None if remote didn't answer),
+    fresh cached RTTs are reused and only remaining remotes are probed"""
+    remotes = [(host, int(port), proto) for host, port, proto in remotes]
+    now = time.monotonic()
+    with _cache_lock:
+        rtts = {r: _cache[r][0] for r in remotes if r in _cache and now - _cache[r][1] < ttl}
+    missing = [r for r in dict.fromkeys(remotes) if r not in rtts]
+    if not missing:
+        return rtts
+
+    # Own event loop (name resolution threads which didn't finish before deadline are abandoned,
+    # asyncio.run() would wait for them)
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(probe_all(missing, timeout))
+    finally:
+        loop.close()
+
+    now = time.monotonic()
+    with _cache_lock:
+        for remote, rtt in zip(missing, results):
+            _cache[remote] = (rtt, now)
+            rtts[remote] = rtt
+    return rtts
+
+
+def fastest_remote(remotes, timeout=2, ttl=300):
+    """Return remote (host, port, proto) with lowest RTT (or None if no remote answered),
+    remotes with equal RTT are ordered as in configuration file"""
+    rtts = probe_remotes(remotes, timeout, ttl)
+    answered = [(rtts[r], i, r) for i, r in enumerate((h, int(p), proto) for h, p, proto in remotes)
+                if rtts.get(r) is not None]
+    return min(answered)[2] if answered else None
+
+
+def invalidate_cache():
+    """Forget measured RTTs (e.g. when network changes)"""
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+"""Compact on-disk archive of OpenVPN logs (survives reboot even with volatile journal).
+Log lines of every tunnel session (one run of systemd unit, identified by its invocation ID)
+are stored in directory of session as gzip-compressed chunks of limited size. Small JSON index
+of session keeps time range of every chunk, so that reading of time range decompresses only
+chunks which overlap it. Oldest sessions are deleted when archive exceeds its size or age limit.
+"""
+
+import os, re, json, gzip, time, shutil, threading, collections
+
+INDEX_NAME = "index.json"
+
+# Chunk is finished when it has this many lines or uncompressed bytes
+CHUNK_LINES = 5000
+CHUNK_BYTES = 1024 * 1024
+
+# Default retention policy
+MAX_BYTES = 50 * 1024 * 1024
+MAX_AGE = 90 * 86400
+
+
+def default_path():
+    """Return path of log archive in application data directory"""
+    from PyQt5 import QtCore
+    data_dir = QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.AppDataLocation)
+    return os.path.join(data_dir, "logs")
+
+
+def encode_entry(timestamp, priority, line):
+    """Encode log entry as one line of chunk"""
+    return (json.dumps([timestamp, priority, line], ensure_ascii=False) + "\n").encode("utf8")
+
+
+def read_chunk(path):
+    """Return list of entries (timestamp, priority, line) stored in chunk
+    (chunk truncated by crash is read up to the damaged part)"""
+    entries = []
+    try:
+        with gzip.open(path, "rb") as f:
+            for data in f:
+                try:
+                    timestamp, priority, line = json.loads(data.decode("utf8"))
+                except ValueError:
+                    continue
+                entries.append((timestamp, priority, line))
+    except (OSError, EOFError, ValueError):
+        pass
+    return entries
+
+
+def write_json(path, data):
+    """Atomically replace JSON file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class Session(object):
+    """Archived session of unit (index is kept in memory, new entries are buffered until flush)"""
+    def __init__(self, directory, index, chunk_lines=CHUNK_LINES, chunk_bytes=CHUNK_BYTES):
+        self.directory = directory
+        self.index = index
+        self.chunk_lines = chunk_lines
+        self.chunk_bytes = chunk_bytes
+        self._pending = []
+
+    @property
+    def id(self):
+        return os.path.basename(self.directory)
+
+    @classmethod
+    def create(cls, root, unit, key, timestamp, **kwargs):
+        """Create new session directory"""
+        name = "{}-{}".format(time.strftime("%Y%m%d-%H%M%S", time.localtime(timestamp)),
+                              re.sub(r"[^\w@.-]", "_", unit))
+        if key:
+            name += "-{}".format(key[:8])
+        directory = os.path.join(root, name)
+        suffix = 1
+        while os.path.exists(directory):
+            suffix += 1
+            directory = os.path.join(root, "{}-{}".format(name, suffix))
+        os.makedirs(directory)
+
+        index = {"unit": unit, "key": key, "start": timestamp, "end": timestamp, "lines": 0,
+                 "bytes": 0, "cursor": "", "chunks": []}
+        session = cls(directory, index, **kwargs)
+        session.save_index()
+        return session
+
+    @classmethod
+    def load(cls, directory, **kwargs):
+        """Open existing session directory"""
+        with open(os.path.join(directory, INDEX_NAME)) as f:
+            return cls(directory, json.load(f), **kwargs)
+
+    def info(self):
+        """Return copy of index without list of chunks (with session id)"""
+        info = {k: v for k, v in self.index.items() if k != "chunks"}
+        info["id"] = self.id
+        info["lines"] += len(self._pending)
+        return info
+
+    def append(self, entries, cursor=""):
+        """Buffer entries (timestamp, priority, line)"""
+        for timestamp, priority, line in entries:
+            self.index["start"] = min(self.index["start"], timestamp)
+            self.index["end"] = max(self.index["end"], timestamp)
+            self._pending.append((timestamp, priority, line))
+        if cursor:
+            self.index["cursor"] = cursor
+
+    def pending(self, since=None, until=None):
+        """Return buffered entries in time range"""
+        return [e for e in self._pending if (since is None or e[0] >= since) and (until is None or e[0] <= until)]
+
+    def chunks(self, since=None, until=None):
+        """Return paths of chunks which overlap time range"""
+        return [os.path.join(self.directory, chunk["file"]) for chunk in self.index["chunks"]
+                if (since is None or chunk["last"] >= since) and (until is None or chunk["first"] <= until)]
+
+    def flush(self):
+        """Write buffered entries to chunks (every flush appends gzip member to last unfinished chunk,
+        finished chunk is recompressed as one member)"""
+        pending, self._pending = self._pending, []
+        i = 0
+        while i < len(pending):
+            chunks = self.index["chunks"]
+            if not chunks or chunks[-1]["lines"] >= self.chunk_lines or chunks[-1]["raw_bytes"] >= self.chunk_bytes:
+                chunks.append({"file": "{:06d}.log.gz".format(len(chunks)), "first": pending[i][0],
+                               "last": pending[i][0], "lines": 0, "raw_bytes": 0, "bytes": 0, "members": 0})
+            chunk = chunks[-1]
+
+            data = []
+            while i < len(pending) and chunk["lines"] < self.chunk_lines and chunk["raw_bytes"] < self.chunk_bytes:
+                timestamp, priority, line = pending[i]
+                i += 1
+                encoded = encode_entry(timestamp, priority, line)
+                data.append(encoded)
+                chunk["first"] = min(chunk["first"], timestamp)
+                chunk["last"] = max(chunk["last"], timestamp)
+                chunk["lines"] += 1
+                chunk["raw_bytes"] += len(encoded)
+
+            path = os.path.join(self.directory, chunk["file"])
+            with open(path, "ab") as f:
+                f.write(gzip.compress(b"".join(data)))
+            chunk["members"] += 1
+            if chunk["members"] > 1 and (chunk["lines"] >= self.chunk_lines or chunk["raw_bytes"] >= self.chunk_bytes):
+                self._compact(path)
+                chunk["members"] = 1
+
+            self.index["bytes"] += os.path.getsize(path) - chunk["bytes"]
+            chunk["bytes"] = os.path.getsize(path)
+            self.index["lines"] += len(data)
+        self.save_index()
+
+    def _compact(self, path):
+        """Recompress chunk written by several flushes as one gzip member (better compression)"""
+        with gzip.open(path, "rb") as f:
+            data = f.read()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(data))
+        os.replace(tmp_path, path)
+
+    def save_index(self):
+        """Write index of session"""
+        write_json(os.path.join(self.directory, INDEX_NAME), self.index)
+
+
+class LogArchive(object):
+    """Archive of log sessions with retention policy (safe to read from background thread)"""
+    def __init__(self, path=None, max_bytes=MAX_BYTES, max_age=MAX_AGE, chunk_lines=CHUNK_LINES,
+                 chunk_bytes=CHUNK_BYTES):
+        self._path = path or default_path()
+        os.makedirs(self._path, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._chunk_options = {"chunk_lines": chunk_lines, "chunk_bytes": chunk_bytes}
+        self._lock = threading.Lock()
+        self._open = {}
+
+    def _load(self, session_id):
+        """Return open session or load it from disk"""
+        for session in self._open.values():
+            if session.id == session_id:
+                return session
+        return Session.load(os.path.join(self._path, session_id), **self._chunk_options)
+
+    def _stored_sessions(self):
+        """Return list of (session id, index) of all sessions stored on disk"""
+        sessions = []
+        for name in os.listdir(self._path):
+            try:
+                with open(os.path.join(self._path, name, INDEX_NAME)) as f:
+                    sessions.append((name, json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return sessions
+
+    def sessions(self, unit=None):
+        """Return list of sessions (dicts with id, unit, start, end, lines and bytes), newest first"""
+        with self._lock:
+            open_sessions = {session.id: session for session in self._open.values()}
+            result = []
+            for session_id, index in self._stored_sessions():
+                if session_id in open_sessions:
+                    info = open_sessions[session_id].info()
+                else:
+                    info = {k: v for k, v in index.items() if k != "chunks"}
+                    info["id"] = session_id
+                if not unit or info["unit"] == unit:
+                    result.append(info)
+        return sorted(result, key=lambda s: s["start"], reverse=True)
+
+    def last_cursor(self, unit):
+        """Return journal cursor of last archived entry of unit (empty string if unknown)"""
+        for session in self.sessions(unit):
+            if session.get("cursor"):
+                return session["cursor"]
+        return ""
+
+    def append(self, unit, entries, key="", cursor=""):
+        """Append entries (timestamp, priority, line) to session of unit identified by key
+        (new session is started when key changes, earlier session with the same key is continued)"""
+        if not entries:
+            return
+
+        with self._lock:
+            session = self._open.get(unit)
+            if session and session.index["key"] != key:
+                session.flush()
+                del self._open[unit]
+                session = None
+
+            if not session:
+                stored = [session_id for session_id, index in self._stored_sessions()
+                          if key and index["unit"] == unit and index["key"] == key]
+                if stored:
+                    session = Session.load(os.path.join(self._path, stored[0]), **self._chunk_options)
+                else:
+                    session = Session.create(self._path, unit, key, entries[0][0], **self._chunk_options)
+                self._open[unit] = session
+            session.append(entries, cursor)
+
+    def read(self, session_id, since=None, until=None, limit=None):
+        """Return entries of session in time range (only last limit entries if it is given),
+        only chunks overlapping time range are decompressed"""
+        with self._lock:
+            try:
+                session = self._load(session_id)
+            except (OSError, ValueError):
+                return []
+            paths = session.chunks(since, until)
+            pending = session.pending(since, until)
+
+        entries = collections.deque(maxlen=limit)
+        for path in paths:
+            entries.extend(e for e in read_chunk(path)
+                           if (since is None or e[0] >= since) and (until is None or e[0] <= until))
+        entries.extend(pending)
+        return list(entries)
+
+    def flush(self):
+        """Write buffered entries of all open sessions and apply retention policy"""
+        with self._lock:
+            for session in self._open.values():
+                session.flush()
+        self.apply_retention()
+
+    def close(self, unit=None):
+        """Flush and close session of unit (or all sessions), next entries start new session"""
+        with self._lock:
+            for u in list(self._open):
+                if unit is None or u == unit:
+                    self._open.pop(u).flush()
+
+    def apply_retention(self, now=None):
+        """Delete oldest sessions (except open ones) until archive fits in size and age limits"""
+        now = now or time.time()
+        with self._lock:
+            open_ids = {session.id for session in self._open.values()}
+            sessions = sorted(self._stored_sessions(), key=lambda s: s[1]["end"])
+            total = sum(index["bytes"] for session_id, index in sessions)
+            for session_id, index in sessions:
+                if session_id in open_ids:
+                    continue
+                if total <= self.max_bytes and (not self.max_age or index["end"] >= now - self.max_age):
+                    continue
+                shutil.rmtree(os.path.join(self._path, session_id), ignore_errors=True)
+                total -= index["bytes"]
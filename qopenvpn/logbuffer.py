@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""Bounded in-memory buffer of log entries with token index.
+Entries are stored in ring buffer (oldest entries are dropped when it is full) and every
+entry is identified by its sequence number. Index maps lowercase word tokens to sorted
+arrays of sequence numbers, so that substring search needs to check only entries containing
+the most selective word of the query instead of scanning the whole buffer.
+"""
+
+import re, array, bisect
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Lowest priority (debug), entries with priority <= max_priority are matched by search
+MAX_PRIORITY = 7
+
+
+def tokenize(text):
+    """Split text to set of lowercase word tokens"""
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+class LogBuffer(object):
+    """Ring buffer of log entries (timestamp, priority, line) with token and priority index"""
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self._lines = [None] * capacity
+        self._priorities = bytearray(capacity)
+        self._times = array.array("d", bytes(8 * capacity))
+        self._start = 0
+        self._next = 0
+
+        # Index contains also sequence numbers of dropped entries (they are skipped by search)
+        # and it is rebuilt when there are too many of them
+        self._index = {}
+        self._priority_index = [array.array("q") for p in range(MAX_PRIORITY + 1)]
+        self._dropped = 0
+        self._vocabulary_cache = {}
+
+    def __len__(self):
+        return self._next - self._start
+
+    def first_seq(self):
+        """Return sequence number of oldest entry"""
+        return self._start
+
+    def next_seq(self):
+        """Return sequence number of next appended entry"""
+        return self._next
+
+    def line(self, seq):
+        """Return line of entry"""
+        return self._lines[seq % self.capacity]
+
+    def priority(self, seq):
+        """Return priority of entry"""
+        return self._priorities[seq % self.capacity]
+
+    def timestamp(self, seq):
+        """Return timestamp of entry"""
+        return self._times[seq % self.capacity]
+
+    def append(self, timestamp, priority, line):
+        """Append entry (oldest entry is dropped if buffer is full) and return its sequence number"""
+        if len(self) >= self.capacity:
+            self._start += 1
+            self._dropped += 1
+
+        seq = self._next
+        self._next += 1
+        i = seq % self.capacity
+        priority = min(max(priority, 0), MAX_PRIORITY)
+        self._lines[i] = line
+        self._priorities[i] = priority
+        self._times[i] = timestamp
+
+        self._priority_index[priority].append(seq)
+        for token in tokenize(line):
+            postings = self._index.get(token)
+            if postings is None:
+                postings = self._index[token] = array.array("q")
+                self._vocabulary_cache = {}
+            postings.append(seq)
+
+        if self._dropped >= self.capacity:
+            self._rebuild_index()
+        return seq
+
+    def extend(self, entries):
+        """Append entries (timestamp, priority, line) and return range of their sequence numbers"""
+        first = self._next
+        for timestamp, priority, line in entries:
+            self.append(timestamp, priority, line)
+        return range(max(first, self._start), self._next)
+
+    def clear(self):
+        """Remove all entries"""
+        self.__init__(self.capacity)
+
+    def matches(self, seq, query="", max_priority=MAX_PRIORITY, since=None, until=None):
+        """Return True if entry matches query and filters"""
+        i = seq % self.capacity
+        return (self._start <= seq < self._next and
+                self._priorities[i] <= max_priority and
+                (since is None or self._times[i] >= since) and
+                (until is None or self._times[i] < until) and
+                (not query or query.lower() in self._lines[i].lower()))
+
+    def search(self, query="", max_priority=MAX_PRIORITY, since=None, until=None):
+        """Return sorted list of sequence numbers of entries which contain query
+        (case-insensitive substring) and match priority and time filters"""
+        start, end = self._time_range(since, until)
+        if start >= end:
+            return []
+
+        query = query.lower()
+        tokens = TOKEN_RE.findall(query)
+        if tokens:
+            # Every word of query is part of some word of matching line,
+            # so only entries containing the most selective word are checked
+            cache = self._vocabulary_cache
+            self._vocabulary_cache = {token: self._matching_words(token, cache) for token in tokens}
+            words = min(self._vocabulary_cache.values(),
+                        key=lambda words: sum(len(self._index[word]) for word in words))
+            candidates = set()
+            for word in words:
+                candidates.update(self._slice(self._index[word], start, end))
+            candidates = sorted(candidates)
+        elif max_priority < MAX_PRIORITY:
+            candidates = []
+            for p in range(max_priority + 1):
+                candidates.extend(self._slice(self._priority_index[p], start, end))
+            candidates.sort()
+            max_priority = MAX_PRIORITY
+        else:
+            candidates = range(start, end)
+
+        lines, priorities, capacity = self._lines, self._priorities, self.capacity
+        if query and max_priority < MAX_PRIORITY:
+            return [seq for seq in candidates if priorities[seq % capacity] <= max_priority and
+                    query in lines[seq % capacity].lower()]
+        elif query:
+            return [seq for seq in candidates if query in lines[seq % capacity].lower()]
+        elif max_priority < MAX_PRIORITY:
+            return [seq for seq in candidates if priorities[seq % capacity] <= max_priority]
+        return list(candidates)
+
+    def _matching_words(self, token, cache):
+        """Return list of indexed words which contain token"""
+        # Search-as-you-type usually extends previous query, so only words matched by its tokens are checked
+        words = self._index
+        for cached_token, cached_words in cache.items():
+            if cached_token in token and len(cached_words) < len(words):
+                words = cached_words
+        return [word for word in words if token in word]
+
+    def _slice(self, seqs, start, end):
+        """Return part of sorted sequence numbers between start and end"""
+        return seqs[bisect.bisect_left(seqs, start):bisect.bisect_left(seqs, end)]
+
+    def _time_range(self, since, until):
+        """Return range of sequence numbers of entries between since and until
+        (entries are expected to be appended in chronological order)"""
+        start, end = self._start, self._next
+        if since is not None:
+            start = self._bisect_time(since, start, end)
+        if until is not None:
+            end = self._bisect_time(until, start, end)
+        return start, end
+
+    def _bisect_time(self, timestamp, lo, hi):
+        """Return sequence number of first entry not older than timestamp"""
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._times[mid % self.capacity] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _rebuild_index(self):
+        """Rebuild index from entries which are still in buffer"""
+        self._index = {}
+        self._priority_index = [array.array("q") for p in range(MAX_PRIORITY + 1)]
+        self._vocabulary_cache = {}
+        for seq in range(self._start, self._next):
+            i = seq % self.capacity
+            self._priority_index[self._priorities[i]].append(seq)
+            for token in tokenize(self._lines[i]):
+                self._index.setdefault(token, array.array("q")).append(seq)
+        self._dropped = 0
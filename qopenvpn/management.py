@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""Client for OpenVPN management interface.
+Keeps one persistent connection to management socket (unix socket or TCP host:port)
+and subscribes to real-time state and bytecount notifications.
+"""
+
+import time
+from PyQt5 import QtCore, QtNetwork
+
+
+def parse_address(address):
+    """Parse management address (path to unix socket or host:port)"""
+    if address.startswith("/"):
+        return (address, None)
+
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError("Invalid management interface address: {}".format(address))
+    return (host.strip("[]") or "127.0.0.1", int(port))
+
+
+class ManagementClient(QtCore.QObject):
+    """Persistent non-blocking connection to OpenVPN management interface"""
+    connectedChanged = QtCore.pyqtSignal(bool)
+    stateChanged = QtCore.pyqtSignal(str)
+    bytecountChanged = QtCore.pyqtSignal(int, int)
+
+    def __init__(self, address, password="", bytecount_interval=2, reconnect_interval=5000, parent=None):
+        super().__init__(parent)
+        self._address = parse_address(address)
+        self._password = password
+        self._bytecount_interval = bytecount_interval
+        self._buffer = b""
+        self._connected = False
+        self._wanted = False
+        self.reset()
+
+        if self._address[1] is None:
+            self._socket = QtNetwork.QLocalSocket(self)
+        else:
+            self._socket = QtNetwork.QTcpSocket(self)
+        self._socket.connected.connect(self._socket_connected)
+        self._socket.disconnected.connect(self._socket_disconnected)
+        self._socket.readyRead.connect(self._read)
+        self._socket.errorOccurred.connect(self._socket_error)
+
+        # Connection is retried periodically while it is wanted (OpenVPN creates socket after start)
+        self._reconnect_timer = QtCore.QTimer(self)
+        self._reconnect_timer.setSingleShot(True)
+        self._reconnect_timer.setInterval(reconnect_interval)
+        self._reconnect_timer.timeout.connect(self._connect)
+
+    def reset(self):
+        """Reset statistics"""
+        self.state = ""
+        self.state_time = 0
+        self.local_ip = ""
+        self.remote_ip = ""
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.rate_in = 0.0
+        self.rate_out = 0.0
+        self._bytecount_time = 0
+
+    def is_connected(self):
+        """Return True if connected to management interface"""
+        return self._connected
+
+    def open(self):
+        """Connect to management interface (and keep reconnecting until close() is called)"""
+        self._wanted = True
+        if not self._connected and not self._reconnect_timer.isActive():
+            self._connect()
+
+    def close(self):
+        """Disconnect from management interface"""
+        self._wanted = False
+        self._reconnect_timer.stop()
+        self._socket.abort()
+        self._set_connected(False)
+
+    def send_command(self, command):
+        """Send command to management interface"""
+        if self._connected:
+            self._socket.write("{}\n".format(command).encode("utf8"))
+
+    def _connect(self):
+        """Start connecting to management socket"""
+        if self._address[1] is None:
+            self._socket.connectToServer(self._address[0])
+        else:
+            self._socket.connectToHost(self._address[0], self._address[1])
+
+    def _set_connected(self, connected):
+        """Store connection state and emit connectedChanged signal"""
+        if connected != self._connected:
+            self._connected = connected
+            if not connected:
+                self.reset()
+            self.connectedChanged.emit(connected)
+
+    def _socket_connected(self):
+        """Subscribe to notifications after connection is established"""
+        self._buffer = b""
+        self._set_connected(True)
+        if not self._password:
+            self._subscribe()
+
+    def _subscribe(self):
+        """Enable real-time state and bytecount notifications and get current state"""
+        self.send_command("state on")
+        self.send_command("state")
+        self.send_command("bytecount {}".format(self._bytecount_interval))
+
+    def _socket_disconnected(self):
+        """Handle closed connection"""
+        self._set_connected(False)
+        if self._wanted:
+            self._reconnect_timer.start()
+
+    def _socket_error(self, error):
+        """Retry connection later if management socket isn't available"""
+        if not self._connected and self._wanted and not self._reconnect_timer.isActive():
+            self._reconnect_timer.start()
+
+    def _read(self):
+        """Read and parse lines received from management interface"""
+        data = self._buffer + bytes(self._socket.readAll())
+        data, sep, self._buffer = data.rpartition(b"\n")
+
+        # Password prompt doesn't end with newline
+        if self._buffer.startswith(b"ENTER PASSWORD:"):
+            self._buffer = b""
+            self.send_command(self._password)
+            self._subscribe()
+
+        if not sep:
+            return
+
+        for line in data.decode("utf8", errors="replace").split("\n"):
+            self._parse_line(line.rstrip("\r"))
+
+    def _parse_line(self, line):
+        """Parse one line of management interface output"""
+        if line.startswith(">BYTECOUNT:"):
+            self._parse_bytecount(line[11:])
+        elif line.startswith(">STATE:"):
+            self._parse_state(line[7:])
+        elif line and line[0].isdigit() and "," in line:
+            # Response to `state` command
+            self._parse_state(line)
+
+    def _parse_state(self, value):
+        """Parse state notification (time,state,description,local_ip,remote_ip,...)"""
+        fields = value.split(",")
+        if len(fields) < 2:
+            return
+
+        self.state_time = int(fields[0]) if fields[0].isdigit() else 0
+        self.local_ip = fields[3] if len(fields) > 3 else ""
+        self.remote_ip = fields[4] if len(fields) > 4 else ""
+        if fields[1] != self.state:
+            self.state = fields[1]
+            self.stateChanged.emit(self.state)
+
+    def _parse_bytecount(self, value):
+        """Parse bytecount notification (bytes_in,bytes_out) and compute throughput"""
+        try:
+            bytes_in, bytes_out = (int(v) for v in value.split(","))
+        except ValueError:
+            return
+
+        now = time.monotonic()
+        if self._bytecount_time:
+            elapsed = now - self._bytecount_time
+            if elapsed > 0:
+                self.rate_in = max(bytes_in - self.bytes_in, 0) / elapsed
+                self.rate_out = max(bytes_out - self.bytes_out, 0) / elapsed
+        self._bytecount_time = now
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.bytecountChanged.emit(bytes_in, bytes_out)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+"""Export of tunnel metrics in Prometheus text format.
+Metrics are served over HTTP on local address and/or periodically written to file
+for textfile collector of node_exporter. All values are taken from state which is already
+cached by QOpenVPN (unit monitor, reconnect supervisor, management client and STUN client),
+so scraping never runs systemctl or sends STUN request.
+"""
+
+import os, sys, time, socket, collections
+from PyQt5 import QtCore, QtNetwork
+
+from qopenvpn import core
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+MAX_REQUEST_SIZE = 8192
+
+FAMILY_NAMES = {socket.AF_INET: "ipv4", socket.AF_INET6: "ipv6"}
+
+
+def parse_address(address):
+    """Parse host:port address of metrics endpoint (host defaults to localhost)"""
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError("Invalid metrics address: {}".format(address))
+    return (host.strip("[]") or "127.0.0.1", int(port))
+
+
+def escape_label(value):
+    """Escape label value for Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_metric(name, help_text, metric_type, samples):
+    """Format metric family (samples is list of (labels dict, value))"""
+    lines = ["# HELP {} {}".format(name, help_text), "# TYPE {} {}".format(name, metric_type)]
+    for labels, value in samples:
+        if labels:
+            label_text = ",".join('{}="{}"'.format(k, escape_label(v)) for k, v in sorted(labels.items()))
+            lines.append("{}{{{}}} {}".format(name, label_text, format_value(value)))
+        else:
+            lines.append("{} {}".format(name, format_value(value)))
+    return "\n".join(lines) + "\n"
+
+
+def format_value(value):
+    """Format sample value (integers are printed without exponent)"""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class MetricsExporter(QtCore.QObject):
+    """Collect tunnel state from signals of other components and export it in Prometheus format"""
+    def __init__(self, monitor, supervisor, parent=None):
+        super().__init__(parent)
+        self._monitor = monitor
+        self._supervisor = supervisor
+        self._management = None
+        self._management_unit = ""
+        self._units = []
+        self._state_changes = {}
+        self._reconnects = collections.Counter()
+        self._probe_failures = collections.Counter()
+        self._start_time = time.time()
+
+        self._monitor.stateChanged.connect(self._unit_state_changed)
+        self._supervisor.restartRequested.connect(self._restart_requested)
+        self._supervisor.healthProbeFailed.connect(self._probe_failed)
+
+        self._server = None
+        self._address = ""
+        self._textfile = ""
+        self._textfile_timer = QtCore.QTimer(self)
+        self._textfile_timer.timeout.connect(self.write_textfile)
+
+    def set_units(self, units):
+        """Set list of exported units"""
+        self._units = list(units)
+
+    def set_management(self, management_client, unit):
+        """Set client for OpenVPN management interface of unit (source of traffic counters)"""
+        self._management = management_client
+        self._management_unit = unit
+
+    def listen(self, address):
+        """Serve metrics over HTTP on address (host:port); return False if it couldn't be bound"""
+        host, port = parse_address(address)
+        if self._server and address == self._address:
+            return True
+
+        self.stop_listening()
+        self._address = address
+        self._server = QtNetwork.QTcpServer(self)
+        self._server.newConnection.connect(self._new_connection)
+        if not self._server.listen(QtNetwork.QHostAddress(host), port):
+            print("Couldn't serve metrics on {}: {}".format(address, self._server.errorString()), file=sys.stderr)
+            self.stop_listening()
+            return False
+        return True
+
+    def port(self):
+        """Return port of HTTP endpoint (0 if metrics aren't served over HTTP)"""
+        return self._server.serverPort() if self._server else 0
+
+    def stop_listening(self):
+        """Stop serving metrics over HTTP"""
+        if self._server:
+            self._server.close()
+            self._server.deleteLater()
+            self._server = None
+            self._address = ""
+
+    def set_textfile(self, path, interval=15):
+        """Write metrics to file every interval seconds (empty path disables it)"""
+        self._textfile = path
+        if path:
+            self._textfile_timer.start(interval * 1000)
+            self.write_textfile()
+        else:
+            self._textfile_timer.stop()
+
+    def write_textfile(self):
+        """Write metrics to textfile (atomically, so that collector never reads partial file)"""
+        if not self._textfile:
+            return
+        tmp_path = "{}.{}.tmp".format(self._textfile, os.getpid())
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(self.render())
+            os.replace(tmp_path, self._textfile)
+        except OSError as e:
+            print("Couldn't write metrics to {}: {}".format(self._textfile, e), file=sys.stderr)
+
+    def close(self):
+        """Stop exporting metrics"""
+        self.stop_listening()
+        self.set_textfile("")
+
+    def render(self):
+        """Return all metrics in Prometheus text format"""
+        now = time.time()
+        units = [(unit, self._monitor.state(unit)) for unit in self._units]
+        labels = {unit: {"unit": unit, "vpn": core.vpn_name(unit)} for unit, state in units}
+
+        metrics = [
+            format_metric("qopenvpn_tunnel_up", "Whether systemd unit of VPN is active", "gauge",
+                          [(labels[unit], state == "active") for unit, state in units]),
+            format_metric("qopenvpn_tunnel_state", "Last known ActiveState of systemd unit of VPN", "gauge",
+                          [(dict(labels[unit], state=state), 1) for unit, state in units]),
+            format_metric("qopenvpn_tunnel_state_change_timestamp_seconds",
+                          "Time of last observed state change of VPN (or start of QOpenVPN)", "gauge",
+                          [(labels[unit], self._state_changes.get(unit, self._start_time)) for unit, state in units]),
+            format_metric("qopenvpn_tunnel_state_duration_seconds",
+                          "Seconds since last observed state change of VPN", "gauge",
+                          [(labels[unit], now - self._state_changes.get(unit, self._start_time))
+                           for unit, state in units]),
+            format_metric("qopenvpn_tunnel_reconnects_total", "Automatic reconnects of VPN", "counter",
+                          [(labels[unit], self._reconnects[unit]) for unit, state in units]),
+            format_metric("qopenvpn_tunnel_health_probe_failures_total",
+                          "Health probes which found active VPN not working", "counter",
+                          [(labels[unit], self._probe_failures[unit]) for unit, state in units]),
+        ]
+
+        m = self._management
+        management_labels = labels.get(self._management_unit)
+        if m and management_labels:
+            metrics.append(format_metric("qopenvpn_management_connected",
+                                         "Whether QOpenVPN is connected to OpenVPN management interface",
+                                         "gauge", [(management_labels, m.is_connected())]))
+            if m.is_connected():
+                metrics.extend([
+                    format_metric("qopenvpn_tunnel_received_bytes_total",
+                                  "Bytes received by OpenVPN in current session", "counter",
+                                  [(management_labels, m.bytes_in)]),
+                    format_metric("qopenvpn_tunnel_sent_bytes_total",
+                                  "Bytes sent by OpenVPN in current session", "counter",
+                                  [(management_labels, m.bytes_out)]),
+                ])
+
+        # STUN client is imported only when external IP address has been requested
+        stun = sys.modules.get("qopenvpn.stun")
+        if stun:
+            stats = stun.lookup_stats()
+            metrics.extend([
+                format_metric("qopenvpn_stun_lookups_total", "STUN lookups of external IP address", "counter",
+                              [({}, stats["lookups"])]),
+                format_metric("qopenvpn_stun_lookup_failures_total", "STUN lookups without any response",
+                              "counter", [({}, stats["failures"])]),
+            ])
+            if stats["last_time"] is not None:
+                metrics.extend([
+                    format_metric("qopenvpn_stun_last_lookup_duration_seconds", "Duration of last STUN lookup",
+                                  "gauge", [({}, stats["last_duration"])]),
+                    format_metric("qopenvpn_stun_last_lookup_timestamp_seconds", "Time of last STUN lookup",
+                                  "gauge", [({}, stats["last_time"])]),
+                ])
+            addresses = stun.cached_addresses()
+            if addresses:
+                metrics.append(format_metric(
+                    "qopenvpn_external_ip_info", "External IP address from last STUN lookup", "gauge",
+                    [({"family": FAMILY_NAMES.get(family, str(family)), "ip": ip}, 1)
+                     for family, (ip, port) in sorted(addresses.items())]
+                ))
+
+        return "".join(metrics)
+
+    def _unit_state_changed(self, unit, state):
+        """Remember time of unit state change"""
+        self._state_changes[unit] = time.time()
+
+    def _restart_requested(self, unit):
+        """Count automatic reconnects"""
+        self._reconnects[unit] += 1
+
+    def _probe_failed(self, unit):
+        """Count failed health probes"""
+        self._probe_failures[unit] += 1
+
+    def _new_connection(self):
+        """Accept HTTP connections"""
+        while self._server and self._server.hasPendingConnections():
+            conn = self._server.nextPendingConnection()
+            conn.readyRead.connect(lambda conn=conn: self._read_request(conn))
+            conn.disconnected.connect(conn.deleteLater)
+            # Request could have been received before readyRead signal was connected
+            if conn.bytesAvailable():
+                self._read_request(conn)
+
+    def _read_request(self, conn):
+        """Answer HTTP request when its header is complete"""
+        if conn.property("answered"):
+            conn.readAll()
+            return
+
+        data = bytes(conn.peek(MAX_REQUEST_SIZE))
+        if b"\r\n\r\n" not in data and b"\n\n" not in data:
+            if len(data) >= MAX_REQUEST_SIZE:
+                self._respond(conn, "413 Request Entity Too Large", "Request too large\n")
+            return
+        conn.readAll()
+
+        method, path = (data.split(b"\n", 1)[0].decode("latin-1").split() + ["", ""])[:2]
+        if method not in ("GET", "HEAD"):
+            self._respond(conn, "405 Method Not Allowed", "Method not allowed\n")
+        elif path.split("?")[0] not in ("/", "/metrics"):
+            self._respond(conn, "404 Not Found", "Not found\n")
+        else:
+            self._respond(conn, "200 OK", self.render(), CONTENT_TYPE, head=(method == "HEAD"))
+
+    def _respond(self, conn, status, body, content_type="text/plain; charset=utf-8", head=False):
+        """Send HTTP response and close connection"""
+        body = body.encode("utf-8")
+        header = "HTTP/1.0 {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n".format(
+            status, content_type, len(body))
+        conn.setProperty("answered", True)
+        conn.write(header.encode("latin-1") + (b"" if head else body))
+        conn.disconnectFromHost()
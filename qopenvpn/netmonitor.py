@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+"""Event-driven tracking of network changes.
+Listens to rtnetlink multicast groups (link state, IPv4 / IPv6 address and route changes)
+by QSocketNotifier and to PrepareForSleep signal of systemd-logind on system bus, so that VPN
+can be checked right after Wi-Fi roaming or resume from suspend instead of on next poll.
+Bursts of netlink messages are coalesced into one networkChanged signal.
+"""
+
+import sys, errno, socket, struct
+from PyQt5 import QtCore, QtDBus
+
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+
+NLMSG_HEADER = struct.Struct("=IHHII")
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_DELROUTE = 25
+MESSAGE_KINDS = {RTM_NEWLINK: "link", RTM_DELLINK: "link", RTM_NEWADDR: "address", RTM_DELADDR: "address",
+                 RTM_NEWROUTE: "route", RTM_DELROUTE: "route"}
+
+IFLA_IFNAME = 3
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_LABEL = 3
+RTA_OIF = 4
+RT_TABLE_MAIN = 254
+
+# Link messages are interesting only if they change these flags (wireless drivers send
+# link messages e.g. with every scan result)
+IFF_UP = 0x1
+IFF_RUNNING = 0x40
+IFF_LOWER_UP = 0x10000
+
+LOGIND_SERVICE = "org.freedesktop.login1"
+LOGIND_PATH = "/org/freedesktop/login1"
+LOGIND_MANAGER_INTERFACE = "org.freedesktop.login1.Manager"
+
+
+def parse_attributes(data):
+    """Parse netlink attributes (rtattr) to dict type -> payload"""
+    attributes = {}
+    offset = 0
+    while offset + 4 <= len(data):
+        length, attr_type = struct.unpack_from("=HH", data, offset)
+        if length < 4:
+            break
+        attributes[attr_type] = data[offset + 4:offset + length]
+        offset += (length + 3) & ~3
+    return attributes
+
+
+def attribute_name(attributes, attr_type):
+    """Decode zero terminated string attribute"""
+    return attributes.get(attr_type, b"").split(b"\0", 1)[0].decode("utf8", errors="replace")
+
+
+def parse_message(msg_type, body):
+    """Parse rtnetlink message to event (kind, interface index, interface name, address)
+    or return None if message isn't interesting"""
+    kind = MESSAGE_KINDS.get(msg_type)
+    if kind == "link" and len(body) >= 16:
+        # struct ifinfomsg: family, pad, type, index, flags, change
+        index, flags, change = struct.unpack_from("=iII", body, 4)
+        if msg_type == RTM_NEWLINK and not change & (IFF_UP | IFF_RUNNING | IFF_LOWER_UP):
+            return None
+        return kind, index, attribute_name(parse_attributes(body[16:]), IFLA_IFNAME), ""
+    if kind == "address" and len(body) >= 8:
+        # struct ifaddrmsg: family, prefix length, flags, scope, index
+        family, prefixlen, flags, scope, index = struct.unpack_from("=BBBBI", body)
+        attributes = parse_attributes(body[8:])
+        raw = attributes.get(IFA_LOCAL) or attributes.get(IFA_ADDRESS, b"")
+        try:
+            address = socket.inet_ntop(family, raw) if raw else ""
+        except (OSError, ValueError):
+            address = ""
+        return kind, index, attribute_name(attributes, IFA_LABEL), address
+    if kind == "route" and len(body) >= 12:
+        # struct rtmsg: family, dst len, src len, tos, table, protocol, scope, type, flags
+        # (routes of local and other tables follow address changes or belong to policy routing)
+        if body[4] != RT_TABLE_MAIN:
+            return None
+        attributes = parse_attributes(body[12:])
+        index = struct.unpack("=I", attributes[RTA_OIF][:4])[0] if len(attributes.get(RTA_OIF, b"")) >= 4 else 0
+        return kind, index, "", ""
+    return None
+
+
+def parse_messages(data):
+    """Parse rtnetlink messages to list of (message type, sequence number, port id, event or None)"""
+    messages = []
+    offset = 0
+    while offset + NLMSG_HEADER.size <= len(data):
+        length, msg_type, flags, seq, pid = NLMSG_HEADER.unpack_from(data, offset)
+        if length < NLMSG_HEADER.size:
+            break
+        body = data[offset + NLMSG_HEADER.size:offset + length]
+        messages.append((msg_type, seq, pid, parse_message(msg_type, body)))
+        offset += (length + 3) & ~3
+    return messages
+
+
+def interface_name(index, name=""):
+    """Return name of interface (empty string if it doesn't exist anymore)"""
+    if name or not index:
+        return name
+    try:
+        return socket.if_indextoname(index)
+    except OSError:
+        return ""
+
+
+class NetworkMonitor(QtCore.QObject):
+    """Watch network changes and emit networkChanged with list of events (kind, interface),
+    kind is link, address, route or resume"""
+    networkChanged = QtCore.pyqtSignal(list)
+
+    def __init__(self, delay=1000, parent=None):
+        super().__init__(parent)
+        self._socket = None
+        self._notifier = None
+        self._dump_seq = 0
+        self._addresses = set()
+        self._events = []
+        self._bus = QtDBus.QDBusConnection.systemBus()
+        self._sleep_connected = False
+
+        # Events which come in short time are emitted together
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._emit)
+
+    def is_running(self):
+        """Return True if some source of events is watched"""
+        return self._socket is not None or self._sleep_connected
+
+    def start(self):
+        """Start watching rtnetlink and logind (returns True if at least one of them works)"""
+        if self.is_running():
+            return True
+
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE |
+                       RTMGRP_IPV6_IFADDR | RTMGRP_IPV6_ROUTE))
+            sock.setblocking(False)
+        except (OSError, AttributeError) as e:
+            print("Couldn't watch network changes: {}".format(e), file=sys.stderr)
+        else:
+            self._socket = sock
+            self._notifier = QtCore.QSocketNotifier(sock.fileno(), QtCore.QSocketNotifier.Read, self)
+            self._notifier.activated.connect(self._read)
+            self._request_addresses()
+
+        if self._bus.isConnected():
+            self._sleep_connected = self._bus.connect(LOGIND_SERVICE, LOGIND_PATH, LOGIND_MANAGER_INTERFACE,
+                                                      "PrepareForSleep", self._prepare_for_sleep)
+        return self.is_running()
+
+    def stop(self):
+        """Stop watching network changes"""
+        self._timer.stop()
+        self._events = []
+        if self._notifier:
+            self._notifier.setEnabled(False)
+            self._notifier.deleteLater()
+            self._notifier = None
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+        if self._sleep_connected:
+            self._bus.disconnect(LOGIND_SERVICE, LOGIND_PATH, LOGIND_MANAGER_INTERFACE,
+                                 "PrepareForSleep", self._prepare_for_sleep)
+            self._sleep_connected = False
+
+    def _request_addresses(self):
+        """Ask kernel for current addresses (refresh of address lifetime isn't reported as change)"""
+        self._dump_seq += 1
+        request = NLMSG_HEADER.pack(NLMSG_HEADER.size + 8, RTM_GETADDR, NLM_F_REQUEST | NLM_F_DUMP,
+                                    self._dump_seq, 0) + bytes(8)
+        try:
+            self._socket.send(request)
+        except OSError:
+            pass
+
+    def _read(self):
+        """Read all pending rtnetlink messages"""
+        port_id = self._socket.getsockname()[0]
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    break
+                # Receive buffer overflowed, some changes were lost
+                self._add_event("link", "")
+                continue
+            if not data:
+                break
+
+            for msg_type, seq, pid, event in parse_messages(data):
+                if event is None:
+                    continue
+                kind, index, name, address = event
+                if kind == "address" and address:
+                    key = (index, address)
+                    if pid == port_id and seq == self._dump_seq:
+                        # Response to our request, not a change
+                        self._addresses.add(key)
+                        continue
+                    if msg_type == RTM_NEWADDR:
+                        if key in self._addresses:
+                            continue
+                        self._addresses.add(key)
+                    else:
+                        self._addresses.discard(key)
+                self._add_event(kind, interface_name(index, name))
+
+    @QtCore.pyqtSlot(QtDBus.QDBusMessage)
+    def _prepare_for_sleep(self, message):
+        """Handle PrepareForSleep signal of logind (argument is False after resume)"""
+        arguments = message.arguments()
+        if arguments and not arguments[0]:
+            self._add_event("resume", "")
+
+    def _add_event(self, kind, interface):
+        """Remember event and emit it (with others which come in short time) later"""
+        if (kind, interface) not in self._events:
+            self._events.append((kind, interface))
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _emit(self):
+        """Emit collected events"""
+        events, self._events = self._events, []
+        if events:
+            self.networkChanged.emit(events)
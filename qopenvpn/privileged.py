@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+"""Privileged operations on systemd units without one sudo / kdesu call per command.
+Units are started, stopped and restarted either by polkit-authorized calls of systemd D-Bus API
+(polkit asks for password once and keeps authorization for a while) or by long-lived helper
+which is started by configured sudo command once per session. Both have the same interface
+as Command, so they can be queued and cancelled in the same way as systemctl commands.
+
+Remote server override and kill switch (commands implemented by helper) can't be done
+by systemd D-Bus API, they are always run by helper (long-lived one started by pkexec once per session
+if sudo isn't enabled, or one started by sudo command just for this command).
+"""
+
+import os, sys
+from PyQt5 import QtCore, QtDBus
+
+from qopenvpn import core, helper
+from qopenvpn.systemd import SYSTEMD_SERVICE, SYSTEMD_PATH, SYSTEMD_MANAGER_INTERFACE
+
+DBUS_METHODS = {"start": "StartUnit", "stop": "StopUnit", "restart": "RestartUnit"}
+HELPER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "helper.py")
+PKEXEC = "pkexec"
+
+
+def is_dbus_available():
+    """Return True if systemd can be controlled via system bus"""
+    return QtDBus.QDBusConnection.systemBus().isConnected()
+
+
+def helper_sudo_command(disable_sudo=False, settings=None):
+    """Return command which runs helper as root (helper commands always need root, so pkexec is used
+    if sudo isn't enabled in settings), empty string if QOpenVPN already runs as root"""
+    if disable_sudo or os.geteuid() == 0:
+        return ""
+    return core.sudo_command(False, settings) or PKEXEC
+
+
+def helper_cmdline(args=(), disable_sudo=False, settings=None):
+    """Return command line of privileged helper (long-lived one if args are empty,
+    otherwise it runs just one command)"""
+    cmdline = []
+    sudo = helper_sudo_command(disable_sudo, settings)
+    if sudo:
+        cmdline.append(sudo)
+    cmdline.extend([sys.executable, HELPER_PATH])
+    cmdline.extend(args)
+    return cmdline
+
+
+class UnitJob(QtCore.QObject):
+    """Start, stop or restart unit by systemd D-Bus API and wait until its job finishes
+
+    finished signal is emitted exactly once with 0 if job succeeded, 1 if it failed
+    (or -1 if call was refused, timed out or was cancelled).
+    """
+    finished = QtCore.pyqtSignal(int)
+
+    def __init__(self, command, unit, timeout=0, parent=None):
+        super().__init__(parent)
+        if command not in DBUS_METHODS:
+            raise ValueError("Unsupported command: {}".format(command))
+        self._command = command
+        self._unit = unit
+        self._bus = QtDBus.QDBusConnection.systemBus()
+        self._job_path = ""
+        self._removed_jobs = {}
+        self._subscribed = False
+        self._done = False
+
+        # Timeout timer (polkit authentication dialog may be waiting for password)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.cancel)
+        self._timeout = timeout
+
+    def cmdline(self):
+        """Return equivalent systemctl command line"""
+        return ["systemctl", self._command, self._unit]
+
+    def name(self):
+        """Return name of command (start, stop or restart)"""
+        return self._command
+
+    def start(self):
+        """Call systemd to enqueue job"""
+        if not self._bus.isConnected():
+            print("Couldn't connect to system bus", file=sys.stderr)
+            QtCore.QTimer.singleShot(0, lambda: self._finish(-1))
+            return
+
+        # Job results are announced by JobRemoved signal (systemd emits it only to subscribed clients)
+        self._subscribed = self._bus.connect(SYSTEMD_SERVICE, SYSTEMD_PATH, SYSTEMD_MANAGER_INTERFACE,
+                                             "JobRemoved", self._job_removed)
+        self._bus.asyncCall(QtDBus.QDBusMessage.createMethodCall(SYSTEMD_SERVICE, SYSTEMD_PATH,
+                                                                 SYSTEMD_MANAGER_INTERFACE, "Subscribe"))
+
+        message = QtDBus.QDBusMessage.createMethodCall(SYSTEMD_SERVICE, SYSTEMD_PATH, SYSTEMD_MANAGER_INTERFACE,
+                                                       DBUS_METHODS[self._command])
+        message.setArguments([self._unit, "replace"])
+        message.setInteractiveAuthorizationAllowed(True)
+        watcher = QtDBus.QDBusPendingCallWatcher(self._bus.asyncCall(message, self._timeout or -1), self)
+        watcher.finished.connect(self._call_finished)
+        if self._timeout > 0:
+            self._timer.start(self._timeout)
+
+    def cancel(self):
+        """Stop waiting for job (job itself keeps running in systemd)"""
+        self._finish(-1)
+
+    def is_running(self):
+        """Return True if job hasn't finished yet"""
+        return not self._done
+
+    def _finish(self, exit_code):
+        """Emit finished signal (only once)"""
+        if self._done:
+            return
+
+        self._done = True
+        self._timer.stop()
+        if self._subscribed:
+            self._bus.disconnect(SYSTEMD_SERVICE, SYSTEMD_PATH, SYSTEMD_MANAGER_INTERFACE,
+                                 "JobRemoved", self._job_removed)
+            self._subscribed = False
+        self.finished.emit(exit_code)
+
+    def _call_finished(self, watcher):
+        """Remember path of enqueued job (or finish if call failed)"""
+        reply = QtDBus.QDBusPendingReply(watcher)
+        watcher.deleteLater()
+        if self._done:
+            return
+
+        if reply.isError():
+            print("Couldn't {} {}: {}".format(self._command, self._unit, reply.error().message()), file=sys.stderr)
+            self._finish(-1)
+            return
+
+        path = reply.argumentAt(0)
+        self._job_path = path.path() if isinstance(path, QtDBus.QDBusObjectPath) else str(path)
+        if self._job_path in self._removed_jobs:
+            # Job finished before reply was processed
+            self._finish(self._removed_jobs[self._job_path])
+
+    @QtCore.pyqtSlot(QtDBus.QDBusMessage)
+    def _job_removed(self, message):
+        """Handle JobRemoved signal (id, job path, unit, result)"""
+        arguments = message.arguments()
+        if len(arguments) < 4 or arguments[2] != self._unit:
+            return
+
+        path = arguments[1].path() if isinstance(arguments[1], QtDBus.QDBusObjectPath) else str(arguments[1])
+        exit_code = 0 if arguments[3] == "done" else 1
+        if not self._job_path:
+            self._removed_jobs[path] = exit_code
+        elif path == self._job_path:
+            self._finish(exit_code)
+
+
+class HelperClient(QtCore.QObject):
+    """Client of long-lived privileged helper (helper is started by sudo command on first request
+    and it is started again if it exits)"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._process = None
+        self._ready = False
+        self._buffer = b""
+        self._requests = {}
+        self._next_id = 1
+
+    def command(self, command, unit, timeout=0, parent=None, args=()):
+        """Create request for helper (it is sent when its start() is called)"""
+        return HelperRequest(self, command, unit, timeout, parent, args)
+
+    def is_running(self):
+        """Return True if helper process is running"""
+        return self._process is not None
+
+    def close(self):
+        """Stop helper (it exits when its stdin is closed)"""
+        if self._process:
+            self._process.closeWriteChannel()
+            if not self._process.waitForFinished(3000):
+                self._process.kill()
+
+    def send(self, request):
+        """Send request to helper (helper is started if it isn't running)"""
+        if not self._process:
+            self._start()
+
+        request_id = self._next_id
+        self._next_id += 1
+        self._requests[request_id] = request
+        line = " ".join([str(request_id), request.command, request.unit] + request.args)
+        self._process.write("{}\n".format(line).encode("utf8"))
+        return request_id
+
+    def forget(self, request_id):
+        """Stop waiting for response to request (helper which hasn't started yet is stopped,
+        e.g. if user didn't enter password in time)"""
+        self._requests.pop(request_id, None)
+        if self._process and not self._ready:
+            self._process.kill()
+
+    def _start(self):
+        """Start helper process with elevated privileges"""
+        cmdline = helper_cmdline()
+        self._ready = False
+        self._buffer = b""
+        self._process = QtCore.QProcess(self)
+        self._process.setProcessChannelMode(QtCore.QProcess.ForwardedErrorChannel)
+        self._process.readyReadStandardOutput.connect(self._read)
+        self._process.finished.connect(self._process_finished)
+        self._process.errorOccurred.connect(self._process_error)
+        self._process.start(cmdline[0], cmdline[1:])
+
+    def _read(self):
+        """Read responses of helper"""
+        data = self._buffer + bytes(self._process.readAllStandardOutput())
+        data, sep, self._buffer = data.rpartition(b"\n")
+        if not sep:
+            return
+
+        for line in data.decode("utf8", errors="replace").split("\n"):
+            if line == "READY":
+                self._ready = True
+                continue
+
+            fields = line.split()
+            try:
+                request_id, exit_code = int(fields[0]), int(fields[1])
+            except (IndexError, ValueError):
+                continue
+            request = self._requests.pop(request_id, None)
+            if request:
+                request.response(exit_code)
+
+    def _process_finished(self, exit_code=0, exit_status=None):
+        """Fail all pending requests when helper exits (it is started again by next request)"""
+        process, self._process = self._process, None
+        if process is None:
+            return
+        process.deleteLater()
+
+        requests, self._requests = self._requests, {}
+        for request in requests.values():
+            request.response(-1)
+
+    def _process_error(self, error):
+        """Handle helper which couldn't be started"""
+        if error == QtCore.QProcess.FailedToStart:
+            self._process_finished()
+
+
+class HelperRequest(QtCore.QObject):
+    """Request for privileged helper to start, stop or restart unit
+
+    finished signal is emitted exactly once with exit code of systemctl
+    (or -1 if helper couldn't be started, exited, timed out or request was cancelled).
+    """
+    finished = QtCore.pyqtSignal(int)
+
+    def __init__(self, client, command, unit, timeout=0, parent=None, args=()):
+        super().__init__(parent)
+        self.command = command
+        self.unit = unit
+        self.args = [str(arg) for arg in args]
+        self._client = client
+        self._request_id = None
+        self._done = False
+
+        # Timeout timer (sudo command may be waiting for password)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.cancel)
+        self._timeout = timeout
+
+    def cmdline(self):
+        """Return equivalent systemctl (or one-shot helper) command line"""
+        if self.command in helper.HELPER_COMMANDS:
+            return [sys.executable, HELPER_PATH, self.command, self.unit] + self.args
+        return ["systemctl", self.command, self.unit]
+
+    def name(self):
+        """Return name of command"""
+        return self.command
+
+    def start(self):
+        """Send request to helper"""
+        words = [self.command, self.unit] + self.args
+        if any(len(word.split()) != 1 for word in words):
+            # Request must be one line, every word without whitespace (helper would refuse it anyway)
+            QtCore.QTimer.singleShot(0, lambda: self.response(2))
+            return
+
+        self._request_id = self._client.send(self)
+        if self._timeout > 0:
+            self._timer.start(self._timeout)
+
+    def cancel(self):
+        """Stop waiting for response (command itself can't be interrupted once helper runs it)"""
+        if self._done:
+            return
+        if self._request_id is not None:
+            self._client.forget(self._request_id)
+        self.response(-1)
+
+    def is_running(self):
+        """Return True if response hasn't been received yet"""
+        return not self._done
+
+    def response(self, exit_code):
+        """Emit finished signal with exit code received from helper (only once)"""
+        if self._done:
+            return
+
+        self._done = True
+        self._timer.stop()
+        self.finished.emit(exit_code)
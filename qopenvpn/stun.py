@@ -1,15 +1,21 @@
 #!/usr/bin/env python
 """Simple STUN client for getting external IP address.
 Based on stun.py from https://github.com/myers/html5_udp_to_server,
-but heavily simplified (dropped Twisted dependency, only supports old RFC 3489)
+but heavily simplified (dropped Twisted dependency). Requests are sent in RFC 5389 format
+(with magic cookie) and both XOR-MAPPED-ADDRESS and old RFC 3489 MAPPED-ADDRESS are understood
 """
 
-import os, socket, struct, math
+import os, socket, struct, select, time, threading
+from concurrent import futures
 
 BINDING_REQUEST = 0x0001
 BINDING_RESPONSE = 0x0101
 MAPPED_ADDRESS = 0x0001
+XOR_MAPPED_ADDRESS = 0x0020
+XOR_MAPPED_ADDRESS_OLD = 0x8020  # Used by some servers implementing pre-RFC 5389 drafts
+MAGIC_COOKIE = 0x2112A442
 FAMILY_IPV4 = 0x01
+FAMILY_IPV6 = 0x02
 
 STUN_SERVERS = [
     ("stun.l.google.com", 19302),
@@ -20,6 +26,13 @@ STUN_SERVERS = [
     ("stun.iptel.org", 3478)
 ]
 
+# Cache of last successful lookup (shared by all StunClient instances)
+_cache_lock = threading.Lock()
+_cache = {}
+
+# Statistics of dual-stack lookups (exported as metrics)
+_stats = {"lookups": 0, "failures": 0, "last_duration": None, "last_time": None}
+
 
 class StunClient(object):
     """Simple STUN client for getting external IP address"""
@@ -67,54 +80,215 @@ class StunClient(object):
 
         return (ext_address, ext_port)
 
+    def race_ip(self, stun_servers=None, source_address="", source_port=0, family=socket.AF_INET):
+        """Get external IP address and port by querying more STUN servers at once
+        (first valid response wins, so lookup takes at most one timeout)"""
+        addresses = self._race(stun_servers or STUN_SERVERS, [family], source_address, source_port)
+        if family not in addresses:
+            raise RuntimeError("Couldn't get external IP address from STUN server!")
+        return addresses[family]
+
+    def dual_stack_ip(self, stun_servers=None, source_port=0, grace=0.5):
+        """Get external IPv4 and IPv6 addresses (dict family -> (address, port)) by racing STUN servers
+        over both protocols (after first response, other protocol is waited for only grace seconds)"""
+        start = time.monotonic()
+        addresses = self._race(stun_servers or STUN_SERVERS, [socket.AF_INET, socket.AF_INET6],
+                               "", source_port, grace)
+        with _cache_lock:
+            _stats["lookups"] += 1
+            _stats["failures"] += 0 if addresses else 1
+            _stats["last_duration"] = time.monotonic() - start
+            _stats["last_time"] = time.time()
+        if not addresses:
+            raise RuntimeError("Couldn't get external IP address from STUN server!")
+        return addresses
+
+    def _race(self, stun_servers, families, source_address="", source_port=0, grace=None):
+        """Send Binding Requests to all STUN servers over all address families
+        and return first valid response for each family"""
+        deadline = time.monotonic() + self._timeout
+
+        # One non-blocking socket for each address family (family is skipped if it isn't supported)
+        sockets = {}
+        for family in families:
+            try:
+                sock = socket.socket(family, socket.SOCK_DGRAM)
+            except OSError:
+                continue
+            try:
+                sock.setblocking(False)
+                sock.bind((source_address, source_port))
+            except OSError:
+                sock.close()
+                continue
+            sockets[family] = sock
+
+        # Resolve server names in parallel (slow DNS resolution of one server doesn't delay others)
+        executor = futures.ThreadPoolExecutor(max_workers=max(len(stun_servers) * len(sockets), 1))
+        resolving = {executor.submit(socket.getaddrinfo, host, port, family, socket.SOCK_DGRAM): family
+                     for family in sockets for host, port in stun_servers}
+        executor.shutdown(wait=False)
+
+        # Send Binding Request to every server as soon as its address is known
+        # and wait for first response with matching Transaction ID
+        transaction_ids = {}
+        addresses = {}
+        try:
+            while True:
+                for future in [f for f in resolving if f.done()]:
+                    family = resolving.pop(future)
+                    try:
+                        addr = future.result()[0][4]
+                        transaction_id = self._generate_id()
+                        sockets[family].sendto(self._generate_request(transaction_id), addr)
+                        transaction_ids[transaction_id] = family
+                    except (OSError, IndexError):
+                        continue
+
+                waiting = [s for f, s in sockets.items() if f not in addresses]
+                pending = any(f not in addresses for f in list(resolving.values()) + list(transaction_ids.values()))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not waiting or not pending:
+                    break
+
+                ready, _, _ = select.select(waiting, [], [], min(remaining, 0.05) if resolving else remaining)
+                for sock in ready:
+                    try:
+                        data, addr = sock.recvfrom(2048)
+                    except OSError:
+                        continue
+
+                    transaction_id = data[4:20]
+                    family = transaction_ids.get(transaction_id)
+                    if family is None or family in addresses:
+                        continue
+
+                    try:
+                        ext_address, ext_port = self._parse_response(data, transaction_id)
+                    except (ValueError, struct.error, OSError):
+                        ext_address = ""
+                    if ext_address:
+                        addresses[family] = (ext_address, ext_port)
+                        if grace is not None:
+                            deadline = min(deadline, time.monotonic() + grace)
+                    else:
+                        # Invalid response, wait for other servers
+                        del transaction_ids[transaction_id]
+        finally:
+            for sock in sockets.values():
+                sock.close()
+
+        return addresses
+
     def _generate_id(self):
-        """Generate random Transaction ID"""
-        return os.urandom(16)
+        """Generate random Transaction ID (prefixed by RFC 5389 magic cookie)"""
+        return struct.pack(">I", MAGIC_COOKIE) + os.urandom(12)
 
-    def _generate_request(self):
+    def _generate_request(self, transaction_id=None):
         """Generate Binding Request"""
-        self._transaction_id = self._generate_id()
+        self._transaction_id = transaction_id or self._generate_id()
         request = [struct.pack(">H", BINDING_REQUEST),  # Message Type
                    struct.pack(">H", 0),                # Message Length
-                   self._transaction_id]
+                   self._transaction_id]                # Magic Cookie and Transaction ID
         return b"".join(request)
 
-    def _parse_response(self, data):
-        """Parse server response to get mapped address"""
-        packet_type, length = struct.unpack(">2H", data[:4])
+    def _parse_response(self, data, transaction_id=None):
+        """Parse server response to get mapped address
+        (XOR-MAPPED-ADDRESS is preferred, MAPPED-ADDRESS is used for RFC 3489 servers)"""
+        data = memoryview(data)
+        packet_type, length = struct.unpack_from(">2H", data)
         if packet_type != BINDING_RESPONSE:
             raise ValueError("Invalid response type!")
-        if data[4:20] != self._transaction_id:
+        if data[4:20] != (transaction_id or self._transaction_id):
             raise ValueError("Invalid response transaction ID!")
 
-        # Walk through all response attributes to find MAPPED_ADDRESS
-        for attr_id, value_length, value, start_offset in self._parse_attributes(data[20:length + 20]):
-            if attr_id == MAPPED_ADDRESS:
-                ip_address, port = self._parse_mapped_address(value)
-                break
+        # Walk through all response attributes to find XOR-MAPPED-ADDRESS or MAPPED-ADDRESS
+        mapped_address = None
+        for attr_type, value_length, offset in self._parse_attributes(data, 20, min(length + 20, len(data))):
+            if attr_type in (XOR_MAPPED_ADDRESS, XOR_MAPPED_ADDRESS_OLD):
+                return self._parse_mapped_address(data, offset, value_length, xor=True)
+            if attr_type == MAPPED_ADDRESS and mapped_address is None:
+                mapped_address = self._parse_mapped_address(data, offset, value_length)
+
+        return mapped_address or ("", 0)
+
+    def _parse_attributes(self, data, start, end):
+        """Generator which walks through response attributes (yields type, length and offset of value)"""
+        ptr = start
+        while ptr + 4 <= end:
+            attr_type, length = struct.unpack_from(">2H", data, ptr)
+            if ptr + 4 + length > end:
+                raise ValueError("Truncated response attribute!")
+            yield attr_type, length, ptr + 4
+            # Attributes are padded to multiple of 4 bytes
+            ptr += 4 + (length + 3) // 4 * 4
+
+    def _parse_mapped_address(self, data, offset, length, xor=False):
+        """Get IP address and port from (XOR-)MAPPED-ADDRESS attribute"""
+        family, port = struct.unpack_from(">xBH", data, offset)
+        if family == FAMILY_IPV4:
+            address_family, address_length = socket.AF_INET, 4
+        elif family == FAMILY_IPV6:
+            address_family, address_length = socket.AF_INET6, 16
+        else:
+            raise ValueError("Unknown address family!")
+        if length < 4 + address_length:
+            raise ValueError("Truncated mapped address!")
+
+        address = data[offset + 4:offset + 4 + address_length]
+        if xor:
+            # Port is XORed with most significant 16 bits of magic cookie,
+            # address with magic cookie (and Transaction ID in case of IPv6)
+            port ^= MAGIC_COOKIE >> 16
+            key = data[4:4 + address_length]
+            address = (int.from_bytes(address, "big") ^ int.from_bytes(key, "big")).to_bytes(address_length, "big")
+        return (socket.inet_ntop(address_family, address), port)
+
+
+def get_external_addresses(ttl=300, timeout=5):
+    """Get external IPv4 and IPv6 addresses (dict family -> (address, port)) by racing STUN servers
+    (result is cached for ttl seconds or until invalidate_cache() is called)"""
+    with _cache_lock:
+        if "result" in _cache and time.monotonic() - _cache["time"] < ttl:
+            return dict(_cache["result"])
+        generation = _cache.get("generation", 0)
+
+    result = StunClient(timeout=timeout).dual_stack_ip()
+
+    with _cache_lock:
+        # Don't cache result if cache was invalidated while waiting for response
+        if _cache.get("generation", 0) == generation:
+            _cache.update(time=time.monotonic(), result=result, generation=generation)
+    return dict(result)
+
+
+def get_external_ip(ttl=300, timeout=5):
+    """Get external IP address and port (IPv4 address is preferred, IPv6 is used on IPv6-only networks)"""
+    addresses = get_external_addresses(ttl, timeout)
+    return addresses.get(socket.AF_INET) or addresses[socket.AF_INET6]
+
+
+def cached_addresses():
+    """Return cached external addresses (dict family -> (address, port), empty if there are none)"""
+    with _cache_lock:
+        return dict(_cache.get("result", {}))
+
 
-        return (ip_address, port)
+def lookup_stats():
+    """Return statistics of STUN lookups (number of lookups and failures, duration and time of last one)"""
+    with _cache_lock:
+        return dict(_stats)
 
-    def _parse_attributes(self, data):
-        """Generator which walks through response attributes"""
-        ptr = 0
-        while ptr < len(data):
-            attr_type, length = struct.unpack(">2H", data[ptr:ptr + 4])
-            yield attr_type, length, data[ptr + 4:ptr + 4 + length], ptr + 20
-            attr_length = 4 + 4 * int(math.ceil(length / 4.0))
-            ptr += attr_length
 
-    def _parse_mapped_address(self, value):
-        """Get IP address and port from MAPPED_ADDRESS attribute"""
-        family, recv_port = struct.unpack(">xBH", value[:4])
-        if family != FAMILY_IPV4:
-            raise ValueError("IPv6 is not supported!")
-        ip_address = socket.inet_ntoa(value[4:])
-        return (ip_address, recv_port)
+def invalidate_cache():
+    """Forget cached external IP address (e.g. when VPN state changes)"""
+    with _cache_lock:
+        generation = _cache.get("generation", 0) + 1
+        _cache.clear()
+        _cache["generation"] = generation
 
 
 if __name__ == "__main__":
-    stun = StunClient()
-    ext_address, ext_port = stun.get_ip()
-    print("External IP: {}".format(ext_address))
-    print("External port: {}".format(ext_port))
+    for ext_address, ext_port in get_external_addresses().values():
+        print("External IP: {}".format(ext_address))
+        print("External port: {}".format(ext_port))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""Automatic reconnection of OpenVPN units.
+Units which are deactivated unexpectedly are restarted with exponential backoff (with jitter)
+and health of selected unit is periodically probed (by OpenVPN management interface state
+or by STUN round-trip), so that tunnels which are active but dead are restarted too.
+"""
+
+import time, random, collections
+from PyQt5 import QtCore
+
+from qopenvpn import core, task
+
+
+class ReconnectSupervisor(QtCore.QObject):
+    """Restart OpenVPN units on unexpected deactivation and keep history of reconnect attempts"""
+    restartRequested = QtCore.pyqtSignal(str)
+    message = QtCore.pyqtSignal(str)
+    historyChanged = QtCore.pyqtSignal()
+    healthProbeFailed = QtCore.pyqtSignal(str)
+
+    def __init__(self, base_delay=2, max_delay=300, jitter=0.3, max_attempts=10,
+                 probe_interval=60, probe_failures=2, parent=None):
+        super().__init__(parent)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.probe_failures = probe_failures
+        self._enabled = False
+        self._attempts = {}
+        self._active_since = {}
+        self._timers = {}
+        self._history = collections.deque(maxlen=100)
+
+        # Health probe of selected unit
+        self._probe_unit = ""
+        self._probe_id = 0
+        self._probe_running = False
+        self._failed_probes = 0
+        self._management = None
+        self._probe_timer = QtCore.QTimer(self)
+        self._probe_timer.setInterval(probe_interval * 1000)
+        self._probe_timer.timeout.connect(self.probe)
+
+    def is_enabled(self):
+        """Return True if automatic reconnection is enabled"""
+        return self._enabled
+
+    def set_enabled(self, enabled):
+        """Enable or disable automatic reconnection"""
+        self._enabled = enabled
+        if not enabled:
+            for unit in list(self._timers):
+                self.cancel(unit)
+            self._probe_timer.stop()
+
+    def set_management(self, management_client):
+        """Set client for OpenVPN management interface (used by health probe of selected unit)"""
+        self._management = management_client
+
+    def history(self):
+        """Return list of reconnect attempts (time, unit, attempt, delay, reason)"""
+        return list(self._history)
+
+    def backoff_delay(self, attempt):
+        """Return delay (in seconds) before given reconnect attempt"""
+        delay = min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def unit_dropped(self, unit, reason="disconnected"):
+        """Schedule restart of unexpectedly deactivated unit"""
+        if not self._enabled or unit in self._timers:
+            return
+
+        # Unit which has been working for long enough starts with short backoff delay again
+        active_since = self._active_since.pop(unit, None)
+        if active_since is not None and time.monotonic() - active_since > self.max_delay:
+            self._attempts.pop(unit, None)
+
+        attempt = self._attempts.get(unit, 0) + 1
+        if self.max_attempts and attempt > self.max_attempts:
+            self.message.emit(self.tr("Giving up reconnecting to {} after {} attempts").format(
+                core.vpn_name(unit), self.max_attempts))
+            return
+
+        self._attempts[unit] = attempt
+        delay = self.backoff_delay(attempt)
+        self._history.append((time.time(), unit, attempt, delay, reason))
+        self.historyChanged.emit()
+        self.message.emit(self.tr("Reconnecting to {} in {:.0f} s (attempt {})").format(
+            core.vpn_name(unit), delay, attempt))
+
+        timer = QtCore.QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: self._restart(unit))
+        timer.start(int(delay * 1000))
+        self._timers[unit] = timer
+
+    def unit_active(self, unit):
+        """Remember when unit became active and start health probing if it is selected unit"""
+        self._active_since.setdefault(unit, time.monotonic())
+        if self._enabled and unit == self._probe_unit and not self._probe_timer.isActive():
+            self._failed_probes = 0
+            self._probe_timer.start()
+
+    def unit_inactive(self, unit):
+        """Stop health probing of deactivated unit"""
+        if unit == self._probe_unit:
+            self._probe_timer.stop()
+            self._probe_id += 1
+
+    def set_probe_unit(self, unit):
+        """Set unit whose health is probed"""
+        if unit != self._probe_unit:
+            self.unit_inactive(self._probe_unit)
+            self._probe_unit = unit
+
+    def cancel(self, unit):
+        """Cancel scheduled restart of unit (e.g. when user stopped it) and reset attempts counter"""
+        timer = self._timers.pop(unit, None)
+        if timer:
+            timer.stop()
+            timer.deleteLater()
+        self._attempts.pop(unit, None)
+        self._active_since.pop(unit, None)
+        self.unit_inactive(unit)
+
+    def probe(self):
+        """Check if selected unit is really working"""
+        if self._probe_running:
+            return
+
+        # OpenVPN management interface knows the state of tunnel, use STUN round-trip otherwise
+        if self._management and self._management.is_connected():
+            self.probe_finished(self._probe_id, self._management.state == "CONNECTED")
+        else:
+            # STUN client is imported in main thread (module imported by background thread
+            # could be seen half-initialized by main thread)
+            from qopenvpn import stun
+            self._probe_running = True
+            task.run_task(self._probe_id, self._stun_probe, stun, callback=self._stun_probe_finished)
+
+    def probe_finished(self, probe_id, healthy):
+        """Handle result of health probe"""
+        if probe_id != self._probe_id or not self._probe_timer.isActive():
+            return
+
+        if healthy:
+            # Tunnel works, next drop starts with short backoff delay again
+            self._failed_probes = 0
+            self._attempts.pop(self._probe_unit, None)
+            return
+
+        self._failed_probes += 1
+        if self._failed_probes >= self.probe_failures:
+            unit = self._probe_unit
+            self.unit_inactive(unit)
+            self.healthProbeFailed.emit(unit)
+            self.unit_dropped(unit, reason="health probe failed")
+
+    @staticmethod
+    def _stun_probe(stun):
+        """Run STUN round-trip (blocking, runs in background thread)"""
+        stun.StunClient(timeout=5).dual_stack_ip()
+        return True
+
+    def _stun_probe_finished(self, probe_id, result):
+        """Handle result of STUN probe"""
+        self._probe_running = False
+        self.probe_finished(probe_id, bool(result))
+
+    def _restart(self, unit):
+        """Request restart of unit"""
+        timer = self._timers.pop(unit, None)
+        if timer:
+            timer.deleteLater()
+        if self._enabled:
+            self.restartRequested.emit(unit)
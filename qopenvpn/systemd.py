@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""Tracking of systemd units state.
+Subscribes to PropertiesChanged signals of systemd1 unit objects on system bus
+(no processes are spawned while idle) and falls back to periodic polling
+of `systemctl is-active` when system bus isn't reachable.
+"""
+
+from PyQt5 import QtCore, QtDBus
+
+from qopenvpn.command import Command
+
+SYSTEMD_SERVICE = "org.freedesktop.systemd1"
+SYSTEMD_PATH = "/org/freedesktop/systemd1"
+SYSTEMD_MANAGER_INTERFACE = "org.freedesktop.systemd1.Manager"
+SYSTEMD_UNIT_INTERFACE = "org.freedesktop.systemd1.Unit"
+PROPERTIES_INTERFACE = "org.freedesktop.DBus.Properties"
+
+
+def unwrap_variant(value):
+    """Get Python value from QDBusVariant (if it is wrapped in it)"""
+    if isinstance(value, QtDBus.QDBusVariant):
+        return value.variant()
+    return value
+
+
+class UnitMonitor(QtCore.QObject):
+    """Watch ActiveState of systemd units"""
+    stateChanged = QtCore.pyqtSignal(str, str)
+
+    def __init__(self, poll_interval=5000, parent=None):
+        super().__init__(parent)
+        self._units = {}
+        self._states = {}
+        self._poll_command = None
+        self._poll_pending = False
+
+        # All D-Bus calls are asynchronous, unit path is None while LoadUnit call is pending
+        # and empty string if unit can't be tracked via D-Bus (then it is polled)
+        self._bus = QtDBus.QDBusConnection.systemBus()
+        self._event_driven = self._bus.isConnected()
+        if self._event_driven:
+            # systemd emits most bus signals only if there is at least one subscriber
+            self._call(QtDBus.QDBusMessage.createMethodCall(SYSTEMD_SERVICE, SYSTEMD_PATH,
+                                                            SYSTEMD_MANAGER_INTERFACE, "Subscribe"),
+                       self._subscribe_finished)
+
+        # Fallback polling timer (runs only if some units couldn't be tracked via D-Bus)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(poll_interval)
+        self._timer.timeout.connect(self.poll)
+
+    def is_event_driven(self):
+        """Return True if unit states are tracked via D-Bus signals"""
+        return self._event_driven
+
+    def set_poll_interval(self, poll_interval):
+        """Change interval of fallback polling (0 disables it, units are then refreshed only on request)"""
+        self._timer.setInterval(poll_interval)
+        self._update_timer()
+
+    def units(self):
+        """Return list of watched units"""
+        return list(self._units)
+
+    def state(self, unit):
+        """Return last known ActiveState of unit"""
+        return self._states.get(unit, "unknown")
+
+    def watch(self, unit):
+        """Start watching unit state"""
+        if unit in self._units:
+            return
+
+        if self._event_driven:
+            # State is queried after LoadUnit call returns path of unit object
+            self._units[unit] = None
+            message = QtDBus.QDBusMessage.createMethodCall(SYSTEMD_SERVICE, SYSTEMD_PATH,
+                                                           SYSTEMD_MANAGER_INTERFACE, "LoadUnit")
+            message.setArguments([unit])
+            self._call(message, lambda reply: self._load_finished(unit, reply))
+        else:
+            self._units[unit] = ""
+            self.refresh(unit)
+            self._update_timer()
+
+    def unwatch(self, unit):
+        """Stop watching unit state"""
+        if unit not in self._units:
+            return
+
+        path = self._units.pop(unit)
+        self._states.pop(unit, None)
+        if path:
+            self._bus.disconnect(SYSTEMD_SERVICE, path, PROPERTIES_INTERFACE, "PropertiesChanged",
+                                 self._properties_changed)
+        self._update_timer()
+
+    def refresh(self, unit=None):
+        """Query current state of unit (or all watched units) immediately
+        (state is updated asynchronously, after D-Bus call or systemctl finishes)"""
+        units = [unit] if unit else list(self._units)
+        polled = []
+        for u in units:
+            if u not in self._units:
+                continue
+
+            path = self._units[u]
+            if path:
+                self._query_active_state(u, path)
+            elif path is not None:
+                polled.append(u)
+
+        if polled:
+            self._poll_units(polled)
+
+    def poll(self):
+        """Poll states of units which can't be tracked via D-Bus"""
+        polled = [u for u, path in self._units.items() if path == ""]
+        if polled:
+            self._poll_units(polled)
+
+    def _update_timer(self):
+        """Start or stop fallback polling timer"""
+        if any(path == "" for path in self._units.values()) and self._timer.interval() > 0:
+            if not self._timer.isActive():
+                self._timer.start()
+        else:
+            self._timer.stop()
+
+    def _set_state(self, unit, state):
+        """Store unit state and emit stateChanged signal if it differs from last known state"""
+        if state and self._states.get(unit) != state:
+            self._states[unit] = state
+            self.stateChanged.emit(unit, state)
+
+    def _call(self, message, callback):
+        """Call D-Bus method asynchronously, callback gets QDBusPendingReply"""
+        watcher = QtDBus.QDBusPendingCallWatcher(self._bus.asyncCall(message), self)
+        watcher.finished.connect(lambda w: self._call_finished(w, callback))
+
+    def _call_finished(self, watcher, callback):
+        """Pass reply of finished D-Bus call to callback"""
+        reply = QtDBus.QDBusPendingReply(watcher)
+        watcher.deleteLater()
+        callback(reply)
+
+    def _subscribe_finished(self, reply):
+        """Fall back to polling if systemd isn't reachable via D-Bus"""
+        if reply.isError():
+            self._event_driven = False
+
+    def _load_finished(self, unit, reply):
+        """Start tracking unit object (or polling unit if systemd couldn't load it)"""
+        if self._units.get(unit, "") is not None:
+            # Unit was unwatched meanwhile
+            return
+
+        path = "" if reply.isError() else reply.argumentAt(0)
+        path = path.path() if isinstance(path, QtDBus.QDBusObjectPath) else str(path or "")
+        self._units[unit] = path
+        if path:
+            self._bus.connect(SYSTEMD_SERVICE, path, PROPERTIES_INTERFACE, "PropertiesChanged",
+                              self._properties_changed)
+        self.refresh(unit)
+        self._update_timer()
+
+    def _query_active_state(self, unit, path):
+        """Get ActiveState property of unit object"""
+        message = QtDBus.QDBusMessage.createMethodCall(SYSTEMD_SERVICE, path, PROPERTIES_INTERFACE, "Get")
+        message.setArguments([SYSTEMD_UNIT_INTERFACE, "ActiveState"])
+        self._call(message, lambda reply: self._active_state_finished(unit, path, reply))
+
+    def _active_state_finished(self, unit, path, reply):
+        """Update unit state from reply to Get call"""
+        if reply.isError() or self._units.get(unit) != path:
+            return
+        self._set_state(unit, str(unwrap_variant(reply.argumentAt(0))))
+
+    def _poll_units(self, units):
+        """Get states of units by one asynchronous `systemctl is-active` call"""
+        if self._poll_command:
+            # Poll again after currently running systemctl finishes (its result may be outdated)
+            self._poll_pending = True
+            return
+
+        self._poll_command = Command(["systemctl", "is-active"] + units, timeout=self._timer.interval() or 5000,
+                                     capture=True, quiet=True, parent=self)
+        self._poll_command.finished.connect(lambda retcode: self._poll_finished(units))
+        self._poll_command.start()
+
+    def _poll_finished(self, units):
+        """Parse output of `systemctl is-active` and update units states"""
+        states = self._poll_command.output().decode("utf8").split()
+        self._poll_command.deleteLater()
+        self._poll_command = None
+        if len(states) == len(units):
+            for unit, state in zip(units, states):
+                if unit in self._units:
+                    self._set_state(unit, state)
+
+        if self._poll_pending:
+            self._poll_pending = False
+            self.poll()
+
+    @QtCore.pyqtSlot(QtDBus.QDBusMessage)
+    def _properties_changed(self, message):
+        """Handle PropertiesChanged signal of systemd unit object"""
+        arguments = message.arguments()
+        if len(arguments) < 3 or arguments[0] != SYSTEMD_UNIT_INTERFACE:
+            return
+
+        unit = None
+        for u, path in self._units.items():
+            if path == message.path():
+                unit = u
+                break
+        if unit is None:
+            return
+
+        changed, invalidated = arguments[1], arguments[2]
+        if "ActiveState" in changed:
+            self._set_state(unit, str(unwrap_variant(changed["ActiveState"])))
+        elif "ActiveState" in invalidated:
+            self._query_active_state(unit, message.path())
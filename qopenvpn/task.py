@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""Running of blocking functions in background threads (results are posted back to Qt event loop)"""
+
+from PyQt5 import QtCore
+
+
+class TaskSignals(QtCore.QObject):
+    """Signals of background task (QRunnable can't emit signals by itself)"""
+    finished = QtCore.pyqtSignal(int, object)
+
+
+class Task(QtCore.QRunnable):
+    """Run function in QThreadPool and emit its result by finished signal
+    (result is None if function raised exception)"""
+    def __init__(self, task_id, function, *args):
+        super().__init__()
+        self.task_id = task_id
+        self.function = function
+        self.args = args
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.function(*self.args)
+        except Exception:
+            result = None
+        self.signals.finished.emit(self.task_id, result)
+
+
+def run_task(task_id, function, *args, callback=None):
+    """Start function in global QThreadPool and call callback(task_id, result) when it finishes"""
+    task = Task(task_id, function, *args)
+    if callback:
+        task.signals.finished.connect(callback)
+    QtCore.QThreadPool.globalInstance().start(task)
+    return task
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'qopenvpn/qopenvpnhistory.ui'
+#
+# Created by: PyQt5 UI code generator 5.8
+#
+# WARNING! All changes made in this file will be lost!
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+class Ui_QOpenVPNHistory(object):
+    def setupUi(self, QOpenVPNHistory):
+        QOpenVPNHistory.setObjectName("QOpenVPNHistory")
+        QOpenVPNHistory.resize(640, 480)
+        self.gridLayout = QtWidgets.QGridLayout(QOpenVPNHistory)
+        self.gridLayout.setObjectName("gridLayout")
+        self.label = QtWidgets.QLabel(QOpenVPNHistory)
+        self.label.setObjectName("label")
+        self.gridLayout.addWidget(self.label, 0, 0, 1, 1)
+        self.periodComboBox = QtWidgets.QComboBox(QOpenVPNHistory)
+        self.periodComboBox.setObjectName("periodComboBox")
+        self.gridLayout.addWidget(self.periodComboBox, 0, 1, 1, 1)
+        spacerItem = QtWidgets.QSpacerItem(300, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.gridLayout.addItem(spacerItem, 0, 2, 1, 1)
+        self.summaryTable = QtWidgets.QTableWidget(QOpenVPNHistory)
+        self.summaryTable.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.summaryTable.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.summaryTable.setObjectName("summaryTable")
+        self.summaryTable.setColumnCount(5)
+        self.summaryTable.setRowCount(0)
+        item = QtWidgets.QTableWidgetItem()
+        self.summaryTable.setHorizontalHeaderItem(0, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.summaryTable.setHorizontalHeaderItem(1, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.summaryTable.setHorizontalHeaderItem(2, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.summaryTable.setHorizontalHeaderItem(3, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.summaryTable.setHorizontalHeaderItem(4, item)
+        self.summaryTable.horizontalHeader().setStretchLastSection(True)
+        self.summaryTable.verticalHeader().setVisible(False)
+        self.gridLayout.addWidget(self.summaryTable, 1, 0, 1, 3)
+        self.label_2 = QtWidgets.QLabel(QOpenVPNHistory)
+        self.label_2.setObjectName("label_2")
+        self.gridLayout.addWidget(self.label_2, 2, 0, 1, 3)
+        self.eventsEdit = QtWidgets.QPlainTextEdit(QOpenVPNHistory)
+        self.eventsEdit.setReadOnly(True)
+        self.eventsEdit.setObjectName("eventsEdit")
+        self.gridLayout.addWidget(self.eventsEdit, 3, 0, 1, 3)
+        self.buttonBox = QtWidgets.QDialogButtonBox(QOpenVPNHistory)
+        self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
+        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Close)
+        self.buttonBox.setObjectName("buttonBox")
+        self.gridLayout.addWidget(self.buttonBox, 4, 0, 1, 3)
+
+        self.retranslateUi(QOpenVPNHistory)
+        self.buttonBox.rejected.connect(QOpenVPNHistory.reject)
+        QtCore.QMetaObject.connectSlotsByName(QOpenVPNHistory)
+
+    def retranslateUi(self, QOpenVPNHistory):
+        _translate = QtCore.QCoreApplication.translate
+        QOpenVPNHistory.setWindowTitle(_translate("QOpenVPNHistory", "QOpenVPN Connection History"))
+        self.label.setText(_translate("QOpenVPNHistory", "Period:"))
+        item = self.summaryTable.horizontalHeaderItem(0)
+        item.setText(_translate("QOpenVPNHistory", "VPN"))
+        item = self.summaryTable.horizontalHeaderItem(1)
+        item.setText(_translate("QOpenVPNHistory", "Uptime"))
+        item = self.summaryTable.horizontalHeaderItem(2)
+        item.setText(_translate("QOpenVPNHistory", "Drops"))
+        item = self.summaryTable.horizontalHeaderItem(3)
+        item.setText(_translate("QOpenVPNHistory", "Drops per day"))
+        item = self.summaryTable.horizontalHeaderItem(4)
+        item.setText(_translate("QOpenVPNHistory", "Mean time to recovery"))
+        self.label_2.setText(_translate("QOpenVPNHistory", "Events:"))
+
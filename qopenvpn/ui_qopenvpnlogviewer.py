@@ -14,10 +14,38 @@ class Ui_QOpenVPNLogViewer(object):
         QOpenVPNLogViewer.resize(1000, 560)
         self.gridLayout = QtWidgets.QGridLayout(QOpenVPNLogViewer)
         self.gridLayout.setObjectName("gridLayout")
+        self.filterLayout = QtWidgets.QHBoxLayout()
+        self.filterLayout.setObjectName("filterLayout")
+        self.sessionComboBox = QtWidgets.QComboBox(QOpenVPNLogViewer)
+        self.sessionComboBox.setObjectName("sessionComboBox")
+        self.filterLayout.addWidget(self.sessionComboBox)
+        self.searchEdit = QtWidgets.QLineEdit(QOpenVPNLogViewer)
+        self.searchEdit.setClearButtonEnabled(True)
+        self.searchEdit.setObjectName("searchEdit")
+        self.filterLayout.addWidget(self.searchEdit)
+        self.priorityComboBox = QtWidgets.QComboBox(QOpenVPNLogViewer)
+        self.priorityComboBox.setObjectName("priorityComboBox")
+        self.filterLayout.addWidget(self.priorityComboBox)
+        self.timeComboBox = QtWidgets.QComboBox(QOpenVPNLogViewer)
+        self.timeComboBox.setObjectName("timeComboBox")
+        self.filterLayout.addWidget(self.timeComboBox)
+        self.sinceEdit = QtWidgets.QDateTimeEdit(QOpenVPNLogViewer)
+        self.sinceEdit.setCalendarPopup(True)
+        self.sinceEdit.setObjectName("sinceEdit")
+        self.filterLayout.addWidget(self.sinceEdit)
+        self.untilEdit = QtWidgets.QDateTimeEdit(QOpenVPNLogViewer)
+        self.untilEdit.setCalendarPopup(True)
+        self.untilEdit.setObjectName("untilEdit")
+        self.filterLayout.addWidget(self.untilEdit)
+        self.matchesLabel = QtWidgets.QLabel(QOpenVPNLogViewer)
+        self.matchesLabel.setObjectName("matchesLabel")
+        self.filterLayout.addWidget(self.matchesLabel)
+        self.gridLayout.addLayout(self.filterLayout, 0, 0, 1, 3)
         self.logViewerEdit = QtWidgets.QPlainTextEdit(QOpenVPNLogViewer)
         self.logViewerEdit.setTextInteractionFlags(QtCore.Qt.TextSelectableByKeyboard|QtCore.Qt.TextSelectableByMouse)
+        self.logViewerEdit.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
         self.logViewerEdit.setObjectName("logViewerEdit")
-        self.gridLayout.addWidget(self.logViewerEdit, 0, 0, 1, 3)
+        self.gridLayout.addWidget(self.logViewerEdit, 1, 0, 1, 3)
         self.horizontalLayout = QtWidgets.QHBoxLayout()
         self.horizontalLayout.setObjectName("horizontalLayout")
         self.label = QtWidgets.QLabel(QOpenVPNLogViewer)
@@ -27,17 +55,17 @@ class Ui_QOpenVPNLogViewer(object):
         self.ipAddressEdit.setReadOnly(True)
         self.ipAddressEdit.setObjectName("ipAddressEdit")
         self.horizontalLayout.addWidget(self.ipAddressEdit)
-        self.gridLayout.addLayout(self.horizontalLayout, 1, 0, 1, 2)
+        self.gridLayout.addLayout(self.horizontalLayout, 2, 0, 1, 2)
         self.refreshButton = QtWidgets.QPushButton(QOpenVPNLogViewer)
         self.refreshButton.setObjectName("refreshButton")
-        self.gridLayout.addWidget(self.refreshButton, 2, 0, 1, 1)
+        self.gridLayout.addWidget(self.refreshButton, 3, 0, 1, 1)
         spacerItem = QtWidgets.QSpacerItem(453, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
-        self.gridLayout.addItem(spacerItem, 2, 1, 1, 1)
+        self.gridLayout.addItem(spacerItem, 3, 1, 1, 1)
         self.buttonBox = QtWidgets.QDialogButtonBox(QOpenVPNLogViewer)
         self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
         self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Close)
         self.buttonBox.setObjectName("buttonBox")
-        self.gridLayout.addWidget(self.buttonBox, 2, 2, 1, 1)
+        self.gridLayout.addWidget(self.buttonBox, 3, 2, 1, 1)
 
         self.retranslateUi(QOpenVPNLogViewer)
         self.buttonBox.accepted.connect(QOpenVPNLogViewer.accept)
@@ -47,6 +75,12 @@ class Ui_QOpenVPNLogViewer(object):
     def retranslateUi(self, QOpenVPNLogViewer):
         _translate = QtCore.QCoreApplication.translate
         QOpenVPNLogViewer.setWindowTitle(_translate("QOpenVPNLogViewer", "QOpenVPN Log Viewer"))
+        self.sessionComboBox.setToolTip(_translate("QOpenVPNLogViewer", "Show journal of current boot or archived session of VPN"))
+        self.searchEdit.setPlaceholderText(_translate("QOpenVPNLogViewer", "Search ..."))
+        self.sinceEdit.setToolTip(_translate("QOpenVPNLogViewer", "Start of shown time range"))
+        self.sinceEdit.setDisplayFormat(_translate("QOpenVPNLogViewer", "yyyy-MM-dd HH:mm:ss"))
+        self.untilEdit.setToolTip(_translate("QOpenVPNLogViewer", "End of shown time range"))
+        self.untilEdit.setDisplayFormat(_translate("QOpenVPNLogViewer", "yyyy-MM-dd HH:mm:ss"))
         self.label.setText(_translate("QOpenVPNLogViewer", "IP address:"))
         self.refreshButton.setText(_translate("QOpenVPNLogViewer", "Refresh"))
 
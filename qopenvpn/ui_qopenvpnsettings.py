@@ -11,7 +11,7 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 class Ui_QOpenVPNSettings(object):
     def setupUi(self, QOpenVPNSettings):
         QOpenVPNSettings.setObjectName("QOpenVPNSettings")
-        QOpenVPNSettings.resize(300, 200)
+        QOpenVPNSettings.resize(400, 650)
         self.gridLayout = QtWidgets.QGridLayout(QOpenVPNSettings)
         self.gridLayout.setObjectName("gridLayout")
         self.label = QtWidgets.QLabel(QOpenVPNSettings)
@@ -20,43 +20,152 @@ class Ui_QOpenVPNSettings(object):
         self.vpnNameComboBox = QtWidgets.QComboBox(QOpenVPNSettings)
         self.vpnNameComboBox.setObjectName("vpnNameComboBox")
         self.gridLayout.addWidget(self.vpnNameComboBox, 0, 1, 1, 2)
+        self.label_5 = QtWidgets.QLabel(QOpenVPNSettings)
+        self.label_5.setObjectName("label_5")
+        self.gridLayout.addWidget(self.label_5, 1, 0, 1, 3)
+        self.vpnListWidget = QtWidgets.QListWidget(QOpenVPNSettings)
+        self.vpnListWidget.setObjectName("vpnListWidget")
+        self.gridLayout.addWidget(self.vpnListWidget, 2, 0, 1, 3)
         self.warningCheckBox = QtWidgets.QCheckBox(QOpenVPNSettings)
         self.warningCheckBox.setObjectName("warningCheckBox")
-        self.gridLayout.addWidget(self.warningCheckBox, 1, 0, 1, 3)
+        self.gridLayout.addWidget(self.warningCheckBox, 3, 0, 1, 3)
+        self.autoReconnectCheckBox = QtWidgets.QCheckBox(QOpenVPNSettings)
+        self.autoReconnectCheckBox.setObjectName("autoReconnectCheckBox")
+        self.gridLayout.addWidget(self.autoReconnectCheckBox, 4, 0, 1, 3)
+        self.remoteProbingCheckBox = QtWidgets.QCheckBox(QOpenVPNSettings)
+        self.remoteProbingCheckBox.setObjectName("remoteProbingCheckBox")
+        self.gridLayout.addWidget(self.remoteProbingCheckBox, 5, 0, 1, 3)
+        self.killSwitchCheckBox = QtWidgets.QCheckBox(QOpenVPNSettings)
+        self.killSwitchCheckBox.setObjectName("killSwitchCheckBox")
+        self.gridLayout.addWidget(self.killSwitchCheckBox, 6, 0, 1, 3)
+        self.dnsCheckBox = QtWidgets.QCheckBox(QOpenVPNSettings)
+        self.dnsCheckBox.setObjectName("dnsCheckBox")
+        self.gridLayout.addWidget(self.dnsCheckBox, 7, 0, 1, 3)
+        self.logArchiveCheckBox = QtWidgets.QCheckBox(QOpenVPNSettings)
+        self.logArchiveCheckBox.setObjectName("logArchiveCheckBox")
+        self.gridLayout.addWidget(self.logArchiveCheckBox, 8, 0, 1, 3)
+        self.networkMonitorCheckBox = QtWidgets.QCheckBox(QOpenVPNSettings)
+        self.networkMonitorCheckBox.setObjectName("networkMonitorCheckBox")
+        self.gridLayout.addWidget(self.networkMonitorCheckBox, 9, 0, 1, 3)
+        self.networkReconnectCheckBox = QtWidgets.QCheckBox(QOpenVPNSettings)
+        self.networkReconnectCheckBox.setObjectName("networkReconnectCheckBox")
+        self.gridLayout.addWidget(self.networkReconnectCheckBox, 10, 0, 1, 3)
         self.line_2 = QtWidgets.QFrame(QOpenVPNSettings)
         self.line_2.setFrameShape(QtWidgets.QFrame.HLine)
         self.line_2.setFrameShadow(QtWidgets.QFrame.Sunken)
         self.line_2.setObjectName("line_2")
-        self.gridLayout.addWidget(self.line_2, 2, 0, 1, 3)
+        self.gridLayout.addWidget(self.line_2, 11, 0, 1, 3)
         self.sudoCheckBox = QtWidgets.QCheckBox(QOpenVPNSettings)
         self.sudoCheckBox.setObjectName("sudoCheckBox")
-        self.gridLayout.addWidget(self.sudoCheckBox, 3, 0, 1, 2)
+        self.gridLayout.addWidget(self.sudoCheckBox, 12, 0, 1, 2)
         self.label_2 = QtWidgets.QLabel(QOpenVPNSettings)
         self.label_2.setObjectName("label_2")
-        self.gridLayout.addWidget(self.label_2, 4, 0, 1, 2)
+        self.gridLayout.addWidget(self.label_2, 13, 0, 1, 2)
         self.sudoCommandEdit = QtWidgets.QLineEdit(QOpenVPNSettings)
         self.sudoCommandEdit.setObjectName("sudoCommandEdit")
-        self.gridLayout.addWidget(self.sudoCommandEdit, 4, 2, 1, 1)
+        self.gridLayout.addWidget(self.sudoCommandEdit, 13, 2, 1, 1)
+        self.label_8 = QtWidgets.QLabel(QOpenVPNSettings)
+        self.label_8.setObjectName("label_8")
+        self.gridLayout.addWidget(self.label_8, 14, 0, 1, 2)
+        self.privilegedComboBox = QtWidgets.QComboBox(QOpenVPNSettings)
+        self.privilegedComboBox.setObjectName("privilegedComboBox")
+        self.gridLayout.addWidget(self.privilegedComboBox, 14, 2, 1, 1)
+        self.line_3 = QtWidgets.QFrame(QOpenVPNSettings)
+        self.line_3.setFrameShape(QtWidgets.QFrame.HLine)
+        self.line_3.setFrameShadow(QtWidgets.QFrame.Sunken)
+        self.line_3.setObjectName("line_3")
+        self.gridLayout.addWidget(self.line_3, 15, 0, 1, 3)
+        self.label_3 = QtWidgets.QLabel(QOpenVPNSettings)
+        self.label_3.setObjectName("label_3")
+        self.gridLayout.addWidget(self.label_3, 16, 0, 1, 2)
+        self.managementAddressEdit = QtWidgets.QLineEdit(QOpenVPNSettings)
+        self.managementAddressEdit.setObjectName("managementAddressEdit")
+        self.gridLayout.addWidget(self.managementAddressEdit, 16, 2, 1, 1)
+        self.label_4 = QtWidgets.QLabel(QOpenVPNSettings)
+        self.label_4.setObjectName("label_4")
+        self.gridLayout.addWidget(self.label_4, 17, 0, 1, 2)
+        self.managementPasswordEdit = QtWidgets.QLineEdit(QOpenVPNSettings)
+        self.managementPasswordEdit.setEchoMode(QtWidgets.QLineEdit.Password)
+        self.managementPasswordEdit.setObjectName("managementPasswordEdit")
+        self.gridLayout.addWidget(self.managementPasswordEdit, 17, 2, 1, 1)
+        self.line_4 = QtWidgets.QFrame(QOpenVPNSettings)
+        self.line_4.setFrameShape(QtWidgets.QFrame.HLine)
+        self.line_4.setFrameShadow(QtWidgets.QFrame.Sunken)
+        self.line_4.setObjectName("line_4")
+        self.gridLayout.addWidget(self.line_4, 18, 0, 1, 3)
+        self.metricsCheckBox = QtWidgets.QCheckBox(QOpenVPNSettings)
+        self.metricsCheckBox.setObjectName("metricsCheckBox")
+        self.gridLayout.addWidget(self.metricsCheckBox, 19, 0, 1, 3)
+        self.label_6 = QtWidgets.QLabel(QOpenVPNSettings)
+        self.label_6.setObjectName("label_6")
+        self.gridLayout.addWidget(self.label_6, 20, 0, 1, 2)
+        self.metricsAddressEdit = QtWidgets.QLineEdit(QOpenVPNSettings)
+        self.metricsAddressEdit.setObjectName("metricsAddressEdit")
+        self.gridLayout.addWidget(self.metricsAddressEdit, 20, 2, 1, 1)
+        self.label_7 = QtWidgets.QLabel(QOpenVPNSettings)
+        self.label_7.setObjectName("label_7")
+        self.gridLayout.addWidget(self.label_7, 21, 0, 1, 2)
+        self.metricsTextfileEdit = QtWidgets.QLineEdit(QOpenVPNSettings)
+        self.metricsTextfileEdit.setObjectName("metricsTextfileEdit")
+        self.gridLayout.addWidget(self.metricsTextfileEdit, 21, 2, 1, 1)
         self.buttonBox = QtWidgets.QDialogButtonBox(QOpenVPNSettings)
         self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
         self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Cancel|QtWidgets.QDialogButtonBox.Ok)
         self.buttonBox.setObjectName("buttonBox")
-        self.gridLayout.addWidget(self.buttonBox, 5, 0, 1, 3)
+        self.gridLayout.addWidget(self.buttonBox, 22, 0, 1, 3)
 
         self.retranslateUi(QOpenVPNSettings)
         self.buttonBox.accepted.connect(QOpenVPNSettings.accept)
         self.buttonBox.rejected.connect(QOpenVPNSettings.reject)
         QtCore.QMetaObject.connectSlotsByName(QOpenVPNSettings)
-        QOpenVPNSettings.setTabOrder(self.vpnNameComboBox, self.warningCheckBox)
-        QOpenVPNSettings.setTabOrder(self.warningCheckBox, self.sudoCheckBox)
+        QOpenVPNSettings.setTabOrder(self.vpnNameComboBox, self.vpnListWidget)
+        QOpenVPNSettings.setTabOrder(self.vpnListWidget, self.warningCheckBox)
+        QOpenVPNSettings.setTabOrder(self.warningCheckBox, self.autoReconnectCheckBox)
+        QOpenVPNSettings.setTabOrder(self.autoReconnectCheckBox, self.remoteProbingCheckBox)
+        QOpenVPNSettings.setTabOrder(self.remoteProbingCheckBox, self.killSwitchCheckBox)
+        QOpenVPNSettings.setTabOrder(self.killSwitchCheckBox, self.dnsCheckBox)
+        QOpenVPNSettings.setTabOrder(self.dnsCheckBox, self.logArchiveCheckBox)
+        QOpenVPNSettings.setTabOrder(self.logArchiveCheckBox, self.networkMonitorCheckBox)
+        QOpenVPNSettings.setTabOrder(self.networkMonitorCheckBox, self.networkReconnectCheckBox)
+        QOpenVPNSettings.setTabOrder(self.networkReconnectCheckBox, self.sudoCheckBox)
         QOpenVPNSettings.setTabOrder(self.sudoCheckBox, self.sudoCommandEdit)
-        QOpenVPNSettings.setTabOrder(self.sudoCommandEdit, self.buttonBox)
+        QOpenVPNSettings.setTabOrder(self.sudoCommandEdit, self.privilegedComboBox)
+        QOpenVPNSettings.setTabOrder(self.privilegedComboBox, self.managementAddressEdit)
+        QOpenVPNSettings.setTabOrder(self.managementAddressEdit, self.managementPasswordEdit)
+        QOpenVPNSettings.setTabOrder(self.managementPasswordEdit, self.metricsCheckBox)
+        QOpenVPNSettings.setTabOrder(self.metricsCheckBox, self.metricsAddressEdit)
+        QOpenVPNSettings.setTabOrder(self.metricsAddressEdit, self.metricsTextfileEdit)
+        QOpenVPNSettings.setTabOrder(self.metricsTextfileEdit, self.buttonBox)
 
     def retranslateUi(self, QOpenVPNSettings):
         _translate = QtCore.QCoreApplication.translate
         QOpenVPNSettings.setWindowTitle(_translate("QOpenVPNSettings", "QOpenVPN Settings"))
         self.label.setText(_translate("QOpenVPNSettings", "VPN name:"))
+        self.label_5.setText(_translate("QOpenVPNSettings", "Other monitored VPNs:"))
         self.warningCheckBox.setText(_translate("QOpenVPNSettings", "Show warning when disconnected"))
+        self.autoReconnectCheckBox.setText(_translate("QOpenVPNSettings", "Reconnect automatically when disconnected"))
+        self.remoteProbingCheckBox.setToolTip(_translate("QOpenVPNSettings", "Probe latency of all remote servers of VPN and let OpenVPN try the fastest one first"))
+        self.remoteProbingCheckBox.setText(_translate("QOpenVPNSettings", "Connect to the fastest remote server"))
+        self.killSwitchCheckBox.setToolTip(_translate("QOpenVPNSettings", "Block all traffic outside of VPN until it is stopped (requires nftables)"))
+        self.killSwitchCheckBox.setText(_translate("QOpenVPNSettings", "Block traffic when disconnected (kill switch)"))
+        self.dnsCheckBox.setToolTip(_translate("QOpenVPNSettings", "Verify that DNS queries go through VPN (DNS leak check) and show result in tray icon tooltip"))
+        self.dnsCheckBox.setText(_translate("QOpenVPNSettings", "Check DNS leaks after connecting"))
+        self.logArchiveCheckBox.setToolTip(_translate("QOpenVPNSettings", "Keep compressed logs of every VPN session on disk (they are available in log viewer after reboot)"))
+        self.logArchiveCheckBox.setText(_translate("QOpenVPNSettings", "Archive logs of VPN sessions"))
+        self.networkMonitorCheckBox.setToolTip(_translate("QOpenVPNSettings", "Check state of VPN, external IP address and DNS right after network changes or resume from suspend (periodic polling is then less frequent)"))
+        self.networkMonitorCheckBox.setText(_translate("QOpenVPNSettings", "Check VPN when network changes"))
+        self.networkReconnectCheckBox.setToolTip(_translate("QOpenVPNSettings", "Restart connected VPN after Wi-Fi roaming, change of network address or resume from suspend"))
+        self.networkReconnectCheckBox.setText(_translate("QOpenVPNSettings", "Reconnect VPN when network changes"))
         self.sudoCheckBox.setText(_translate("QOpenVPNSettings", "Use sudo"))
         self.label_2.setText(_translate("QOpenVPNSettings", "Sudo command:"))
+        self.label_8.setText(_translate("QOpenVPNSettings", "Privileged operations:"))
+        self.privilegedComboBox.setToolTip(_translate("QOpenVPNSettings", "How VPN is started and stopped (D-Bus and helper ask for password only once)"))
+        self.label_3.setText(_translate("QOpenVPNSettings", "Management interface:"))
+        self.managementAddressEdit.setToolTip(_translate("QOpenVPNSettings", "Path to unix socket or host:port of OpenVPN management interface (%i is replaced by VPN name)"))
+        self.label_4.setText(_translate("QOpenVPNSettings", "Management password:"))
+        self.metricsCheckBox.setText(_translate("QOpenVPNSettings", "Export metrics in Prometheus format"))
+        self.label_6.setText(_translate("QOpenVPNSettings", "Metrics address:"))
+        self.metricsAddressEdit.setToolTip(_translate("QOpenVPNSettings", "host:port of HTTP endpoint serving /metrics (leave empty to disable it)"))
+        self.label_7.setText(_translate("QOpenVPNSettings", "Metrics textfile:"))
+        self.metricsTextfileEdit.setToolTip(_translate("QOpenVPNSettings", "Path to .prom file for textfile collector of node_exporter (leave empty to disable it)"))
 
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'qopenvpn/qopenvpnstats.ui'
+#
+# Created by: PyQt5 UI code generator 5.8
+#
+# WARNING! All changes made in this file will be lost!
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+class Ui_QOpenVPNStats(object):
+    def setupUi(self, QOpenVPNStats):
+        QOpenVPNStats.setObjectName("QOpenVPNStats")
+        QOpenVPNStats.resize(420, 380)
+        self.formLayout = QtWidgets.QFormLayout(QOpenVPNStats)
+        self.formLayout.setObjectName("formLayout")
+        self.label = QtWidgets.QLabel(QOpenVPNStats)
+        self.label.setObjectName("label")
+        self.formLayout.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.label)
+        self.stateLabel = QtWidgets.QLabel(QOpenVPNStats)
+        self.stateLabel.setObjectName("stateLabel")
+        self.formLayout.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.stateLabel)
+        self.label_2 = QtWidgets.QLabel(QOpenVPNStats)
+        self.label_2.setObjectName("label_2")
+        self.formLayout.setWidget(1, QtWidgets.QFormLayout.LabelRole, self.label_2)
+        self.localIpLabel = QtWidgets.QLabel(QOpenVPNStats)
+        self.localIpLabel.setObjectName("localIpLabel")
+        self.formLayout.setWidget(1, QtWidgets.QFormLayout.FieldRole, self.localIpLabel)
+        self.label_3 = QtWidgets.QLabel(QOpenVPNStats)
+        self.label_3.setObjectName("label_3")
+        self.formLayout.setWidget(2, QtWidgets.QFormLayout.LabelRole, self.label_3)
+        self.remoteIpLabel = QtWidgets.QLabel(QOpenVPNStats)
+        self.remoteIpLabel.setObjectName("remoteIpLabel")
+        self.formLayout.setWidget(2, QtWidgets.QFormLayout.FieldRole, self.remoteIpLabel)
+        self.label_4 = QtWidgets.QLabel(QOpenVPNStats)
+        self.label_4.setObjectName("label_4")
+        self.formLayout.setWidget(3, QtWidgets.QFormLayout.LabelRole, self.label_4)
+        self.bytesInLabel = QtWidgets.QLabel(QOpenVPNStats)
+        self.bytesInLabel.setObjectName("bytesInLabel")
+        self.formLayout.setWidget(3, QtWidgets.QFormLayout.FieldRole, self.bytesInLabel)
+        self.label_5 = QtWidgets.QLabel(QOpenVPNStats)
+        self.label_5.setObjectName("label_5")
+        self.formLayout.setWidget(4, QtWidgets.QFormLayout.LabelRole, self.label_5)
+        self.bytesOutLabel = QtWidgets.QLabel(QOpenVPNStats)
+        self.bytesOutLabel.setObjectName("bytesOutLabel")
+        self.formLayout.setWidget(4, QtWidgets.QFormLayout.FieldRole, self.bytesOutLabel)
+        self.label_6 = QtWidgets.QLabel(QOpenVPNStats)
+        self.label_6.setObjectName("label_6")
+        self.formLayout.setWidget(5, QtWidgets.QFormLayout.LabelRole, self.label_6)
+        self.rateInLabel = QtWidgets.QLabel(QOpenVPNStats)
+        self.rateInLabel.setObjectName("rateInLabel")
+        self.formLayout.setWidget(5, QtWidgets.QFormLayout.FieldRole, self.rateInLabel)
+        self.label_7 = QtWidgets.QLabel(QOpenVPNStats)
+        self.label_7.setObjectName("label_7")
+        self.formLayout.setWidget(6, QtWidgets.QFormLayout.LabelRole, self.label_7)
+        self.rateOutLabel = QtWidgets.QLabel(QOpenVPNStats)
+        self.rateOutLabel.setObjectName("rateOutLabel")
+        self.formLayout.setWidget(6, QtWidgets.QFormLayout.FieldRole, self.rateOutLabel)
+        self.label_8 = QtWidgets.QLabel(QOpenVPNStats)
+        self.label_8.setObjectName("label_8")
+        self.formLayout.setWidget(7, QtWidgets.QFormLayout.SpanningRole, self.label_8)
+        self.historyEdit = QtWidgets.QPlainTextEdit(QOpenVPNStats)
+        self.historyEdit.setReadOnly(True)
+        self.historyEdit.setObjectName("historyEdit")
+        self.formLayout.setWidget(8, QtWidgets.QFormLayout.SpanningRole, self.historyEdit)
+        self.buttonBox = QtWidgets.QDialogButtonBox(QOpenVPNStats)
+        self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
+        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Close)
+        self.buttonBox.setObjectName("buttonBox")
+        self.formLayout.setWidget(9, QtWidgets.QFormLayout.SpanningRole, self.buttonBox)
+
+        self.retranslateUi(QOpenVPNStats)
+        self.buttonBox.rejected.connect(QOpenVPNStats.reject)
+        QtCore.QMetaObject.connectSlotsByName(QOpenVPNStats)
+
+    def retranslateUi(self, QOpenVPNStats):
+        _translate = QtCore.QCoreApplication.translate
+        QOpenVPNStats.setWindowTitle(_translate("QOpenVPNStats", "QOpenVPN Statistics"))
+        self.label.setText(_translate("QOpenVPNStats", "State:"))
+        self.label_2.setText(_translate("QOpenVPNStats", "Local IP address:"))
+        self.label_3.setText(_translate("QOpenVPNStats", "Remote IP address:"))
+        self.label_4.setText(_translate("QOpenVPNStats", "Received:"))
+        self.label_5.setText(_translate("QOpenVPNStats", "Sent:"))
+        self.label_6.setText(_translate("QOpenVPNStats", "Download speed:"))
+        self.label_7.setText(_translate("QOpenVPNStats", "Upload speed:"))
+        self.label_8.setText(_translate("QOpenVPNStats", "Reconnect history:"))
+
@@ -40,6 +40,9 @@ setup(
         "gui_scripts": [
             "qopenvpn=qopenvpn.__main__:main",
         ],
+        "console_scripts": [
+            "qopenvpnctl=qopenvpn.cli:main",
+        ],
     },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
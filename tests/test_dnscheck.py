@@ -0,0 +1,163 @@
+import os, ipaddress, tempfile, unittest
+
+from qopenvpn import dnscheck
+
+PROC_ROUTE = """Iface\tDestination\tGateway\tFlags\tRefCnt\tUse\tMetric\tMask\tMTU\tWindow\tIRTT
+wlan0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0
+wlan0\t0001A8C0\t00000000\t0001\t0\t0\t600\t00FFFFFF\t0\t0\t0
+tun0\t0000080A\t00000000\t0001\t0\t0\t0\t00FFFFFF\t0\t0\t0
+tun0\t00000000\t0100080A\t0003\t0\t0\t0\t00000080\t0\t0\t0
+tun0\t00000080\t0100080A\t0003\t0\t0\t0\t00000080\t0\t0\t0
+eth0\t0000000A\t00000000\t0000\t0\t0\t0\t000000FF\t0\t0\t0
+"""
+
+PROC_IPV6_ROUTE = """\
+20010db8000000000000000000000000 20 00000000000000000000000000000000 00 00000000000000000000000000000000 00000100 00000001 00000000 00000001     tun0
+00000000000000000000000000000000 00 00000000000000000000000000000000 00 fe800000000000000000000000000001 00000400 00000001 00000000 00000003    wlan0
+fd000000000000000000000000000000 08 00000000000000000000000000000000 00 00000000000000000000000000000000 00000100 00000001 00000000 00000000     eth0
+"""
+
+RESOLVECTL_DNS = """Global: 9.9.9.9
+Link 2 (wlan0): 192.168.1.1 fe80::1%wlan0
+Link 5 (tun0): 10.8.0.1 [2001:db8::53]:53 10.8.0.2#dns.example.com
+Link 6 (eth0):
+"""
+
+RESOLVECTL_DOMAIN = """Global:
+Link 2 (wlan0): home.arpa
+Link 5 (tun0): ~corp.example.com corp.example.com
+Link 6 (eth0):
+"""
+
+
+def server(address, interface, rtt=0.01, vpn=False, domains=()):
+    """Return server of check result"""
+    return {"address": address, "link": interface, "domains": list(domains), "interface": interface,
+            "rtt": rtt, "vpn": vpn}
+
+
+class ParseTest(unittest.TestCase):
+    def test_parse_server(self):
+        self.assertEqual(dnscheck.parse_server("10.8.0.1"), "10.8.0.1")
+        self.assertEqual(dnscheck.parse_server("10.8.0.1:53"), "10.8.0.1")
+        self.assertEqual(dnscheck.parse_server("10.8.0.2#dns.example.com"), "10.8.0.2")
+        self.assertEqual(dnscheck.parse_server("fe80::1%wlan0"), "fe80::1")
+        self.assertEqual(dnscheck.parse_server("[2001:db8::53]:53"), "2001:db8::53")
+        self.assertEqual(dnscheck.parse_server("2001:DB8::53"), "2001:db8::53")
+        self.assertEqual(dnscheck.parse_server("dns.example.com"), "")
+
+    def test_parse_resolvectl(self):
+        self.assertEqual(dnscheck.parse_resolvectl(RESOLVECTL_DNS), {
+            "": ["9.9.9.9"],
+            "wlan0": ["192.168.1.1", "fe80::1%wlan0"],
+            "tun0": ["10.8.0.1", "[2001:db8::53]:53", "10.8.0.2#dns.example.com"],
+            "eth0": [],
+        })
+        self.assertEqual(dnscheck.parse_resolvectl(RESOLVECTL_DOMAIN)["tun0"], ["~corp.example.com", "corp.example.com"])
+
+    def test_resolv_conf(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "resolv.conf")
+            with open(path, "w") as f:
+                f.write("# Generated\nsearch example.com\nnameserver 10.8.0.1\nnameserver ::1\nnameserver\n")
+            self.assertEqual(dnscheck.resolv_conf_servers(path), [("10.8.0.1", "", []), ("::1", "", [])])
+            self.assertEqual(dnscheck.resolv_conf_servers(os.path.join(directory, "missing")), [])
+
+
+class RoutesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        route_path = os.path.join(self.directory.name, "route")
+        ipv6_route_path = os.path.join(self.directory.name, "ipv6_route")
+        with open(route_path, "w") as f:
+            f.write(PROC_ROUTE)
+        with open(ipv6_route_path, "w") as f:
+            f.write(PROC_IPV6_ROUTE)
+        self.routes = dnscheck.parse_routes(route_path, ipv6_route_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_parse_routes(self):
+        network = ipaddress.ip_network
+        self.assertEqual(self.routes, [
+            (network("0.0.0.0/0"), 600, "wlan0"),
+            (network("192.168.1.0/24"), 600, "wlan0"),
+            (network("10.8.0.0/24"), 0, "tun0"),
+            (network("0.0.0.0/1"), 0, "tun0"),
+            (network("128.0.0.0/1"), 0, "tun0"),
+            (network("2001:db8::/32"), 256, "tun0"),
+            (network("::/0"), 1024, "wlan0"),
+        ])
+
+    def test_missing_files(self):
+        self.assertEqual(dnscheck.parse_routes(os.path.join(self.directory.name, "missing"),
+                                               os.path.join(self.directory.name, "missing")), [])
+
+    def test_route_interface(self):
+        # OpenVPN def1 routes (0.0.0.0/1 and 128.0.0.0/1) win over default route by longer prefix
+        self.assertEqual(dnscheck.route_interface("9.9.9.9", self.routes), "tun0")
+        self.assertEqual(dnscheck.route_interface("200.1.2.3", self.routes), "tun0")
+        self.assertEqual(dnscheck.route_interface("192.168.1.1", self.routes), "wlan0")
+        self.assertEqual(dnscheck.route_interface("10.8.0.1", self.routes), "tun0")
+        self.assertEqual(dnscheck.route_interface("2001:db8::53", self.routes), "tun0")
+        self.assertEqual(dnscheck.route_interface("2a00::1", self.routes), "wlan0")
+        self.assertEqual(dnscheck.route_interface("127.0.0.53", self.routes), "lo")
+        self.assertEqual(dnscheck.route_interface("::1", self.routes), "lo")
+        self.assertEqual(dnscheck.route_interface("10.0.0.1", []), "")
+
+    def test_lowest_metric(self):
+        network = ipaddress.ip_network("0.0.0.0/0")
+        routes = [(network, 600, "wlan0"), (network, 100, "eth0")]
+        self.assertEqual(dnscheck.route_interface("9.9.9.9", routes), "eth0")
+
+
+class VerdictTest(unittest.TestCase):
+    def test_ok(self):
+        servers = [server("10.8.0.1", "tun0", vpn=True), server("192.168.1.1", "wlan0", rtt=None)]
+        self.assertEqual(dnscheck.verdict(servers), dnscheck.STATUS_OK)
+        self.assertEqual(dnscheck.summary({"status": dnscheck.STATUS_OK, "servers": servers}), "through VPN (10.8.0.1)")
+
+    def test_leak(self):
+        servers = [server("10.8.0.1", "tun0", vpn=True), server("192.168.1.1", "wlan0")]
+        self.assertEqual(dnscheck.verdict(servers), dnscheck.STATUS_LEAK)
+        self.assertEqual(dnscheck.summary({"status": dnscheck.STATUS_LEAK, "servers": servers}),
+                         "LEAK via wlan0 (192.168.1.1)")
+
+    def test_leak_without_vpn_server(self):
+        self.assertEqual(dnscheck.verdict([server("192.168.1.1", "wlan0")]), dnscheck.STATUS_LEAK)
+
+    def test_split(self):
+        servers = [server("10.8.0.1", "tun0", vpn=True, domains=["~corp.example.com"]),
+                   server("192.168.1.1", "wlan0")]
+        self.assertEqual(dnscheck.verdict(servers), dnscheck.STATUS_SPLIT)
+        self.assertEqual(dnscheck.summary({"status": dnscheck.STATUS_SPLIT, "servers": servers}),
+                         "split DNS, other names via wlan0 (192.168.1.1)")
+
+    def test_default_route_domain_is_leak(self):
+        # VPN link which should get all queries (~.) must not be bypassed
+        servers = [server("10.8.0.1", "tun0", vpn=True, domains=["~."]), server("192.168.1.1", "wlan0")]
+        self.assertEqual(dnscheck.verdict(servers), dnscheck.STATUS_LEAK)
+
+    def test_unknown(self):
+        self.assertEqual(dnscheck.verdict([]), dnscheck.STATUS_UNKNOWN)
+        self.assertEqual(dnscheck.verdict([server("10.8.0.1", "tun0", rtt=None, vpn=True)]), dnscheck.STATUS_UNKNOWN)
+        # Local resolver forwards queries somewhere else
+        self.assertEqual(dnscheck.verdict([server("127.0.0.53", "lo")]), dnscheck.STATUS_UNKNOWN)
+
+
+class QueryTest(unittest.TestCase):
+    def test_build_query(self):
+        query = dnscheck.build_query(0x1234, "example.com")
+        self.assertEqual(query, b"\x12\x34\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00"
+                                b"\x07example\x03com\x00\x00\x01\x00\x01")
+
+    def test_is_response(self):
+        self.assertTrue(dnscheck.is_response(b"\x12\x34\x81\x83" + bytes(8), 0x1234))
+        self.assertFalse(dnscheck.is_response(b"\x12\x34\x01\x00" + bytes(8), 0x1234))
+        self.assertFalse(dnscheck.is_response(b"\x12\x35\x81\x80" + bytes(8), 0x1234))
+        self.assertFalse(dnscheck.is_response(b"\x12\x34\x81\x80", 0x1234))
+
+
+if __name__ == "__main__":
+    unittest.main()
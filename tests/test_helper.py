@@ -0,0 +1,117 @@
+import ipaddress, unittest
+
+from qopenvpn import helper, killswitch
+
+UNIT = "openvpn-client@corp"
+
+
+class RequestValidationTest(unittest.TestCase):
+    def test_systemctl_commands(self):
+        for command in ("start", "stop", "restart"):
+            self.assertTrue(helper.is_valid([command, UNIT]))
+            self.assertFalse(helper.is_valid([command, UNIT, "--force"]))
+        self.assertFalse(helper.is_valid(["enable", UNIT]))
+        self.assertFalse(helper.is_valid(["start"]))
+
+    def test_units(self):
+        self.assertTrue(helper.is_valid(["start", "openvpn-server@site-a.b"]))
+        self.assertTrue(helper.is_valid(["start", "openvpn@corp"]))
+        for unit in ("sshd.service", "openvpn-client@", "openvpn-client@corp;reboot", "openvpn-client@../x",
+                     "openvpn-client@corpé"):
+            self.assertFalse(helper.is_valid(["start", unit]), unit)
+
+    def test_set_remote(self):
+        self.assertTrue(helper.is_valid(["set-remote", UNIT, "vpn.example.com", "1194", "udp"]))
+        self.assertTrue(helper.is_valid(["set-remote", UNIT, "2001:db8::1", "443", "tcp-client"]))
+        self.assertFalse(helper.is_valid(["set-remote", UNIT, "vpn.example.com", "1194"]))
+        self.assertFalse(helper.is_valid(["set-remote", UNIT, "vpn.example.com", "0", "udp"]))
+        self.assertFalse(helper.is_valid(["set-remote", UNIT, "vpn.example.com", "65536", "udp"]))
+        self.assertFalse(helper.is_valid(["set-remote", UNIT, "vpn.example.com", "1194", "sctp"]))
+        self.assertFalse(helper.is_valid(["set-remote", UNIT, "--up=/bin/sh", "1194", "udp"]))
+        self.assertFalse(helper.is_valid(["set-remote", UNIT, "a%b", "1194", "udp"]))
+        # Host must not be taken for an option of openvpn
+        for host in ("--writepid", "-x", "-"):
+            self.assertFalse(helper.is_valid(["set-remote", UNIT, host, "1194", "udp"]), host)
+        self.assertTrue(helper.is_valid(["set-remote", UNIT, "vpn-1.example.com", "1194", "udp"]))
+
+    def test_reset_remote_and_killswitch_off(self):
+        for command in ("reset-remote", "killswitch-off"):
+            self.assertTrue(helper.is_valid([command, UNIT]))
+            self.assertFalse(helper.is_valid([command, UNIT, "x"]))
+
+    def test_killswitch_on(self):
+        self.assertTrue(helper.is_valid(["killswitch-on", UNIT, "tun*", "192.0.2.1,1194,udp"]))
+        self.assertTrue(helper.is_valid(["killswitch-on", UNIT, "tun0", "192.0.2.1,1194,udp",
+                                         "2001:db8::1,443,tcp-client"]))
+        # At least one endpoint is required
+        self.assertFalse(helper.is_valid(["killswitch-on", UNIT, "tun*"]))
+        for interface in ('tun"; flush ruleset', "*", "verylonginterface0", "tun**"):
+            self.assertFalse(helper.is_valid(["killswitch-on", UNIT, interface, "192.0.2.1,1194,udp"]), interface)
+        for endpoint in ("vpn.example.com,1194,udp", "192.0.2.1,1194", "192.0.2.1,99999,udp", "192.0.2.1,1194,icmp"):
+            self.assertFalse(helper.is_valid(["killswitch-on", UNIT, "tun*", endpoint]), endpoint)
+
+    def test_parse_request(self):
+        self.assertEqual(helper.parse_request("7 set-remote {} 192.0.2.1 1194 udp\n".format(UNIT)),
+                         (7, "set-remote", UNIT, ["192.0.2.1", "1194", "udp"]))
+        self.assertEqual(helper.parse_request("8 poweroff {}\n".format(UNIT)), (8, None, None, None))
+        for line in ("", "\n", "start {}".format(UNIT), "x start {}".format(UNIT)):
+            with self.assertRaises(ValueError):
+                helper.parse_request(line)
+
+    def test_parse_endpoints(self):
+        self.assertEqual(helper.parse_endpoints(["192.0.2.1,1194,udp6", "2001:db8::1,443,tcp-client"]),
+                         [(ipaddress.ip_address("192.0.2.1"), 1194, "udp"),
+                          (ipaddress.ip_address("2001:db8::1"), 443, "tcp")])
+        with self.assertRaises(ValueError):
+            helper.parse_endpoints(["192.0.2.256,1194,udp"])
+
+
+class KillSwitchRulesetTest(unittest.TestCase):
+    def test_remove_only(self):
+        self.assertEqual(helper.killswitch_ruleset(UNIT),
+                         "add table inet qopenvpn_killswitch\ndelete table inet qopenvpn_killswitch\n")
+
+    def test_ruleset(self):
+        endpoints = helper.parse_endpoints(["192.0.2.1,1194,udp", "2001:db8::1,443,tcp-client"])
+        lines = helper.killswitch_ruleset(UNIT, "tun*", endpoints).splitlines()
+
+        # Table is replaced in one transaction whether it exists or not
+        self.assertEqual(lines[:2], ["add table inet qopenvpn_killswitch", "delete table inet qopenvpn_killswitch"])
+        rules = [line.strip() for line in lines]
+        self.assertIn("table inet qopenvpn_killswitch {", rules)
+        self.assertIn("type filter hook output priority 0; policy drop;", rules)
+        self.assertIn('oifname "lo" accept', rules)
+        self.assertIn('oifname "tun*" accept', rules)
+        self.assertIn("ip daddr 192.0.2.1 udp dport 1194 accept", rules)
+        self.assertIn("ip6 daddr 2001:db8::1 tcp dport 443 accept", rules)
+        self.assertEqual(rules[-2:], ["}", "}"])
+        self.assertEqual(sum(line.count("{") - line.count("}") for line in lines), 0)
+
+    def test_interface_pattern(self):
+        self.assertEqual(killswitch.interface_pattern(""), "tun*")
+        self.assertEqual(killswitch.interface_pattern("tun"), "tun*")
+        self.assertEqual(killswitch.interface_pattern("tap"), "tap*")
+        self.assertEqual(killswitch.interface_pattern("tun5"), "tun5")
+
+    def test_dns_endpoints(self):
+        network = ipaddress.ip_network
+        routes = [(network("0.0.0.0/0"), 600, "wlan0"), (network("10.8.0.0/24"), 0, "tun0"),
+                  (network("::/0"), 1024, "wlan0")]
+        servers = [("127.0.0.53", "", []), ("192.168.1.1", "wlan0", []), ("fe80::1", "wlan0", []),
+                   ("10.8.0.1", "tun0", ["~."]), ("192.168.1.1", "", [])]
+        # Resolvers outside of VPN stay reachable (OpenVPN resolves remotes while tunnel is down)
+        self.assertEqual(killswitch.dns_endpoints("tun*", servers, routes),
+                         ["192.168.1.1,53,udp", "192.168.1.1,53,tcp", "fe80::1,53,udp", "fe80::1,53,tcp"])
+        self.assertEqual(killswitch.dns_endpoints("tun*", servers, []), [])
+
+        lines = helper.killswitch_ruleset(UNIT, "tun*", helper.parse_endpoints(
+            killswitch.dns_endpoints("tun*", servers, routes))).splitlines()
+        rules = [line.strip() for line in lines]
+        self.assertIn("ip daddr 192.168.1.1 udp dport 53 accept", rules)
+        self.assertIn("ip daddr 192.168.1.1 tcp dport 53 accept", rules)
+        self.assertIn("ip6 daddr fe80::1 udp dport 53 accept", rules)
+        self.assertNotIn("ip daddr 10.8.0.1 udp dport 53 accept", rules)
+
+
+if __name__ == "__main__":
+    unittest.main()
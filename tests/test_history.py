@@ -0,0 +1,118 @@
+import unittest
+
+from qopenvpn import history
+
+UNIT = "openvpn-client@corp"
+DAY = 86400
+T = 1700000000
+
+
+class RecordTest(unittest.TestCase):
+    def setUp(self):
+        self.store = history.HistoryStore(":memory:")
+
+    def tearDown(self):
+        self.store.close()
+
+    def record(self, event, timestamp, unit=UNIT):
+        return self.store.record(unit, event, timestamp=timestamp)
+
+    def test_deduplication(self):
+        # Unit which has never been up can't go down or drop
+        self.assertIsNone(self.record("down", 1))
+        self.assertIsNone(self.record("drop", 2))
+        self.assertIsNotNone(self.record("up", 3))
+        self.assertIsNone(self.record("up", 4))
+        self.assertIsNotNone(self.record("drop", 5))
+        self.assertIsNone(self.record("drop", 6))
+        # Stop after drop ends the outage
+        self.assertIsNotNone(self.record("down", 7))
+        self.assertIsNone(self.record("down", 8))
+        self.assertIsNone(self.record("drop", 9))
+        # Reconnect attempts aren't state events, they are always recorded
+        self.assertIsNotNone(self.record("reconnect", 10))
+        self.assertIsNotNone(self.record("reconnect", 11))
+        self.assertEqual([e["event"] for e in self.store.events(UNIT)],
+                         ["up", "drop", "down", "reconnect", "reconnect"])
+        self.assertEqual(self.store.last_state(UNIT), "down")
+
+        with self.assertRaises(ValueError):
+            self.record("restart", 12)
+
+    def test_last_state_per_unit(self):
+        self.record("up", 1)
+        self.record("up", 2, unit="openvpn-client@other")
+        self.record("drop", 3, unit="openvpn-client@other")
+        self.assertEqual(self.store.last_state(UNIT), "up")
+        self.assertEqual(self.store.last_state("openvpn-client@other"), "drop")
+        self.assertEqual(self.store.last_state("openvpn-client@unknown"), "")
+        self.assertEqual(self.store.units(), ["openvpn-client@corp", "openvpn-client@other"])
+
+    def test_events(self):
+        event_id = self.store.record(UNIT, "up", bytes_in=0, bytes_out=0, timestamp=1)
+        self.store.set_external_ip(event_id, "198.51.100.7")
+        self.record("down", 2)
+        self.record("up", 3)
+        self.assertEqual([(e["time"], e["event"]) for e in self.store.events(UNIT, limit=2)], [(2, "down"), (3, "up")])
+        self.assertEqual([e["time"] for e in self.store.events(since=2)], [2, 3])
+        self.assertEqual(self.store.events()[0]["external_ip"], "198.51.100.7")
+
+
+class SummaryTest(unittest.TestCase):
+    def setUp(self):
+        self.store = history.HistoryStore(":memory:")
+
+    def tearDown(self):
+        self.store.close()
+
+    def record(self, *events):
+        for offset, event in events:
+            self.store.record(UNIT, event, timestamp=T + offset)
+
+    def summary(self, since, until):
+        return self.store.summary(UNIT, T + since, T + until)
+
+    def test_uptime_mttr_and_drops(self):
+        self.record((0, "up"), (100, "drop"), (130, "up"), (400, "drop"), (450, "up"), (700, "down"), (800, "up"))
+        summary = self.summary(0, 1000)
+        # Up 0-100, 130-400, 450-700 and 800-1000
+        self.assertAlmostEqual(summary["uptime"], 820 / 1000)
+        self.assertEqual(summary["drops"], 2)
+        self.assertAlmostEqual(summary["drops_per_day"], 2 / 1000 * DAY)
+        self.assertAlmostEqual(summary["mttr"], (30 + 50) / 2)
+        self.assertEqual(summary["unit"], UNIT)
+
+    def test_state_before_range(self):
+        self.record((0, "up"), (500, "drop"), (600, "up"))
+        # Unit was up when range started
+        summary = self.summary(200, 1200)
+        self.assertAlmostEqual(summary["uptime"], (300 + 600) / 1000)
+        self.assertEqual(summary["drops"], 1)
+        self.assertEqual(summary["mttr"], 100)
+
+        # Drop before range isn't counted, its recovery can't be measured
+        summary = self.summary(550, 650)
+        self.assertAlmostEqual(summary["uptime"], 0.5)
+        self.assertEqual(summary["drops"], 0)
+        self.assertIsNone(summary["mttr"])
+
+        # Events after range are ignored
+        summary = self.summary(100, 400)
+        self.assertEqual((summary["uptime"], summary["drops"]), (1.0, 0))
+
+    def test_down_after_drop_is_not_recovery(self):
+        self.record((0, "up"), (100, "drop"), (200, "down"), (900, "up"))
+        summary = self.summary(0, 1000)
+        self.assertEqual(summary["drops"], 1)
+        self.assertIsNone(summary["mttr"])
+        self.assertAlmostEqual(summary["uptime"], 0.2)
+
+    def test_no_history(self):
+        summary = self.summary(0, DAY)
+        self.assertEqual((summary["uptime"], summary["drops"], summary["drops_per_day"], summary["mttr"]),
+                         (0.0, 0, 0.0, None))
+        self.assertEqual(self.summary(100, 100)["uptime"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
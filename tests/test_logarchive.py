@@ -0,0 +1,201 @@
+import os, gzip, tempfile, unittest
+
+from qopenvpn import logarchive
+
+UNIT = "openvpn-client@corp"
+
+
+def entries(first, count, start_time=1000.0):
+    """Return entries numbered from first, one per second"""
+    return [(start_time + i, 6, "line {}".format(i)) for i in range(first, first + count)]
+
+
+def gzip_members(path):
+    """Return number of gzip members of file"""
+    with open(path, "rb") as f:
+        data = f.read()
+    members = 0
+    while data:
+        decompressor = gzip.zlib.decompressobj(16 + gzip.zlib.MAX_WBITS)
+        decompressor.decompress(data)
+        data = decompressor.unused_data
+        members += 1
+    return members
+
+
+class SessionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.session = logarchive.Session.create(self.directory.name, UNIT, "abcdef0123456789", 1000.0,
+                                                 chunk_lines=4)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def chunk_path(self, number):
+        return os.path.join(self.session.directory, "{:06d}.log.gz".format(number))
+
+    def test_create(self):
+        self.assertTrue(self.session.id.endswith("-openvpn-client@corp-abcdef01"))
+        index = logarchive.Session.load(self.session.directory).index
+        self.assertEqual((index["unit"], index["key"], index["lines"], index["chunks"]),
+                         (UNIT, "abcdef0123456789", 0, []))
+
+        # Name of another session started at the same time gets suffix
+        other = logarchive.Session.create(self.directory.name, UNIT, "abcdef0123456789", 1000.0)
+        self.assertEqual(other.id, self.session.id + "-2")
+
+    def test_flush_rollover(self):
+        self.session.append(entries(0, 3))
+        self.session.flush()
+        self.session.append(entries(3, 6))
+        self.session.flush()
+
+        chunks = self.session.index["chunks"]
+        self.assertEqual([(c["file"], c["first"], c["last"], c["lines"]) for c in chunks],
+                         [("000000.log.gz", 1000.0, 1003.0, 4), ("000001.log.gz", 1004.0, 1007.0, 4),
+                          ("000002.log.gz", 1008.0, 1008.0, 1)])
+        self.assertEqual(self.session.index["lines"], 9)
+        self.assertEqual(logarchive.read_chunk(self.chunk_path(0)), entries(0, 4))
+        self.assertEqual(logarchive.read_chunk(self.chunk_path(1)), entries(4, 4))
+        self.assertEqual(logarchive.read_chunk(self.chunk_path(2)), entries(8, 1))
+        self.assertEqual(self.session.index["bytes"], sum(os.path.getsize(self.chunk_path(i)) for i in range(3)))
+
+    def test_flush_recompacts_finished_chunk(self):
+        for i in range(3):
+            self.session.append(entries(i, 1))
+            self.session.flush()
+        # Unfinished chunk grows by one gzip member per flush
+        self.assertEqual(gzip_members(self.chunk_path(0)), 3)
+        self.assertEqual(self.session.index["chunks"][0]["members"], 3)
+
+        self.session.append(entries(3, 1))
+        self.session.flush()
+        chunk = self.session.index["chunks"][0]
+        self.assertEqual(gzip_members(self.chunk_path(0)), 1)
+        self.assertEqual((chunk["members"], chunk["lines"]), (1, 4))
+        self.assertEqual(chunk["bytes"], os.path.getsize(self.chunk_path(0)))
+        self.assertEqual(logarchive.read_chunk(self.chunk_path(0)), entries(0, 4))
+
+    def test_chunk_bytes_limit(self):
+        session = logarchive.Session.create(self.directory.name, UNIT, "", 1000.0, chunk_bytes=100)
+        session.append(entries(0, 6))
+        session.flush()
+        chunks = session.index["chunks"]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(c["lines"] for c in chunks), 6)
+        self.assertTrue(all(c["raw_bytes"] >= 100 for c in chunks[:-1]))
+
+    def test_truncated_chunk(self):
+        self.session.append(entries(0, 2))
+        self.session.flush()
+        self.session.append(entries(2, 1))
+        self.session.flush()
+        with open(self.chunk_path(0), "ab") as f:
+            f.write(b"\x1f\x8b\x08garbage")
+        self.assertEqual(logarchive.read_chunk(self.chunk_path(0)), entries(0, 3))
+        self.assertEqual(logarchive.read_chunk(self.chunk_path(5)), [])
+
+
+class LogArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.archive = self.open()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open(self, **kwargs):
+        return logarchive.LogArchive(self.directory.name, chunk_lines=4, **kwargs)
+
+    def test_resume_session_after_restart(self):
+        self.archive.append(UNIT, entries(0, 5), key="run1", cursor="c5")
+        self.archive.flush()
+
+        # Archive opened again (QOpenVPN restarted) continues session of the same unit run
+        archive = self.open()
+        self.assertEqual(archive.last_cursor(UNIT), "c5")
+        archive.append(UNIT, entries(5, 2), key="run1", cursor="c7")
+        archive.close()
+        sessions = archive.sessions()
+        self.assertEqual(len(sessions), 1)
+        self.assertEqual((sessions[0]["lines"], sessions[0]["start"], sessions[0]["end"], sessions[0]["cursor"]),
+                         (7, 1000.0, 1006.0, "c7"))
+        self.assertEqual(archive.read(sessions[0]["id"]), entries(0, 7))
+
+        # Another run of unit starts new session
+        archive.append(UNIT, entries(10, 1), key="run2")
+        archive.close(UNIT)
+        self.assertEqual([s["key"] for s in archive.sessions(UNIT)], ["run2", "run1"])
+        self.assertEqual(archive.sessions("openvpn-client@other"), [])
+
+    def test_key_change_starts_session(self):
+        self.archive.append(UNIT, entries(0, 2), key="run1")
+        self.archive.append(UNIT, entries(2, 2), key="run2")
+        sessions = self.archive.sessions()
+        self.assertEqual([(s["key"], s["lines"]) for s in sessions], [("run2", 2), ("run1", 2)])
+        # Previous session was flushed, current one is still in memory
+        self.assertEqual(self.archive.read(sessions[1]["id"]), entries(0, 2))
+        self.assertEqual(self.archive.read(sessions[0]["id"]), entries(2, 2))
+
+    def test_read_time_range(self):
+        self.archive.append(UNIT, entries(0, 10), key="run1")
+        self.archive.flush()
+        self.archive.append(UNIT, entries(10, 3), key="run1")
+        session_id = self.archive.sessions()[0]["id"]
+
+        # Chunks 0-3, 4-7, 8-9 are on disk, 10-12 are pending
+        self.assertEqual(self.archive.read(session_id), entries(0, 13))
+        self.assertEqual(self.archive.read(session_id, since=1002.0, until=1005.0), entries(2, 4))
+        self.assertEqual(self.archive.read(session_id, since=1006.0, until=1011.0), entries(6, 6))
+        self.assertEqual(self.archive.read(session_id, since=1011.0), entries(11, 2))
+        self.assertEqual(self.archive.read(session_id, until=999.0), [])
+        self.assertEqual(self.archive.read(session_id, since=1003.0, limit=4), entries(9, 4))
+        self.assertEqual(self.archive.read("missing"), [])
+
+    def test_read_decompresses_overlapping_chunks(self):
+        self.archive.append(UNIT, entries(0, 12), key="run1")
+        self.archive.flush()
+        session = self.archive._load(self.archive.sessions()[0]["id"])
+        self.assertEqual([os.path.basename(p) for p in session.chunks(since=1005.0, until=1008.0)],
+                         ["000001.log.gz", "000002.log.gz"])
+        self.assertEqual([os.path.basename(p) for p in session.chunks(since=1011.5)], [])
+
+    def test_retention_by_size(self):
+        # Flush applies retention too (entries are older than default age limit)
+        self.archive.max_age = 0
+        for i in range(3):
+            self.archive.append(UNIT, entries(i * 100, 20, start_time=1000.0 + i * 1000), key="run{}".format(i))
+        self.archive.flush()
+        sizes = {s["key"]: s["bytes"] for s in self.archive.sessions()}
+
+        # Open session is never deleted, oldest closed sessions are deleted first
+        self.archive.max_bytes = sizes["run2"] + sizes["run1"]
+        self.archive.apply_retention(now=4000.0)
+        self.assertEqual([s["key"] for s in self.archive.sessions()], ["run2", "run1"])
+
+        self.archive.max_bytes = 1
+        self.archive.apply_retention(now=4000.0)
+        self.assertEqual([s["key"] for s in self.archive.sessions()], ["run2"])
+
+        self.archive.close()
+        self.archive.apply_retention(now=4000.0)
+        self.assertEqual(self.archive.sessions(), [])
+
+    def test_retention_by_age(self):
+        for i in range(3):
+            self.archive.append(UNIT, entries(0, 2, start_time=1000.0 + i * 1000), key="run{}".format(i))
+        self.archive.close()
+
+        self.archive.max_age = 1500
+        self.archive.apply_retention(now=3500.0)
+        # Session is kept while its last entry is within age limit
+        self.assertEqual([s["key"] for s in self.archive.sessions()], ["run2", "run1"])
+
+        self.archive.max_age = 0
+        self.archive.apply_retention(now=100000.0)
+        self.assertEqual(len(self.archive.sessions()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
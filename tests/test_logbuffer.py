@@ -0,0 +1,167 @@
+import os, tempfile, unittest
+from PyQt5 import QtCore, QtWidgets
+
+from qopenvpn import logbuffer
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def fill(buffer, lines, start_time=1000.0, priority=6):
+    """Append lines to buffer, one entry per second"""
+    for i, line in enumerate(lines):
+        buffer.append(start_time + i, priority, line)
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.buffer = logbuffer.LogBuffer(capacity=8)
+
+    def lines(self, seqs):
+        return [self.buffer.line(seq) for seq in seqs]
+
+    def test_search_substring(self):
+        fill(self.buffer, ["Initialization Sequence Completed", "TLS Error: handshake failed",
+                           "Restart pause, 5 second(s)", "TLS: Initial packet from [AF_INET]192.0.2.1:1194"])
+        self.assertEqual(self.lines(self.buffer.search("tls")),
+                         ["TLS Error: handshake failed", "TLS: Initial packet from [AF_INET]192.0.2.1:1194"])
+        self.assertEqual(self.lines(self.buffer.search("INIT")),
+                         ["Initialization Sequence Completed", "TLS: Initial packet from [AF_INET]192.0.2.1:1194"])
+        self.assertEqual(self.buffer.search("nothing"), [])
+        self.assertEqual(self.buffer.search(), [0, 1, 2, 3])
+
+    def test_query_across_words(self):
+        fill(self.buffer, ["hello world", "hello, world", "yellow wording", "halo worker"])
+        # Words of query may be parts of words of line, but substring must match whole query
+        self.assertEqual(self.lines(self.buffer.search("lo wor")), ["hello world", "halo worker"])
+        self.assertEqual(self.lines(self.buffer.search("o, w")), ["hello, world"])
+        self.assertEqual(self.lines(self.buffer.search("ld")), ["hello world", "hello, world"])
+
+    def test_wraparound(self):
+        fill(self.buffer, ["line {} {}".format(i, "even" if i % 2 == 0 else "odd") for i in range(12)])
+        self.assertEqual(len(self.buffer), 8)
+        self.assertEqual((self.buffer.first_seq(), self.buffer.next_seq()), (4, 12))
+        # Dropped entries are still in index, but they aren't returned
+        self.assertEqual(self.buffer.search("even"), [4, 6, 8, 10])
+        self.assertEqual(self.lines(self.buffer.search("line 1")), ["line 10 even", "line 11 odd"])
+        self.assertEqual(self.buffer.search("line 2"), [])
+        self.assertFalse(self.buffer.matches(2, "even"))
+        self.assertTrue(self.buffer.matches(4, "even"))
+
+    def test_rebuilt_index(self):
+        fill(self.buffer, ["old {}".format(i) for i in range(8)])
+        self.buffer.search("old")
+        fill(self.buffer, ["new {}".format(i) for i in range(8)], start_time=2000.0)
+        # Index was rebuilt when whole capacity has been dropped, words of dropped entries are gone
+        self.assertEqual(self.buffer._dropped, 0)
+        self.assertNotIn("old", self.buffer._index)
+        self.assertEqual(self.buffer.search("old"), [])
+        self.assertEqual(self.buffer.search("new"), list(range(8, 16)))
+        self.assertEqual(self.lines(self.buffer.search("w 7")), ["new 7"])
+
+        # Entries appended after rebuild are indexed as before
+        self.buffer.append(3000.0, 6, "newest")
+        self.assertEqual(self.lines(self.buffer.search("newe")), ["newest"])
+
+    def test_vocabulary_cache(self):
+        fill(self.buffer, ["connect", "connection reset", "disconnected"])
+        # Search as you type extends previous query
+        for query in ("c", "co", "con", "conn", "connect"):
+            self.assertEqual(self.lines(self.buffer.search(query)), ["connect", "connection reset", "disconnected"])
+        self.assertEqual(self.lines(self.buffer.search("connecti")), ["connection reset"])
+
+        # Word appended after the cache was filled is found too
+        self.buffer.append(2000.0, 6, "connectivity")
+        self.assertEqual(self.lines(self.buffer.search("connecti")), ["connection reset", "connectivity"])
+
+    def test_priority_and_time_filters(self):
+        for i in range(12):
+            self.buffer.append(1000.0 + i * 10, 3 if i % 3 == 0 else 6, "entry {}".format(i))
+        # Buffer holds entries 4 - 11 (times 1040 - 1110), errors are 6 and 9
+        self.assertEqual(self.buffer.search(max_priority=3), [6, 9])
+        self.assertEqual(self.buffer.search(since=1060.0), [6, 7, 8, 9, 10, 11])
+        self.assertEqual(self.buffer.search(since=1055.0, until=1090.0), [6, 7, 8])
+        self.assertEqual(self.buffer.search(max_priority=3, since=1065.0), [9])
+        self.assertEqual(self.buffer.search(max_priority=3, since=1061.0, until=1090.0), [])
+        self.assertEqual(self.buffer.search("entry", max_priority=3, until=1090.0), [6])
+        self.assertEqual(self.buffer.search("entry 1", max_priority=6, since=1100.0), [10, 11])
+        # Time range before oldest entry still in buffer, or empty range
+        self.assertEqual(self.buffer.search(until=1040.0), [])
+        self.assertEqual(self.buffer.search(since=1080.0, until=1080.0), [])
+
+    def test_priority_clamped(self):
+        self.buffer.append(1000.0, -1, "emergency")
+        self.buffer.append(1001.0, 9, "trace")
+        self.assertEqual(self.buffer.priority(0), 0)
+        self.assertEqual(self.buffer.priority(1), logbuffer.MAX_PRIORITY)
+        self.assertEqual(self.buffer.search(max_priority=0), [0])
+
+    def test_extend(self):
+        seqs = self.buffer.extend((1000.0 + i, 6, "line {}".format(i)) for i in range(10))
+        # Only entries which are still in buffer are returned
+        self.assertEqual(seqs, range(2, 10))
+        self.buffer.clear()
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.search("line"), [])
+
+
+class LogViewerTest(unittest.TestCase):
+    """Priorities of shown lines stay aligned with document blocks above max_lines"""
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        QtCore.QSettings.setPath(QtCore.QSettings.NativeFormat, QtCore.QSettings.UserScope, cls.directory.name)
+        settings = QtCore.QSettings("QOpenVPNTest", "QOpenVPNTest")
+        settings.setValue("log_max_lines", 5)
+        settings.setValue("log_buffer_lines", 8)
+        settings.sync()
+        app.setOrganizationName("QOpenVPNTest")
+        app.setApplicationName("QOpenVPNTest")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        from qopenvpn import dialogs
+        self.viewer = dialogs.QOpenVPNLogViewer()
+        self.viewer.journal.close()
+        # External IP address isn't looked up
+        self.viewer.lookup_ip = lambda *args: None
+
+    def tearDown(self):
+        self.viewer.deleteLater()
+
+    def shown(self):
+        """Return list of (line, priority of block) of shown lines"""
+        document = self.viewer.logViewerEdit.document()
+        return [(document.findBlockByNumber(i).text(), self.viewer.priority_of_block(i))
+                for i in range(document.blockCount())]
+
+    def test_append_above_max_lines(self):
+        self.viewer.append_entries([(1000.0, 6, "info 0")])
+        for i in range(1, 12):
+            priority = 3 if i % 3 == 0 else 6
+            # Batches of one and two lines
+            self.viewer.append_entries([(1000.0 + i, priority, "{} {}".format("err" if priority == 3 else "info", i))]
+                                       * (1 + i % 2))
+
+        shown = self.shown()
+        self.assertEqual(len(shown), 5)
+        self.assertEqual(len(self.viewer.shown_priorities), 5)
+        self.assertEqual(shown[-1], ("info 11", 6))
+        for line, priority in shown:
+            self.assertEqual(priority, 3 if line.startswith("err") else 6, line)
+
+    def test_filtered_append(self):
+        self.viewer.append_entries([(1000.0 + i, 6, "info {}".format(i)) for i in range(3)])
+        self.viewer.priorityComboBox.setCurrentIndex(self.viewer.priorityComboBox.findData(3))
+        self.assertEqual(self.shown(), [("", logbuffer.MAX_PRIORITY)])
+
+        for i in range(3, 12):
+            self.viewer.append_entries([(1000.0 + i, 3 if i % 2 else 6, "line {}".format(i))])
+        self.assertEqual(self.shown(), [("line {}".format(i), 3) for i in (3, 5, 7, 9, 11)])
+
+
+if __name__ == "__main__":
+    unittest.main()
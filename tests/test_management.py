@@ -0,0 +1,135 @@
+import os, tempfile, unittest
+from PyQt5 import QtCore, QtNetwork
+
+from qopenvpn import management
+
+app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+class ParseAddressTest(unittest.TestCase):
+    def test_unix_socket(self):
+        self.assertEqual(management.parse_address("/run/openvpn/corp.sock"), ("/run/openvpn/corp.sock", None))
+
+    def test_tcp(self):
+        self.assertEqual(management.parse_address("127.0.0.1:7505"), ("127.0.0.1", 7505))
+        self.assertEqual(management.parse_address("[::1]:7505"), ("::1", 7505))
+        self.assertEqual(management.parse_address(":7505"), ("127.0.0.1", 7505))
+
+    def test_invalid(self):
+        for address in ("localhost", "localhost:port", "relative/path"):
+            with self.assertRaises(ValueError):
+                management.parse_address(address)
+
+
+class ParserTest(unittest.TestCase):
+    def setUp(self):
+        self.client = management.ManagementClient("/nonexistent/management.sock")
+        self.states = []
+        self.client.stateChanged.connect(self.states.append)
+
+    def tearDown(self):
+        self.client.deleteLater()
+
+    def test_state_notification(self):
+        self.client._parse_line(">STATE:1700000000,CONNECTED,SUCCESS,10.8.0.2,1.2.3.4,1194,,")
+        self.assertEqual(self.client.state, "CONNECTED")
+        self.assertEqual(self.client.state_time, 1700000000)
+        self.assertEqual(self.client.local_ip, "10.8.0.2")
+        self.assertEqual(self.client.remote_ip, "1.2.3.4")
+        self.assertEqual(self.states, ["CONNECTED"])
+
+    def test_state_response(self):
+        self.client._parse_line("1700000000,WAIT,,,,,,")
+        self.assertEqual(self.client.state, "WAIT")
+        self.assertEqual(self.client.local_ip, "")
+
+    def test_state_change_emitted_once(self):
+        self.client._parse_line(">STATE:1700000000,RECONNECTING,ping-restart,,,,,")
+        self.client._parse_line(">STATE:1700000001,RECONNECTING,ping-restart,,,,,")
+        self.assertEqual(self.states, ["RECONNECTING"])
+
+    def test_other_lines_ignored(self):
+        for line in (">INFO:OpenVPN Management Interface Version 3", "SUCCESS: bytecount interval changed",
+                     "END", "1700000000", ""):
+            self.client._parse_line(line)
+        self.assertEqual(self.client.state, "")
+        self.assertEqual(self.states, [])
+
+    def test_bytecount(self):
+        counts = []
+        self.client.bytecountChanged.connect(lambda bytes_in, bytes_out: counts.append((bytes_in, bytes_out)))
+        self.client._parse_line(">BYTECOUNT:10000,500")
+        self.assertEqual((self.client.bytes_in, self.client.bytes_out), (10000, 500))
+        self.assertEqual(self.client.rate_in, 0.0)
+
+        # Throughput is computed from difference of two notifications
+        self.client._bytecount_time -= 2
+        self.client._parse_line(">BYTECOUNT:30000,1500")
+        self.assertAlmostEqual(self.client.rate_in, 10000, delta=100)
+        self.assertAlmostEqual(self.client.rate_out, 500, delta=5)
+        self.assertEqual(counts, [(10000, 500), (30000, 1500)])
+
+    def test_invalid_bytecount(self):
+        self.client._parse_line(">BYTECOUNT:abc,1")
+        self.client._parse_line(">BYTECOUNT:1,2,3")
+        self.assertEqual((self.client.bytes_in, self.client.bytes_out), (0, 0))
+
+
+class FakeServerTest(unittest.TestCase):
+    """Client talks to fake management server on unix socket"""
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "management.sock")
+        self.server = QtNetwork.QLocalServer()
+        self.server.listen(self.path)
+        self.server.newConnection.connect(self.accept)
+        self.received = b""
+        self.connection = None
+
+    def tearDown(self):
+        self.server.close()
+        self.directory.cleanup()
+
+    def accept(self):
+        self.connection = self.server.nextPendingConnection()
+        self.connection.readyRead.connect(self.read)
+        self.connection.write(b">INFO:OpenVPN Management Interface Version 3\r\nENTER PASSWORD:")
+
+    def read(self):
+        self.received += bytes(self.connection.readAll())
+        if b"bytecount" in self.received:
+            self.connection.write(b"SUCCESS: password is correct\r\n"
+                                  b"SUCCESS: real-time state notification set to ON\r\n"
+                                  b"1700000000,CONNECTED,SUCCESS,10.8.0.2,1.2.3.4,1194,,\r\nEND\r\n"
+                                  b">BYTECOUNT:10000,500\r\n")
+
+    def wait(self, condition, timeout=5000):
+        timer = QtCore.QElapsedTimer()
+        timer.start()
+        while not condition() and timer.elapsed() < timeout:
+            app.processEvents(QtCore.QEventLoop.AllEvents, 50)
+        return condition()
+
+    def test_password_and_subscription(self):
+        client = management.ManagementClient(self.path, password="secret")
+        client.open()
+        try:
+            self.assertTrue(self.wait(lambda: client.bytes_in))
+            self.assertTrue(client.is_connected())
+            self.assertEqual(self.received.split(b"\n")[:4],
+                             [b"secret", b"state on", b"state", b"bytecount 2"])
+            self.assertEqual(client.state, "CONNECTED")
+            self.assertEqual(client.remote_ip, "1.2.3.4")
+            self.assertEqual((client.bytes_in, client.bytes_out), (10000, 500))
+
+            # Statistics are reset when connection is lost
+            self.connection.disconnectFromServer()
+            self.assertTrue(self.wait(lambda: not client.is_connected()))
+            self.assertEqual(client.state, "")
+        finally:
+            client.close()
+            client.deleteLater()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import socket, struct, unittest
+
+from qopenvpn import stun
+
+TRANSACTION_ID = struct.pack(">I", stun.MAGIC_COOKIE) + bytes(range(1, 13))
+
+
+def attribute(attr_type, value):
+    """Encode STUN attribute (padded to multiple of 4 bytes)"""
+    return struct.pack(">2H", attr_type, len(value)) + value + bytes(-len(value) % 4)
+
+
+def mapped_address(address, port, xor=False):
+    """Encode value of (XOR-)MAPPED-ADDRESS attribute"""
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    packed = socket.inet_pton(family, address)
+    if xor:
+        port ^= stun.MAGIC_COOKIE >> 16
+        key = TRANSACTION_ID[:len(packed)]
+        packed = bytes(a ^ b for a, b in zip(packed, key))
+    return struct.pack(">xBH", 0x02 if family == socket.AF_INET6 else 0x01, port) + packed
+
+
+def response(*attributes, packet_type=stun.BINDING_RESPONSE, transaction_id=TRANSACTION_ID):
+    """Encode Binding Response with attributes"""
+    body = b"".join(attributes)
+    return struct.pack(">2H", packet_type, len(body)) + transaction_id + body
+
+
+class ParseResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.client = stun.StunClient()
+
+    def parse(self, data):
+        return self.client._parse_response(data, TRANSACTION_ID)
+
+    def test_xor_mapped_address_ipv4(self):
+        data = response(attribute(stun.XOR_MAPPED_ADDRESS, mapped_address("198.51.100.7", 54320, xor=True)))
+        self.assertEqual(self.parse(data), ("198.51.100.7", 54320))
+
+    def test_xor_mapped_address_ipv6(self):
+        data = response(attribute(stun.XOR_MAPPED_ADDRESS, mapped_address("2001:db8::42", 443, xor=True)))
+        self.assertEqual(self.parse(data), ("2001:db8::42", 443))
+
+    def test_old_xor_mapped_address(self):
+        data = response(attribute(stun.XOR_MAPPED_ADDRESS_OLD, mapped_address("203.0.113.5", 1, xor=True)))
+        self.assertEqual(self.parse(data), ("203.0.113.5", 1))
+
+    def test_xor_mapped_address_preferred(self):
+        data = response(attribute(stun.MAPPED_ADDRESS, mapped_address("10.0.0.1", 1000)),
+                        attribute(0x8022, b"server"),
+                        attribute(stun.XOR_MAPPED_ADDRESS, mapped_address("198.51.100.7", 2000, xor=True)))
+        self.assertEqual(self.parse(data), ("198.51.100.7", 2000))
+
+    def test_mapped_address_fallback(self):
+        # RFC 3489 server (unknown attribute with odd length is skipped including padding)
+        data = response(attribute(0x8022, b"old"), attribute(stun.MAPPED_ADDRESS, mapped_address("192.0.2.1", 3478)))
+        self.assertEqual(self.parse(data), ("192.0.2.1", 3478))
+
+    def test_no_address(self):
+        self.assertEqual(self.parse(response(attribute(0x8022, b"server"))), ("", 0))
+
+    def test_invalid_type(self):
+        with self.assertRaises(ValueError):
+            self.parse(response(packet_type=0x0111))
+
+    def test_invalid_transaction_id(self):
+        data = response(attribute(stun.XOR_MAPPED_ADDRESS, mapped_address("198.51.100.7", 1, xor=True)),
+                        transaction_id=TRANSACTION_ID[:4] + bytes(12))
+        with self.assertRaises(ValueError):
+            self.parse(data)
+
+    def test_truncated_attribute(self):
+        data = response(attribute(stun.XOR_MAPPED_ADDRESS, mapped_address("198.51.100.7", 1, xor=True)))
+        with self.assertRaises(ValueError):
+            self.parse(data[:-2])
+
+    def test_truncated_address(self):
+        value = mapped_address("2001:db8::42", 1, xor=True)[:12]
+        with self.assertRaises(ValueError):
+            self.parse(response(attribute(stun.XOR_MAPPED_ADDRESS, value)))
+
+    def test_unknown_family(self):
+        value = struct.pack(">xBH", 0x03, 1) + bytes(4)
+        with self.assertRaises(ValueError):
+            self.parse(response(attribute(stun.XOR_MAPPED_ADDRESS, value)))
+
+    def test_request_roundtrip(self):
+        request = self.client._generate_request()
+        self.assertEqual(len(request), 20)
+        self.assertEqual(struct.unpack(">2HI", request[:8]), (stun.BINDING_REQUEST, 0, stun.MAGIC_COOKIE))
+        data = response(attribute(stun.XOR_MAPPED_ADDRESS, mapped_address("198.51.100.7", 7, xor=True)),
+                        transaction_id=request[4:20])
+        self.assertEqual(self.client._parse_response(data), ("198.51.100.7", 7))
+
+
+if __name__ == "__main__":
+    unittest.main()